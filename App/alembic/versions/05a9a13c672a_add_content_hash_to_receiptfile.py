@@ -0,0 +1,59 @@
+"""Add content_hash to receiptfile
+
+Revision ID: 05a9a13c672a
+Revises: b4e0567df33a
+Create Date: 2026-10-18 09:12:41.503117
+
+"""
+import hashlib
+import os
+
+import sqlmodel
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '05a9a13c672a'
+down_revision: Union[str, Sequence[str], None] = 'b4e0567df33a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _hash_file(file_path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('receiptfile', sa.Column('content_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True))
+    op.create_index(op.f('ix_receiptfile_content_hash'), 'receiptfile', ['content_hash'], unique=True)
+
+    # Backfill hashes for files still on disk. When several rows point at the
+    # same bytes only the first one gets the hash, keeping the index unique.
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT id, file_path FROM receiptfile ORDER BY created_at")).fetchall()
+    seen = set()
+    for file_id, file_path in rows:
+        if not file_path or not os.path.exists(file_path):
+            continue
+        content_hash = _hash_file(file_path)
+        if content_hash in seen:
+            continue
+        seen.add(content_hash)
+        bind.execute(
+            sa.text("UPDATE receiptfile SET content_hash = :content_hash WHERE id = :id"),
+            {"content_hash": content_hash, "id": file_id},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_receiptfile_content_hash'), table_name='receiptfile')
+    op.drop_column('receiptfile', 'content_hash')
@@ -0,0 +1,35 @@
+"""Add raw_text, extractor and extraction_version to receipt
+
+Revision ID: 3c9e1f7a2b64
+Revises: f074be14aa19
+Create Date: 2026-10-18 14:22:05.118304
+
+"""
+import sqlmodel
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e1f7a2b64'
+down_revision: Union[str, Sequence[str], None] = 'f074be14aa19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('receipt', sa.Column('raw_text', sa.Text(), nullable=True))
+    op.add_column('receipt', sa.Column('extractor', sqlmodel.sql.sqltypes.AutoString(length=50), nullable=True))
+    op.add_column('receipt', sa.Column('extraction_version', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True))
+    op.create_index(op.f('ix_receipt_extraction_version'), 'receipt', ['extraction_version'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_receipt_extraction_version'), table_name='receipt')
+    op.drop_column('receipt', 'extraction_version')
+    op.drop_column('receipt', 'extractor')
+    op.drop_column('receipt', 'raw_text')
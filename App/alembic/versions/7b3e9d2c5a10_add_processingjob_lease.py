@@ -0,0 +1,31 @@
+"""Add worker lease columns to processingjob
+
+Revision ID: 7b3e9d2c5a10
+Revises: c2f9d84b1e57
+Create Date: 2026-10-18 22:41:09.613027
+
+"""
+import sqlmodel
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3e9d2c5a10'
+down_revision: Union[str, Sequence[str], None] = 'c2f9d84b1e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('processingjob', sa.Column('worker_id', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=True))
+    op.add_column('processingjob', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('processingjob', 'lease_expires_at')
+    op.drop_column('processingjob', 'worker_id')
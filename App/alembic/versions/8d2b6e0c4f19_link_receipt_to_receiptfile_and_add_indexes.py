@@ -0,0 +1,57 @@
+"""Link receipt to receiptfile and add lookup indexes
+
+Revision ID: 8d2b6e0c4f19
+Revises: 3c9e1f7a2b64
+Create Date: 2026-10-18 15:40:52.671029
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2b6e0c4f19'
+down_revision: Union[str, Sequence[str], None] = '3c9e1f7a2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite cannot add a foreign key to an existing table, so batch mode rebuilds it
+    with op.batch_alter_table('receipt') as batch_op:
+        batch_op.add_column(sa.Column('receipt_file_id', sa.Uuid(), nullable=True))
+        batch_op.create_foreign_key('fk_receipt_receipt_file_id_receiptfile', 'receiptfile', ['receipt_file_id'], ['id'])
+
+    # Backfill from the file path; when several files share a path the oldest one wins
+    op.execute(sa.text(
+        """
+        UPDATE receipt SET receipt_file_id = (
+            SELECT receiptfile.id FROM receiptfile
+            WHERE receiptfile.file_path = receipt.file_path
+            ORDER BY receiptfile.created_at
+            LIMIT 1
+        )
+        WHERE receipt_file_id IS NULL
+        """
+    ))
+
+    op.create_index(op.f('ix_receipt_receipt_file_id'), 'receipt', ['receipt_file_id'], unique=False)
+    op.create_index(op.f('ix_receipt_purchased_at'), 'receipt', ['purchased_at'], unique=False)
+    op.create_index(op.f('ix_receipt_merchant_name'), 'receipt', ['merchant_name'], unique=False)
+    op.create_index('ix_receipt_active_purchased_at_id', 'receipt', ['is_active', 'purchased_at', 'id'], unique=False)
+    op.create_index(op.f('ix_receiptfile_file_name'), 'receiptfile', ['file_name'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_receiptfile_file_name'), table_name='receiptfile')
+    op.drop_index('ix_receipt_active_purchased_at_id', table_name='receipt')
+    op.drop_index(op.f('ix_receipt_merchant_name'), table_name='receipt')
+    op.drop_index(op.f('ix_receipt_purchased_at'), table_name='receipt')
+    op.drop_index(op.f('ix_receipt_receipt_file_id'), table_name='receipt')
+    with op.batch_alter_table('receipt') as batch_op:
+        batch_op.drop_constraint('fk_receipt_receipt_file_id_receiptfile', type_='foreignkey')
+        batch_op.drop_column('receipt_file_id')
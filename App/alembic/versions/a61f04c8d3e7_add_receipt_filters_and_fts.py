@@ -0,0 +1,124 @@
+"""Add receipt payment_method, merchant expression index and FTS5 search
+
+Revision ID: a61f04c8d3e7
+Revises: e5a7c3d91b02
+Create Date: 2026-10-18 18:12:37.925480
+
+"""
+import json
+import sqlmodel
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a61f04c8d3e7'
+down_revision: Union[str, Sequence[str], None] = 'e5a7c3d91b02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ITEM_NAMES_SQL = (
+    "(SELECT group_concat(json_extract(value, '$.name'), ' ') "
+    "FROM json_each(CASE WHEN json_valid({row}.items) THEN {row}.items ELSE '[]' END) "
+    "WHERE type = 'object')"
+)
+
+BATCH_SIZE = 1000
+
+# Same keys and rules as services.receipts.utils.payment_method_from_details,
+# copied so this revision keeps working when the application code changes
+PAYMENT_METHOD_KEYS = ("method", "payment_method", "type", "card_type")
+
+
+def payment_method(payment_details: Optional[str]) -> Optional[str]:
+    try:
+        details = json.loads(payment_details) if payment_details else None
+    except ValueError:
+        return None
+    if not isinstance(details, dict):
+        return None
+    for key in PAYMENT_METHOD_KEYS:
+        value = details.get(key)
+        if isinstance(value, str) and value.strip():
+            return value.strip().upper()[:50]
+    return None
+
+
+INSERT_ROW_SQL = (
+    "INSERT INTO receipt_fts(rowid, merchant_name, store_address, item_names) "
+    "VALUES (new.rowid, new.merchant_name, new.store_address, " + ITEM_NAMES_SQL.format(row="new") + ");"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('receipt', sa.Column('payment_method', sqlmodel.sql.sqltypes.AutoString(length=50), nullable=True))
+    op.create_index(op.f('ix_receipt_payment_method'), 'receipt', ['payment_method'], unique=False)
+    op.create_index('ix_receipt_merchant_name_lower', 'receipt', [sa.text('lower(merchant_name)')], unique=False)
+
+    # Backfill from the payment details JSON in Python, so it runs on any
+    # dialect, in batches so large tables are not held in memory
+    receipt = sa.table(
+        'receipt',
+        sa.column('id', sa.Uuid()),
+        sa.column('payment_details', sa.Text()),
+        sa.column('payment_method', sa.String()),
+    )
+    bind = op.get_bind()
+    result = bind.execute(
+        sa.select(receipt.c.id, receipt.c.payment_details)
+        .where(receipt.c.payment_details.is_not(None))
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    update = (
+        sa.update(receipt)
+        .where(receipt.c.id == sa.bindparam('receipt_id'))
+        .values(payment_method=sa.bindparam('method'))
+    )
+    for receipts in result.partitions():
+        rows = [
+            {'receipt_id': receipt_id, 'method': method}
+            for receipt_id, details in receipts
+            for method in [payment_method(details)] if method is not None
+        ]
+        if rows:
+            bind.execute(update, rows)
+
+    if bind.dialect.name != 'sqlite':
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS receipt_fts USING fts5("
+        "merchant_name, store_address, item_names, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS receipt_fts_insert AFTER INSERT ON receipt BEGIN "
+        + INSERT_ROW_SQL + " END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS receipt_fts_update AFTER UPDATE OF merchant_name, store_address, items ON receipt BEGIN "
+        "DELETE FROM receipt_fts WHERE rowid = old.rowid; " + INSERT_ROW_SQL + " END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS receipt_fts_delete AFTER DELETE ON receipt BEGIN "
+        "DELETE FROM receipt_fts WHERE rowid = old.rowid; END"
+    )
+    op.execute(
+        "INSERT INTO receipt_fts(rowid, merchant_name, store_address, item_names) "
+        "SELECT receipt.rowid, receipt.merchant_name, receipt.store_address, "
+        + ITEM_NAMES_SQL.format(row="receipt") + " FROM receipt"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS receipt_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS receipt_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS receipt_fts_insert")
+        op.execute("DROP TABLE IF EXISTS receipt_fts")
+    op.drop_index('ix_receipt_merchant_name_lower', table_name='receipt')
+    op.drop_index(op.f('ix_receipt_payment_method'), table_name='receipt')
+    op.drop_column('receipt', 'payment_method')
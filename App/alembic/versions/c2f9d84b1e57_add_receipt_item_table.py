@@ -0,0 +1,130 @@
+"""Add receipt_item table and backfill it from receipt items JSON
+
+Revision ID: c2f9d84b1e57
+Revises: a61f04c8d3e7
+Create Date: 2026-10-18 21:04:13.518206
+
+"""
+import re
+import uuid
+import sqlmodel
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f9d84b1e57'
+down_revision: Union[str, Sequence[str], None] = 'a61f04c8d3e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 1000
+
+# Same key lists and rules as services.receipts.utils.receipt_items_from_data,
+# copied so this revision keeps working when the application code changes
+ITEM_NAME_KEYS = ("name", "description", "item")
+ITEM_SKU_KEYS = ("sku", "upc", "item_code", "code", "item_number")
+ITEM_QUANTITY_KEYS = ("quantity", "qty", "count")
+ITEM_UNIT_PRICE_KEYS = ("unit_price", "price_each", "unit_cost")
+ITEM_LINE_TOTAL_KEYS = ("line_total", "total", "amount", "price")
+
+AMOUNT_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def _first_value(item: Dict, keys) -> Any:
+    for key in keys:
+        value = item.get(key)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+def _to_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = AMOUNT_RE.search(value.replace(",", ""))
+        if match:
+            return float(match.group())
+    return None
+
+
+def _to_text(value: Any, max_length: int) -> Optional[str]:
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    text_value = str(value).strip()
+    return text_value[:max_length] or None
+
+
+def item_rows(receipt_id: uuid.UUID, items: Any) -> List[Dict[str, Any]]:
+    rows = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        name = _to_text(_first_value(item, ITEM_NAME_KEYS), 255)
+        quantity = _to_number(_first_value(item, ITEM_QUANTITY_KEYS))
+        unit_price = _to_number(_first_value(item, ITEM_UNIT_PRICE_KEYS))
+        line_total = _to_number(_first_value(item, ITEM_LINE_TOTAL_KEYS))
+        if line_total is None and unit_price is not None:
+            line_total = round(unit_price * (quantity if quantity is not None else 1), 2)
+        if unit_price is None and line_total is not None and quantity:
+            unit_price = round(line_total / quantity, 2)
+        if name is None and line_total is None:
+            continue
+        rows.append({
+            "id": uuid.uuid4(),
+            "receipt_id": receipt_id,
+            "position": len(rows),
+            "name": name,
+            "sku": _to_text(_first_value(item, ITEM_SKU_KEYS), 100),
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "line_total": line_total,
+        })
+    return rows
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    receipt_item = op.create_table('receipt_item',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('receipt_id', sa.Uuid(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('name', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True),
+    sa.Column('sku', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=True),
+    sa.Column('quantity', sa.Float(), nullable=True),
+    sa.Column('unit_price', sa.Float(), nullable=True),
+    sa.Column('line_total', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['receipt_id'], ['receipt.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Backfill before indexing, in batches so large tables are not held in memory
+    receipt = sa.table('receipt', sa.column('id', sa.Uuid()), sa.column('items', sa.JSON()))
+    result = op.get_bind().execute(
+        sa.select(receipt.c.id, receipt.c['items']).execution_options(yield_per=BATCH_SIZE)
+    )
+    for receipts in result.partitions():
+        rows = [row for receipt_id, items in receipts for row in item_rows(receipt_id, items)]
+        if rows:
+            op.bulk_insert(receipt_item, rows)
+
+    op.create_index('ix_receipt_item_receipt_id_position', 'receipt_item', ['receipt_id', 'position'], unique=False)
+    op.create_index(
+        'ix_receipt_item_name_lower', 'receipt_item',
+        [sa.text('lower(name)'), 'name', 'receipt_id', 'quantity', 'line_total'], unique=False,
+    )
+    op.create_index('ix_receipt_item_sku', 'receipt_item', ['sku', 'receipt_id', 'quantity', 'line_total'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_receipt_item_sku', table_name='receipt_item')
+    op.drop_index('ix_receipt_item_name_lower', table_name='receipt_item')
+    op.drop_index('ix_receipt_item_receipt_id_position', table_name='receipt_item')
+    op.drop_table('receipt_item')
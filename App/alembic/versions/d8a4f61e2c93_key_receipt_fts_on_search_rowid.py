@@ -0,0 +1,92 @@
+"""Key receipt_fts on a stable receipt.search_rowid column
+
+Revision ID: d8a4f61e2c93
+Revises: 7b3e9d2c5a10
+Create Date: 2026-10-18 23:12:45.207391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a4f61e2c93'
+down_revision: Union[str, Sequence[str], None] = '7b3e9d2c5a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Copied from db/fts.py so this revision keeps working when the application code changes
+ITEM_NAMES_SQL = (
+    "(SELECT group_concat(json_extract(value, '$.name'), ' ') "
+    "FROM json_each(CASE WHEN json_valid({row}.items) THEN {row}.items ELSE '[]' END) "
+    "WHERE type = 'object')"
+)
+
+
+def _create_triggers(key: str) -> None:
+    """Create the receipt_fts sync triggers, keyed on receipt.<key>."""
+    insert_row = (
+        "INSERT INTO receipt_fts(rowid, merchant_name, store_address, item_names) "
+        f"VALUES (new.{key}, new.merchant_name, new.store_address, " + ITEM_NAMES_SQL.format(row="new") + ");"
+    )
+    if key == "search_rowid":
+        op.execute(
+            "CREATE TRIGGER receipt_fts_insert AFTER INSERT ON receipt BEGIN "
+            "UPDATE receipt SET search_rowid = (SELECT coalesce(max(search_rowid), 0) + 1 FROM receipt) "
+            "WHERE rowid = new.rowid AND search_rowid IS NULL; "
+            "INSERT INTO receipt_fts(rowid, merchant_name, store_address, item_names) "
+            "SELECT search_rowid, merchant_name, store_address, " + ITEM_NAMES_SQL.format(row="receipt") + " "
+            "FROM receipt WHERE rowid = new.rowid; END"
+        )
+    else:
+        op.execute("CREATE TRIGGER receipt_fts_insert AFTER INSERT ON receipt BEGIN " + insert_row + " END")
+    op.execute(
+        "CREATE TRIGGER receipt_fts_update AFTER UPDATE OF merchant_name, store_address, items ON receipt BEGIN "
+        f"DELETE FROM receipt_fts WHERE rowid = old.{key}; " + insert_row + " END"
+    )
+    op.execute(
+        "CREATE TRIGGER receipt_fts_delete AFTER DELETE ON receipt BEGIN "
+        f"DELETE FROM receipt_fts WHERE rowid = old.{key}; END"
+    )
+
+
+def _drop_triggers() -> None:
+    op.execute("DROP TRIGGER IF EXISTS receipt_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS receipt_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS receipt_fts_insert")
+
+
+def _rebuild_index(key: str) -> None:
+    op.execute("DELETE FROM receipt_fts")
+    op.execute(
+        "INSERT INTO receipt_fts(rowid, merchant_name, store_address, item_names) "
+        f"SELECT receipt.{key}, receipt.merchant_name, receipt.store_address, "
+        + ITEM_NAMES_SQL.format(row="receipt") + " FROM receipt"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('receipt', sa.Column('search_rowid', sa.Integer(), nullable=True))
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        # Current rowids are unique, so they make a valid starting key
+        op.execute("UPDATE receipt SET search_rowid = rowid")
+    op.create_index(op.f('ix_receipt_search_rowid'), 'receipt', ['search_rowid'], unique=True)
+    if sqlite:
+        _drop_triggers()
+        _create_triggers("search_rowid")
+        _rebuild_index("search_rowid")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        _drop_triggers()
+        _create_triggers("rowid")
+        _rebuild_index("rowid")
+    op.drop_index(op.f('ix_receipt_search_rowid'), table_name='receipt')
+    op.drop_column('receipt', 'search_rowid')
@@ -0,0 +1,28 @@
+"""Add receipt created_at listing index
+
+Revision ID: e5a7c3d91b02
+Revises: 8d2b6e0c4f19
+Create Date: 2026-10-18 16:58:11.402377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c3d91b02'
+down_revision: Union[str, Sequence[str], None] = '8d2b6e0c4f19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_receipt_active_created_at_id', 'receipt', ['is_active', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_receipt_active_created_at_id', table_name='receipt')
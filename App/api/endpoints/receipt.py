@@ -1,21 +1,35 @@
 from fastapi import APIRouter,Query
-from dateutil.parser import parse as parse_date
-from sqlmodel import Session, select,func
+from sqlmodel import select,func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from math import ceil
 from models.receipt_table import *
 from fastapi import  UploadFile, File
 from fastapi import APIRouter, Depends, HTTPException,Security
-from db.session import get_session
+from db.session import get_async_session
 from fastapi.security import HTTPBearer
 
 import os
+from typing import Optional
 import fitz  # PyMuPDF
-from PIL import Image
-import io
-import base64
-from services.llm.utils import extract_text_pdf, extract_receipt_data
-from models.schema import ProcessReceiptRequest
-from services.pdf.utils import extract_text_conventional_with_file,extract_text_via_ocr_with_file
+from models.schema import ItemFilters, ProcessReceiptRequest, ReceiptFilters, ReextractRequest
+from services.processing.utils import outdated_receipts_query, receipt_to_response, reextract_receipts
+from services.receipts.utils import (
+    SORT_COLUMNS,
+    InvalidCursorError,
+    fetch_keyset_rows,
+    item_count_query,
+    item_list_query,
+    item_summary_query,
+    keyset_page,
+    receipt_list_query,
+    receipt_counts,
+)
+from services.jobs.utils import create_job, job_to_response, job_pool
+from services.llm.cache import extraction_cache
+from services.llm.utils import client as llm_client
+from services.storage.utils import stream_upload_to_temp, is_valid_pdf, remove_file_quietly
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
 from core.logging import setup_logger
 
 router = APIRouter(prefix="/receipt", tags=["receipt"])
@@ -31,22 +45,25 @@ UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 MAX_FILE_SIZE = 10 * 1024 * 1024
+# Whole request body limit enforced by RequestBodyLimitMiddleware: the file plus multipart headers and fields
+MAX_REQUEST_SIZE = MAX_FILE_SIZE + 64 * 1024
+
 
 
 @router.post("/upload")
 async def upload_receipt(
     file: UploadFile = File(...),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     Upload a PDF receipt file and store its metadata.
 
     Args:
         file (UploadFile): The receipt file to upload (PDF only).
-        session (Session): Database session.
+        session (AsyncSession): Database session.
 
     Returns:
-        dict: Receipt file ID and name.
+        dict: Receipt file ID and name. Re-uploading identical content returns the existing file.
 
     Raises:
         HTTPException: If the file is not a PDF, is empty, too large, invalid, or other errors occur.
@@ -58,61 +75,66 @@ async def upload_receipt(
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-    # Read file content
-    content = await file.read()
-
-    # Check file size
-    if len(content) == 0:
-        raise HTTPException(status_code=400, detail="Empty file")
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File too large  (Max : 10mb)")
-
-    # Validate PDF
+    # Stream the upload to a temporary file, enforcing size limits as it arrives
     try:
-        doc = fitz.open(stream=content, filetype="pdf")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail="Invalid PDF file")
+        temp_path, content_hash, file_size = await stream_upload_to_temp(
+            file, UPLOAD_DIR, MAX_FILE_SIZE
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=500, detail="Error saving file")
 
-  
-    filename =file.filename
+    logger.info(f"Received {file.filename}: {file_size} bytes, sha256={content_hash}")
 
-    
-    file_path = os.path.join(UPLOAD_DIR, filename)
-
-    # Check for duplicates in the database
-    existing_file = session.exec(
-        select(ReceiptFile).where(ReceiptFile.file_name == filename)
-    ).first()
-
-    if existing_file:
-        # Update existing file if desired (optional behavior)
-        existing_file.file_path = file_path
-        existing_file.updated_at = datetime.now()
-        session.add(existing_file)
-        session.commit()
-        session.refresh(existing_file)
+    try:
+        # Validate PDF from the file on disk
+        if not await run_in_threadpool(is_valid_pdf, temp_path):
+            raise HTTPException(status_code=400, detail="Invalid PDF file")
+
+        filename = file.filename
+
+        # Files are stored by content hash, so identical bytes share one path
+        file_path = os.path.join(UPLOAD_DIR, f"{content_hash}.pdf")
+
+        # Check for duplicate content in the database
+        existing_file = (await session.exec(
+            select(ReceiptFile).where(ReceiptFile.content_hash == content_hash)
+        )).first()
+
+        if existing_file is None:
+            # Create new ReceiptFile entry
+            receipt_file = ReceiptFile(
+                file_name=filename,
+                file_path=file_path,
+                content_hash=content_hash,
+            )
+            session.add(receipt_file)
+            try:
+                await session.commit()
+            except IntegrityError:
+                # A concurrent upload of the same content committed first; return its row
+                await session.rollback()
+                existing_file = (await session.exec(
+                    select(ReceiptFile).where(ReceiptFile.content_hash == content_hash)
+                )).one()
+
+        if existing_file is not None:
+            existing_file.file_path = file_path
+            existing_file.updated_at = datetime.now()
+            session.add(existing_file)
+            await session.commit()
+            receipt_file = existing_file
+
+        # Move the completed upload into place only once a row references it,
+        # unless the same content is already stored
         try:
-            with open(file_path, "wb") as f:
-                f.write(content)
-        except Exception as e:
+            if not os.path.exists(file_path):
+                await run_in_threadpool(os.replace, temp_path, file_path)
+        except OSError as e:
             raise HTTPException(status_code=500, detail="Error saving file")
-        return {"id": str(existing_file.id), "file_name": existing_file.file_name}
-
-    # Save new file
-    try:
-        with open(file_path, "wb") as f:
-            f.write(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Error saving file")
-
-    # Create new ReceiptFile entry
-    receipt_file = ReceiptFile(
-        file_name=filename,
-        file_path=file_path,
-    )
-    session.add(receipt_file)
-    session.commit()
-    session.refresh(receipt_file)
+    finally:
+        remove_file_quietly(temp_path)
 
     return {"id": str(receipt_file.id), "file_name": receipt_file.file_name}
 
@@ -122,10 +144,17 @@ async def upload_receipt(
 
 from PyPDF2 import PdfReader
 
+
+def read_pdf(file_path: str) -> None:
+    """Parse a PDF with PyPDF2, raising if it is malformed."""
+    with open(file_path, "rb") as f:
+        PdfReader(f)
+
+
 @router.post("/validate/{file_id}")
 async def validate_receipt_file(
     file_id: uuid.UUID,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     
 ):
     """
@@ -133,7 +162,7 @@ async def validate_receipt_file(
 
     Args:
         file_id (uuid.UUID): The ID of the receipt file to validate.
-        session (Session): Database session.
+        session (AsyncSession): Database session.
        
 
     Returns:
@@ -143,15 +172,14 @@ async def validate_receipt_file(
         HTTPException: If the file is not found or validation fails.
     """
   
-    receipt_file = session.exec(
+    receipt_file = (await session.exec(
         select(ReceiptFile).where(ReceiptFile.id == file_id)
-    ).first()
+    )).first()
     if not receipt_file:
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        with open(receipt_file.file_path, "rb") as f:
-            PdfReader(f)
+        await run_in_threadpool(read_pdf, receipt_file.file_path)
         receipt_file.is_valid = True
         receipt_file.invalid_reason = None
     except Exception as e:
@@ -160,7 +188,7 @@ async def validate_receipt_file(
     
     receipt_file.updated_at = datetime.now()
     session.add(receipt_file)
-    session.commit()
+    await session.commit()
     
     return {"is_valid": receipt_file.is_valid, "invalid_reason": receipt_file.invalid_reason}
 
@@ -168,34 +196,38 @@ async def validate_receipt_file(
 
 
 
-@router.post("/process/{file_id}")
+@router.post("/process/{file_id}", status_code=202)
 async def process_receipt(
     file_id: uuid.UUID,
     request: ProcessReceiptRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
    
 ):
     """
-    Process a receipt file by extracting text and structured data, then store or update in Receipt table.
+    Queue a receipt file for text and structured data extraction.
+
+    The extraction runs on the background worker pool; poll GET /receipt/jobs/{job_id}
+    for its status and result.
 
     Args:
         file_id: UUID of the ReceiptFile to process.
-        session: Database session.
+        session: Async database session.
         is_premium_user: Boolean indicating if the user has a premium subscription.
             Note: This is a request parameter for prototyping purposes only. In a production
             environment, the user's subscription status should be retrieved from a users table.
+        force_reprocess: Re-run extraction even if identical content was already processed.
 
     Returns:
-        dict: Extracted receipt data and receipt ID.
+        dict: Job ID and status. Already processed content returns a completed job with its result.
 
     Raises:
-        HTTPException: If file not found, already processed, or processing fails.
+        HTTPException: If the file is not found or fails the size checks.
     """
     # Retrieve ReceiptFile
      
-    receipt_file = session.exec(
+    receipt_file = (await session.exec(
         select(ReceiptFile).where(ReceiptFile.id == file_id)
-    ).first()
+    )).first()
 
 
     
@@ -228,144 +260,75 @@ async def process_receipt(
 
     logger.info(f"File size: {file_size_mb:.2f} MB")
 
-   
+    # Identical content that was already processed is returned without re-running extraction
+    if receipt_file.content_hash and receipt_file.is_processed and not request.force_reprocess:
+        processed_receipt = (await session.exec(
+            select(Receipt).where(Receipt.receipt_file_id == receipt_file.id)
+        )).first()
+        if processed_receipt:
+            logger.info(f"Content {receipt_file.content_hash} already processed, returning receipt {processed_receipt.id}")
+            result = receipt_to_response(processed_receipt)
+            job = await session.run_sync(
+                lambda sync_session: create_job(sync_session, receipt_file, request.is_premium_user, result=result)
+            )
+            return job_to_response(job)
 
-    try:
-        
-        # Open PDF document once and share it
-    
-        doc = fitz.open(receipt_file.file_path)
-        
-        try:
-            if len(doc) > 10:  # Limit to 10 pages
-                raise HTTPException(status_code=400, detail="PDF has too many pages")
-
-            text = ""
-            print(request.is_premium_user,"request.is_premium_user")
-            if request.is_premium_user:
-                # Premium version: Use AI-based text extraction
-                for page_num in range(len(doc)):
-                    page = doc.load_page(page_num)
-                    pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))  # 300 DPI
-                    img = Image.open(io.BytesIO(pix.tobytes()))
-                    
-                    # Convert image to base64
-                    buffered = io.BytesIO()
-                    img.save(buffered, format="PNG")
-                    image_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-                    
-                    # Extract text using Together AI vision model
-                    page_text = await extract_text_pdf(image_base64)
-                    text += page_text + "\n\n"
-            else:
-                # Free version: Use conventional and OCR-based text extraction
-                # Pass the opened document to avoid reopening
-                text = await extract_text_conventional_with_file(doc)
-                if not text.strip():
-                    print("Couldn't extract text via conventional methods, trying OCR...")
-                    text = await extract_text_via_ocr_with_file(doc)
-                    print(text, "extracted_text: after OCR extraction")
-
-        finally:
-            # Always close the document
-            doc.close()
-
-        if not text.strip():
-            raise RuntimeError("No text extracted from PDF")
-        
-        print(text, "text")
+    job = await session.run_sync(
+        lambda sync_session: create_job(sync_session, receipt_file, request.is_premium_user)
+    )
+    job_pool.submit(job.id)
 
-        # Extract structured data using AI for both versions
-        extracted_data = await extract_receipt_data(text)
+    return job_to_response(job)
 
-        # Parse purchased_at with dateutil.parser
-        purchased_at = None
-        if extracted_data.purchased_at:
-            try:
-                # Parse the date string with dateutil.parser for flexibility
-                parsed_date = parse_date(extracted_data.purchased_at, fuzzy=True)
-                # Ensure the format is standardized to YYYY-MM-DD HH:MM:SS
-                purchased_at = parsed_date.replace(microsecond=0)
-            except ValueError as e:
-                print(f"Date parsing error: {str(e)}")
-                extracted_data.purchased_at = None  # Set to None if parsing fails
-
-        # Check for existing receipt to avoid duplicates
-        query = select(Receipt).where(Receipt.file_path == receipt_file.file_path)
-        existing_receipt = session.exec(query).first()
-
-        if existing_receipt:
-            # Update existing receipt
-            existing_receipt.merchant_name = extracted_data.merchant_name
-            existing_receipt.total_amount = extracted_data.total_amount
-            existing_receipt.purchased_at = purchased_at
-            existing_receipt.store_address = extracted_data.store_address
-            existing_receipt.phone_number = extracted_data.phone_number
-            existing_receipt.store_number = extracted_data.store_number
-            existing_receipt.cashier_number = extracted_data.cashier_number
-            existing_receipt.barcode_num = extracted_data.barcode_num
-            existing_receipt.items = extracted_data.items or []
-            existing_receipt.payment_details = extracted_data.payment_details or {}
-            existing_receipt.additional_info = extracted_data.additional_info or {}
-            existing_receipt.updated_at = datetime.now()
-            receipt = existing_receipt
-            session.add(receipt)
-        else:
-            # Create new Receipt record
-            receipt = Receipt(
-                merchant_name=extracted_data.merchant_name,
-                total_amount=extracted_data.total_amount,
-                purchased_at=purchased_at,
-                file_path=receipt_file.file_path,
-                store_address=extracted_data.store_address,
-                phone_number=extracted_data.phone_number,
-                store_number=extracted_data.store_number,
-                cashier_number=extracted_data.cashier_number,
-                barcode_num=extracted_data.barcode_num,
-                items=extracted_data.items or [],
-                payment_details=extracted_data.payment_details or {},
-                additional_info=extracted_data.additional_info or {},
-                created_at=datetime.now(),
-                updated_at=datetime.now()
-            )
-            session.add(receipt)
 
-        # Update ReceiptFile
-        receipt_file.is_processed = True
-        receipt_file.is_valid = True
-        receipt_file.invalid_reason = None
-        receipt_file.updated_at = datetime.now()
-        session.add(receipt_file)
-
-        session.commit()
-        session.refresh(receipt)
-
-        return {
-            "receipt_id": str(receipt.id),
-            "merchant_name": receipt.merchant_name,
-            "total_amount": receipt.total_amount,
-            "purchased_at": receipt.purchased_at.isoformat() if receipt.purchased_at else None,
-            "store_address": receipt.store_address,
-            "phone_number": receipt.phone_number,
-            "store_number": receipt.store_number,
-            "cashier_number": receipt.cashier_number,
-            "barcode_num": receipt.barcode_num,
-            "items": receipt.items,
-            "payment_details": receipt.payment_details,
-            "additional_info": receipt.additional_info,
-            "created_at": receipt.created_at.isoformat(),
-            "updated_at": receipt.updated_at.isoformat()
-        }
-    except RuntimeError as e:
-        receipt_file.is_valid = False
-        receipt_file.invalid_reason = str(e)
-        receipt_file.updated_at = datetime.now()
-        session.add(receipt_file)
-        session.commit()
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        session.rollback()
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+@router.post("/reextract")
+async def reextract(
+    request: ReextractRequest,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Re-run structured extraction on stored receipt text, skipping rasterization and OCR.
+
+    Selects active receipts whose extraction_version differs from the current
+    prompt and model version (or all matching receipts when force is set).
+
+    Args:
+        request: Optional receipt IDs, batch limit, concurrency and force flag.
+        session: Async database session.
+
+    Returns:
+        dict: Number of receipts selected and the outcome per receipt ID.
+    """
+    receipts = (await session.exec(
+        outdated_receipts_query(request.receipt_ids, request.force).limit(request.limit)
+    )).all()
+    outcomes = await reextract_receipts(session, receipts, concurrency=request.concurrency)
+    await session.commit()
+    return {"selected": len(receipts), "results": outcomes}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: uuid.UUID,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Retrieve the status of a receipt processing job.
+
+    Args:
+        job_id (uuid.UUID): The ID returned by POST /receipt/process/{file_id}.
+        session (AsyncSession): Database session.
+
+    Returns:
+        dict: Job status, timestamps, and the receipt data once completed.
+
+    Raises:
+        HTTPException: If the job is not found.
+    """
+    job = await session.get(ProcessingJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_response(job)
 
 
 
@@ -373,37 +336,82 @@ async def process_receipt(
 
 @router.get("/all_receipts")
 async def get_receipts(
-    session: Session = Depends(get_session),
-    page: int = Query(1, ge=1, description="Page number"),
+    session: AsyncSession = Depends(get_async_session),
+    page: int = Query(1, ge=1, description="Page number (page pagination)"),
     limit: int = Query(10, ge=1, le=100, description="Number of items per page"),
+    pagination: str = Query("page", pattern="^(page|cursor)$", description="page (offset) or cursor (keyset)"),
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor from a previous cursor page"),
+    sort_by: str = Query("purchased_at", pattern="^(purchased_at|created_at)$", description="Sort column"),
+    order: str = Query("desc", pattern="^(desc|asc)$", description="Sort order"),
+    include_total: bool = Query(False, description="Add a (cached) total count to cursor pages"),
+    merchant: Optional[str] = Query(None, description="Merchant name, case-insensitive"),
+    merchant_match: str = Query("prefix", pattern="^(prefix|exact)$", description="Match merchant as a prefix or exactly"),
+    purchased_from: Optional[datetime] = Query(None, description="Earliest purchase time"),
+    purchased_to: Optional[datetime] = Query(None, description="Latest purchase time"),
+    min_total: Optional[float] = Query(None, description="Minimum total amount"),
+    max_total: Optional[float] = Query(None, description="Maximum total amount"),
+    payment_method: Optional[str] = Query(None, description="Payment method, e.g. VISA or CASH"),
+    q: Optional[str] = Query(None, max_length=200, description="Full-text search over merchant, address and item names"),
 ):
     """
     List paginated receipts for the authenticated user.
 
+    Page pagination skips (page - 1) * limit rows, which gets slower on deep pages.
+    Cursor pagination, selected with pagination=cursor or by passing a cursor,
+    continues from the (sort key, id) of the last row seen and costs the same on
+    every page. Totals are cached for RECEIPT_COUNT_CACHE_SECONDS per filter set.
+    Filters combine with AND; q matches every word as a prefix.
+
     Args:
-        session (Session): Database session.
+        session (AsyncSession): Database session.
         page (int): Page number.
         limit (int): Items per page.
+        pagination (str): page or cursor.
+        cursor (str): Opaque cursor from a previous cursor page.
+        sort_by (str): purchased_at or created_at; ties are broken by receipt ID.
+        order (str): desc or asc.
+        include_total (bool): Add the total count to cursor pages.
+        merchant, merchant_match, purchased_from, purchased_to, min_total,
+        max_total, payment_method, q: Optional filters.
 
     Returns:
-        dict: Paginated list of Receipt objects with metadata.
+        dict: Paginated list of Receipt objects with metadata. Cursor pages carry
+        next_cursor and prev_cursor, which are null at either end.
 
     Raises:
-        HTTPException: If errors occur during retrieval.
+        HTTPException: If the cursor is invalid.
     """
+    filters = ReceiptFilters(
+        merchant=merchant, merchant_match=merchant_match,
+        purchased_from=purchased_from, purchased_to=purchased_to,
+        min_total=min_total, max_total=max_total,
+        payment_method=payment_method, q=q,
+    )
+    base_query = await receipt_list_query(session, filters)
+    count_key = filters.model_dump_json()
+
+    if pagination == "cursor" or cursor:
+        try:
+            rows, direction = await fetch_keyset_rows(session, base_query, sort_by, order, limit, cursor)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        response = {"limit": limit, **keyset_page(rows, sort_by, order, limit, direction, cursor is not None)}
+        if include_total:
+            response["total"] = await receipt_counts.count(session, count_key, base_query)
+        return response
 
     offset = (page - 1) * limit
 
-    total = session.exec(
-        select(func.count()).select_from(Receipt).where(Receipt.is_active == True)
-    ).one()
+    total = await receipt_counts.count(session, count_key, base_query)
 
-    receipts = session.exec(
-        select(Receipt)
-        .where(Receipt.is_active == True)
+    column = SORT_COLUMNS[sort_by]
+    ordering = (column.desc(), Receipt.id.desc()) if order == "desc" else (column.asc(), Receipt.id.asc())
+    receipts = (await session.exec(
+        base_query
+        .order_by(*ordering)
         .offset(offset)
         .limit(limit)
-    ).all()
+    )).all()
 
     return {
         "total": total,
@@ -416,10 +424,127 @@ async def get_receipts(
 
 
 
+@router.get("/items")
+async def get_items(
+    session: AsyncSession = Depends(get_async_session),
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(10, ge=1, le=100, description="Items per page"),
+    name: Optional[str] = Query(None, description="Item name, case-insensitive"),
+    name_match: str = Query("prefix", pattern="^(prefix|exact)$", description="Match name as a prefix or exactly"),
+    sku: Optional[str] = Query(None, description="SKU, UPC or item code"),
+    merchant: Optional[str] = Query(None, description="Merchant name prefix, case-insensitive"),
+    purchased_from: Optional[datetime] = Query(None, description="Earliest purchase time"),
+    purchased_to: Optional[datetime] = Query(None, description="Latest purchase time"),
+):
+    """
+    List line items of active receipts, newest purchase first.
+
+    Args:
+        session (AsyncSession): Database session.
+        page (int): Page number.
+        limit (int): Number of items per page.
+        name, name_match, sku, merchant, purchased_from, purchased_to: Optional filters.
+
+    Returns:
+        dict: Paginated items, each with its receipt's merchant_name and purchased_at.
+    """
+    filters = ItemFilters(
+        name=name, name_match=name_match, sku=sku, merchant=merchant,
+        purchased_from=purchased_from, purchased_to=purchased_to,
+    )
+    total = await receipt_counts.count(
+        session, "items:" + filters.model_dump_json(), count_statement=item_count_query(filters)
+    )
+
+    rows = (await session.exec(
+        item_list_query(filters)
+        .order_by(Receipt.purchased_at.desc(), ReceiptItem.receipt_id, ReceiptItem.position)
+        .offset((page - 1) * limit)
+        .limit(limit)
+    )).all()
+
+    return {
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "pages": ceil(total / limit),
+        "results": [
+            {**item.model_dump(), "merchant_name": merchant_name, "purchased_at": purchased_at}
+            for item, merchant_name, purchased_at in rows
+        ],
+    }
+
+
+@router.get("/items/summary")
+async def get_item_summary(
+    session: AsyncSession = Depends(get_async_session),
+    group_by: str = Query("name", pattern="^(name|sku)$", description="Group items by name or SKU"),
+    order_by: str = Query("spend", pattern="^(spend|quantity|receipts)$", description="Rank groups by"),
+    limit: int = Query(10, ge=1, le=100, description="Number of groups"),
+    name: Optional[str] = Query(None, description="Item name, case-insensitive"),
+    name_match: str = Query("prefix", pattern="^(prefix|exact)$", description="Match name as a prefix or exactly"),
+    sku: Optional[str] = Query(None, description="SKU, UPC or item code"),
+    merchant: Optional[str] = Query(None, description="Merchant name prefix, case-insensitive"),
+    purchased_from: Optional[datetime] = Query(None, description="Earliest purchase time"),
+    purchased_to: Optional[datetime] = Query(None, description="Latest purchase time"),
+):
+    """
+    Aggregate spend, quantity and receipt counts per item over active receipts.
+
+    For example, spend on an item: ?name=coffee; top SKUs: ?group_by=sku.
+
+    Args:
+        session (AsyncSession): Database session.
+        group_by (str): name (case-insensitive) or sku.
+        order_by (str): spend, quantity or receipts, highest first.
+        limit (int): Number of groups returned.
+        name, name_match, sku, merchant, purchased_from, purchased_to: Optional filters.
+
+    Returns:
+        dict: Groups with key, lines, receipts, quantity and spend.
+    """
+    filters = ItemFilters(
+        name=name, name_match=name_match, sku=sku, merchant=merchant,
+        purchased_from=purchased_from, purchased_to=purchased_to,
+    )
+    rows = (await session.exec(item_summary_query(filters, group_by, order_by, limit))).all()
+    return {
+        "group_by": group_by,
+        "order_by": order_by,
+        "results": [dict(row._mapping) for row in rows],
+    }
+
+
+@router.get("/stats/cache")
+async def get_cache_stats():
+    """
+    Report hit and miss counters for the structured-extraction cache.
+
+    Returns:
+        dict: Cache counters, or enabled=False when the cache is turned off.
+    """
+    if extraction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **extraction_cache.stats()}
+
+
+@router.get("/stats/llm")
+async def get_llm_stats():
+    """
+    Report retry, hedging and circuit breaker counters for LLM calls.
+
+    Returns:
+        dict: Counters, breaker state and recent latency percentiles.
+    """
+    return llm_client.stats()
+
+
+
+
 @router.get("/{receipt_id}")
 async def get_receipt(
     receipt_id: uuid.UUID,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     
 ):
     """
@@ -427,7 +552,7 @@ async def get_receipt(
 
     Args:
         receipt_id (uuid.UUID): The ID of the receipt to retrieve.
-        session (Session): Database session.
+        session (AsyncSession): Database session.
         
 
     Returns:
@@ -437,10 +562,37 @@ async def get_receipt(
         HTTPException: If the receipt is not found.
     """
 
-    receipt = session.exec(
+    receipt = (await session.exec(
         select(Receipt).where(Receipt.id == receipt_id, Receipt.is_active == True)
-    ).first()
+    )).first()
     if not receipt:
         raise HTTPException(status_code=404, detail="Receipt not found")
     return receipt
 
+
+@router.get("/{receipt_id}/items")
+async def get_receipt_items(
+    receipt_id: uuid.UUID,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Retrieve the line items of a receipt in printed order.
+
+    Args:
+        receipt_id (uuid.UUID): The ID of the receipt.
+        session (AsyncSession): Database session.
+
+    Returns:
+        list: ReceiptItem rows.
+
+    Raises:
+        HTTPException: If the receipt is not found.
+    """
+    receipt = (await session.exec(
+        select(Receipt.id).where(Receipt.id == receipt_id, Receipt.is_active == True)
+    )).first()
+    if not receipt:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return (await session.exec(
+        select(ReceiptItem).where(ReceiptItem.receipt_id == receipt_id).order_by(ReceiptItem.position)
+    )).all()
@@ -0,0 +1,49 @@
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class RequestBodyLimitMiddleware:
+    """
+    Reject request bodies larger than max_body_size before they are parsed.
+
+    Starlette reads and spools the whole multipart form before an endpoint
+    runs, so a size check inside the endpoint only limits what is copied
+    afterwards. This middleware answers 413 from the Content-Length header
+    without reading the body, and counts the bytes of bodies sent without
+    one (chunked encoding), stopping the read once the limit is passed.
+
+    Args:
+        app: The wrapped ASGI application.
+        max_body_size: Largest accepted request body in bytes.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body too large (Max : {self.max_body_size // (1024 * 1024)}mb)"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_size:
+            response = JSONResponse({"detail": detail}, status_code=413, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    # FastAPI re-raises HTTPException from body parsing, so this becomes a 413
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,222 @@
+"""
+Load-test the receipt read endpoints with the blocking and the async database layer.
+
+Seeds a SQLite database with receipts, then serves GET /receipt/all_receipts and
+GET /receipt/{id} from a uvicorn subprocess in three configurations and hits
+them with parallel clients from this process:
+
+    sync-echo  the previous layer: sync Session inside async endpoints, echo=True
+    sync       the same endpoints with SQL echo off
+    async      the current endpoints on AsyncSession (aiosqlite)
+
+Reports throughput, latency percentiles per endpoint and failed requests.
+
+The sync engines get a pool as large as --concurrency. With the previous
+default pool (5 + 10 overflow), more requests in flight than that deadlock: the
+event loop blocks on pool checkout while the connections it waits for are only
+released by session cleanup that needs the event loop.
+
+Run from the App folder:
+    python -m benchmarks.db_concurrency --receipts 2000 --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import atexit
+import logging
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from math import ceil
+
+if "SQL_CONNECTION" not in os.environ:
+    # The server subprocesses inherit this and share the seeded database
+    _tmp_dir = tempfile.mkdtemp(prefix="db_concurrency_")
+    atexit.register(shutil.rmtree, _tmp_dir, True)
+    os.environ["SQL_CONNECTION"] = f"sqlite:///{os.path.join(_tmp_dir, 'benchmark.db')}"
+os.environ.setdefault("TOGETHER_AI_API_KEY", "benchmark")
+
+import aiohttp
+import uvicorn
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query
+from sqlmodel import Session, SQLModel, create_engine, func, select
+
+from api.endpoints import receipt as receipt_endpoints
+from core.config import settings
+from db.session import engine
+from models.receipt_table import Receipt
+
+
+def seed(receipts: int) -> list:
+    SQLModel.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    rows = [
+        Receipt(
+            file_path=f"uploads/{uuid.uuid4().hex}.pdf",
+            merchant_name=f"STORE #{index % 50:03d}",
+            total_amount=round(random.uniform(1, 200), 2),
+            purchased_at=start + timedelta(hours=index),
+            items=[{"name": "WIDGET", "price": 1.25}],
+            payment_details={"method": "card"},
+            additional_info={},
+        )
+        for index in range(receipts)
+    ]
+    with Session(engine) as session:
+        session.add_all(rows)
+        session.commit()
+        return [str(receipt_id) for receipt_id in session.exec(select(Receipt.id)).all()]
+
+
+def blocking_app(echo: bool, pool_size: int) -> FastAPI:
+    """The receipt read endpoints as they were before the async layer."""
+    if echo:
+        # Keep the statement log off the terminal while still paying for it
+        logging.getLogger("sqlalchemy.engine.Engine").addHandler(logging.FileHandler(os.devnull))
+    sync_engine = create_engine(url=settings.SQL_CONNECTION, echo=echo, pool_size=pool_size)
+
+    def get_session():
+        with Session(sync_engine) as session:
+            yield session
+
+    router = APIRouter(prefix="/receipt")
+
+    @router.get("/all_receipts")
+    async def get_receipts(
+        session: Session = Depends(get_session),
+        page: int = Query(1, ge=1),
+        limit: int = Query(10, ge=1, le=100),
+    ):
+        offset = (page - 1) * limit
+        total = session.exec(
+            select(func.count()).select_from(Receipt).where(Receipt.is_active == True)
+        ).one()
+        receipts = session.exec(
+            select(Receipt).where(Receipt.is_active == True).offset(offset).limit(limit)
+        ).all()
+        return {"total": total, "page": page, "limit": limit, "pages": ceil(total / limit), "results": receipts}
+
+    @router.get("/{receipt_id}")
+    async def get_receipt(receipt_id: uuid.UUID, session: Session = Depends(get_session)):
+        receipt = session.exec(
+            select(Receipt).where(Receipt.id == receipt_id, Receipt.is_active == True)
+        ).first()
+        if not receipt:
+            raise HTTPException(status_code=404, detail="Receipt not found")
+        return receipt
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+def async_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(receipt_endpoints.router)
+    return app
+
+
+def create_app() -> FastAPI:
+    """uvicorn factory for the server subprocess; the mode comes from the environment."""
+    mode = os.environ["DB_BENCHMARK_MODE"]
+    if mode == "async":
+        return async_app()
+    return blocking_app(echo=mode == "sync-echo", pool_size=int(os.environ["DB_BENCHMARK_POOL_SIZE"]))
+
+
+def serve(mode: str, port: int, pool_size: int) -> subprocess.Popen:
+    env = {**os.environ, "DB_BENCHMARK_MODE": mode, "DB_BENCHMARK_POOL_SIZE": str(pool_size)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--factory", "benchmarks.db_concurrency:create_app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"Server for mode {mode} did not start")
+
+
+async def load(port: int, receipt_ids: list, requests: int, concurrency: int) -> dict:
+    """Send requests alternating between a random list page and a random receipt."""
+    latencies = {"all_receipts": [], "receipt": []}
+    errors = 0
+    pages = max(1, len(receipt_ids) // 20)
+    rng = random.Random(0)
+    plan = [
+        ("all_receipts", f"/receipt/all_receipts?page={rng.randint(1, pages)}&limit=20") if index % 2 == 0
+        else ("receipt", f"/receipt/{rng.choice(receipt_ids)}")
+        for index in range(requests)
+    ]
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(f"http://127.0.0.1:{port}", connector=connector) as http:
+        async def worker() -> None:
+            nonlocal errors
+            while not queue.empty():
+                name, path = queue.get_nowait()
+                start = time.perf_counter()
+                async with http.get(path) as response:
+                    await response.read()
+                if response.status != 200:
+                    errors += 1
+                    continue
+                latencies[name].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "errors": errors, **latencies}
+
+
+def percentile(values: list, q: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else float("nan")
+    return statistics.quantiles(values, n=100)[int(q) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    receipt_ids = seed(args.receipts)
+    modes = ["sync-echo", "sync", "async"]
+    print(f"receipts: {args.receipts}  requests: {args.requests}  concurrency: {args.concurrency}")
+    print(f"{'mode':<10} {'req/s':>8} {'list p50':>9} {'list p95':>9} {'get p50':>8} {'get p95':>8} {'errors':>7}  (ms)")
+    for mode in modes:
+        server = serve(mode, args.port, args.concurrency)
+        try:
+            asyncio.run(load(args.port, receipt_ids, min(50, args.requests), min(5, args.concurrency)))  # warm-up
+            result = asyncio.run(load(args.port, receipt_ids, args.requests, args.concurrency))
+        finally:
+            server.terminate()
+            server.wait()
+        listing, single = result["all_receipts"], result["receipt"]
+        print(
+            f"{mode:<10} {args.requests / result['elapsed']:>8.0f} "
+            f"{percentile(listing, 50) * 1000:>9.1f} {percentile(listing, 95) * 1000:>9.1f} "
+            f"{percentile(single, 50) * 1000:>8.1f} {percentile(single, 95) * 1000:>8.1f} {result['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
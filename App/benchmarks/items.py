@@ -0,0 +1,153 @@
+"""
+Compare item analytics over the receipt items JSON with the receipt_item table.
+
+Seeds a SQLite database with receipts and their line items, then answers the
+same questions twice: by loading every active receipt's items JSON and
+aggregating in Python (the only option before receipt_item), and through
+GET /receipt/items and GET /receipt/items/summary. Reports the median of
+--repeat runs.
+
+Run from the App folder:
+    python -m benchmarks.items --receipts 200000
+"""
+import argparse
+import atexit
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+if "SQL_CONNECTION" not in os.environ:
+    _tmp_dir = tempfile.mkdtemp(prefix="items_")
+    atexit.register(shutil.rmtree, _tmp_dir, True)
+    os.environ["SQL_CONNECTION"] = f"sqlite:///{os.path.join(_tmp_dir, 'benchmark.db')}"
+os.environ.setdefault("TOGETHER_AI_API_KEY", "benchmark")
+os.environ.setdefault("RECEIPT_COUNT_CACHE_SECONDS", "0")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from api.endpoints import receipt as receipt_endpoints
+from db.base import create_db_and_tables
+from db.session import engine
+from models.receipt_table import Receipt, ReceiptItem
+from services.receipts.utils import receipt_items_from_data
+
+
+PRODUCTS = [f"{adjective} {noun}" for adjective in (
+    "Organic", "Large", "Small", "Fresh", "Frozen", "Spicy", "Sweet", "Roasted", "Whole", "Lowfat",
+) for noun in ("Mango", "Salmon", "Coffee", "Bread", "Cheese", "Tomato", "Yogurt", "Almonds", "Spinach", "Batteries")]
+SKUS = {name: f"{index:06d}" for index, name in enumerate(PRODUCTS)}
+
+
+def seed(receipts: int) -> None:
+    create_db_and_tables()
+    rng = random.Random(0)
+    start = datetime(2020, 1, 1)
+    with Session(engine) as session:
+        for first in range(0, receipts, 10000):
+            receipt_rows, item_rows = [], []
+            for index in range(first, min(receipts, first + 10000)):
+                receipt_id = uuid.uuid4()
+                items = [
+                    {"name": name, "sku": SKUS[name], "quantity": quantity, "price": round(quantity * rng.uniform(1, 20), 2)}
+                    for name, quantity in ((rng.choice(PRODUCTS), rng.randint(1, 3)) for _ in range(rng.randint(1, 6)))
+                ]
+                receipt_rows.append({
+                    "id": receipt_id,
+                    "file_path": f"uploads/{index}.pdf",
+                    "merchant_name": f"STORE #{index % 500:03d}",
+                    "purchased_at": start + timedelta(minutes=rng.randint(0, 2_000_000)),
+                    "items": items,
+                    "is_active": True,
+                    "created_at": start + timedelta(seconds=index),
+                    "updated_at": start,
+                })
+                item_rows += [{"id": uuid.uuid4(), "receipt_id": receipt_id, **row} for row in receipt_items_from_data(items)]
+            session.bulk_insert_mappings(Receipt, receipt_rows)
+            session.bulk_insert_mappings(ReceiptItem, item_rows)
+            session.commit()
+
+
+def json_spend_on(name: str) -> float:
+    with Session(engine) as session:
+        receipts = session.exec(select(Receipt.items).where(Receipt.is_active == True)).all()
+    return sum(item["price"] for items in receipts for item in items or [] if item["name"].lower() == name)
+
+
+def json_top_skus(limit: int) -> list:
+    spend = defaultdict(float)
+    with Session(engine) as session:
+        for items in session.exec(select(Receipt.items).where(Receipt.is_active == True)).all():
+            for item in items or []:
+                spend[item["sku"]] += item["price"]
+    return sorted(spend.items(), key=lambda entry: -entry[1])[:limit]
+
+
+def json_item_lines(name: str, limit: int) -> list:
+    with Session(engine) as session:
+        receipts = session.exec(
+            select(Receipt.items, Receipt.merchant_name, Receipt.purchased_at).where(Receipt.is_active == True)
+        ).all()
+    lines = [
+        (purchased_at, merchant_name, item)
+        for items, merchant_name, purchased_at in receipts
+        for item in items or [] if item["name"].lower().startswith(name)
+    ]
+    return sorted(lines, key=lambda line: line[0], reverse=True)[:limit]
+
+
+def median_ms(run, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    seed(args.receipts)
+    print(f"seeded {args.receipts} receipts in {time.perf_counter() - start:.1f}s")
+
+    app = FastAPI()
+    app.include_router(receipt_endpoints.router)
+    with TestClient(app) as client:
+        def get(path: str, **params):
+            response = client.get(path, params=params)
+            response.raise_for_status()
+            return response.json()
+
+        cases = {
+            "spend on one item": (
+                lambda: json_spend_on("organic mango"),
+                lambda: get("/receipt/items/summary", name="organic mango", name_match="exact"),
+            ),
+            "top 10 SKUs": (
+                lambda: json_top_skus(10),
+                lambda: get("/receipt/items/summary", group_by="sku", limit=10),
+            ),
+            "item lines, page 1": (
+                lambda: json_item_lines("fresh salmon", 20),
+                lambda: get("/receipt/items", name="fresh salmon", limit=20),
+            ),
+        }
+        print(f"{'query':<20} {'json ms':>10} {'table ms':>10}")
+        for name, (json_run, table_run) in cases.items():
+            print(f"{name:<20} {median_ms(json_run, args.repeat):>10.1f} {median_ms(table_run, args.repeat):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Run the premium extraction pipeline end to end against the bundled fake LLM server.
+
+Starts fake_llm_server in-process on the port from LLM_BASE_URL, then pushes
+synthetic scanned receipts through extract_receipt_text (vision) and
+extract_structured_data with the given concurrency. Reports throughput,
+per-receipt latency and the resilience counters. No network access or API key
+is needed.
+
+Run from the App folder:
+    python -m benchmarks.llm_pipeline --receipts 50 --concurrency 8 --latency-mean 0.5 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+os.environ.setdefault("SQL_CONNECTION", "sqlite:///./benchmark.db")
+os.environ.setdefault("TOGETHER_AI_API_KEY", "benchmark")
+os.environ.setdefault("LLM_PROVIDER", "openai_compatible")
+os.environ.setdefault("LLM_BASE_URL", "http://127.0.0.1:8100/v1")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+import uvicorn
+
+import fake_llm_server
+from benchmarks.ocr_scaling import build_scanned_pdf
+from core.config import settings
+from services.llm.utils import client
+from services.processing.utils import extract_receipt_text, extract_structured_data
+
+
+def start_fake_server(options: argparse.Namespace) -> uvicorn.Server:
+    url = urlparse(settings.LLM_BASE_URL)
+    server = uvicorn.Server(uvicorn.Config(
+        fake_llm_server.create_app(options), host=url.hostname, port=url.port, log_level="warning",
+    ))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run(path: str, receipts: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            text, _ = await extract_receipt_text(path, is_premium_user=True)
+            await extract_structured_data(text)
+            latencies.append(time.perf_counter() - start)
+
+    results = await asyncio.gather(*(one() for _ in range(receipts)), return_exceptions=True)
+    failures = [result for result in results if isinstance(result, BaseException)]
+    await client.aclose()
+    return sorted(latencies), failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args, server_argv = parser.parse_known_args()
+    server_options = fake_llm_server.parse_args(server_argv)
+
+    server = start_fake_server(server_options)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "scanned.pdf")
+            build_scanned_pdf(path, args.pages)
+
+            start = time.perf_counter()
+            latencies, failures = asyncio.run(run(path, args.receipts, args.concurrency))
+            elapsed = time.perf_counter() - start
+    finally:
+        server.should_exit = True
+
+    print(f"receipts: {args.receipts}  concurrency: {args.concurrency}  failed: {len(failures)}")
+    print(f"elapsed: {elapsed:.2f}s  throughput: {args.receipts / elapsed:.2f} receipts/s")
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"latency p50: {p50 * 1000:.0f} ms  p95: {p95 * 1000:.0f} ms")
+    for name, value in client.stats().items():
+        print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
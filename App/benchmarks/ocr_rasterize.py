@@ -0,0 +1,69 @@
+"""
+Compare per-page OCR timings for the temp-PNG path and the in-memory path.
+
+"before" reproduces the previous helpers: save the pixmap to a temporary PNG,
+reopen it with PIL, OCR it, then sleep 0.1 s before deleting the file.
+"after" wraps the pixmap samples directly with pixmap_to_image.
+
+Run from the App folder:
+    python -m benchmarks.ocr_rasterize --pages 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("SQL_CONNECTION", "sqlite:///./benchmark.db")
+os.environ.setdefault("TOGETHER_AI_API_KEY", "benchmark")
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+
+from benchmarks.ocr_scaling import build_scanned_pdf
+from services.pdf.utils import OCR_DPI, pixmap_to_image
+
+
+def ocr_page_before(page) -> float:
+    start = time.perf_counter()
+    pix = page.get_pixmap(matrix=fitz.Matrix(OCR_DPI/72, OCR_DPI/72))
+    temp_filename = tempfile.mktemp(suffix=".png")
+    pix.save(temp_filename)
+    img = Image.open(temp_filename)
+    pytesseract.image_to_string(img)
+    img.close()
+    time.sleep(0.1)
+    os.remove(temp_filename)
+    return time.perf_counter() - start
+
+
+def ocr_page_after(page) -> float:
+    start = time.perf_counter()
+    pix = page.get_pixmap(matrix=fitz.Matrix(OCR_DPI/72, OCR_DPI/72))
+    pytesseract.image_to_string(pixmap_to_image(pix))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scanned.pdf")
+        build_scanned_pdf(path, args.pages)
+
+        with fitz.open(path) as doc:
+            print(f"{'page':>4} {'before (s)':>11} {'after (s)':>10} {'saved':>7}")
+            total_before = total_after = 0.0
+            for page_num, page in enumerate(doc):
+                before = ocr_page_before(page)
+                after = ocr_page_after(page)
+                total_before += before
+                total_after += after
+                print(f"{page_num:>4} {before:>11.3f} {after:>10.3f} {before - after:>7.3f}")
+            print(f"{'mean':>4} {total_before / len(doc):>11.3f} {total_after / len(doc):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark parallel per-page OCR on synthetic scanned receipts.
+
+Builds an image-only multi-page PDF (each page is a rasterized receipt, like a
+scan) and times extract_text_via_ocr_parallel with 1..N worker processes, for
+each OCR engine (one tesseract process per page, or per batch of pages).
+
+Run from the App folder:
+    python -m benchmarks.ocr_scaling --pages 10 --max-workers 4 --engines per_page,batch
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("SQL_CONNECTION", "sqlite:///./benchmark.db")
+os.environ.setdefault("TOGETHER_AI_API_KEY", "benchmark")
+
+import fitz  # PyMuPDF
+
+from core.config import settings
+from services.pdf.utils import OCR_ENGINES, extract_text_via_ocr_parallel
+
+
+def build_scanned_pdf(path: str, pages: int, dpi: int = 150) -> None:
+    """Write a PDF whose pages are images of synthetic receipts."""
+    out = fitz.open()
+    for page_num in range(pages):
+        src = fitz.open()
+        page = src.new_page(width=226, height=600)  # 80 mm thermal roll
+        lines = [f"STORE #{page_num:03d}", "123 MAIN ST", "(555) 010-0000", ""]
+        lines += [f"ITEM {i:02d} WIDGET        {i * 1.25:6.2f}" for i in range(1, 25)]
+        lines += ["", "TOTAL               30.00", "2024-05-28 14:31"]
+        page.insert_text((10, 20), "\n".join(lines), fontsize=7, fontname="cour")
+        pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72))
+        scan = out.new_page(width=page.rect.width, height=page.rect.height)
+        scan.insert_image(scan.rect, pixmap=pix)
+        src.close()
+    out.save(path)
+    out.close()
+
+
+async def run(path: str, pages: int, workers: int, engine: str) -> float:
+    settings.OCR_ENGINE = engine
+    settings.OCR_WORKERS = workers
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        # Warm the pool so process start-up is not part of the measurement
+        await asyncio.gather(*[asyncio.get_running_loop().run_in_executor(executor, abs, 0) for _ in range(workers)])
+        start = time.perf_counter()
+        await extract_text_via_ocr_parallel(path, pages, executor=executor)
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--engines", default=",".join(OCR_ENGINES), help="Comma-separated OCR engines to compare")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scanned.pdf")
+        build_scanned_pdf(path, args.pages)
+
+        baseline = None
+        print(f"{'engine':>9} {'workers':>7} {'seconds':>9} {'s/page':>8} {'speedup':>8}")
+        for engine in args.engines.split(","):
+            for workers in range(1, args.max_workers + 1):
+                elapsed = asyncio.run(run(path, args.pages, workers, engine))
+                baseline = baseline or elapsed
+                print(f"{engine:>9} {workers:>7} {elapsed:>9.2f} {elapsed / args.pages:>8.3f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compare page (OFFSET) and cursor (keyset) pagination of /receipt/all_receipts.
+
+Seeds a SQLite database with receipts, then times requests for pages at
+increasing depth in both modes. Cursor pages are reached by following
+next_cursor, and each step is timed on its own. Counts are uncached
+(RECEIPT_COUNT_CACHE_SECONDS=0) unless overridden.
+
+Run from the App folder:
+    python -m benchmarks.pagination --receipts 200000 --limit 20
+"""
+import argparse
+import atexit
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+if "SQL_CONNECTION" not in os.environ:
+    _tmp_dir = tempfile.mkdtemp(prefix="pagination_")
+    atexit.register(shutil.rmtree, _tmp_dir, True)
+    os.environ["SQL_CONNECTION"] = f"sqlite:///{os.path.join(_tmp_dir, 'benchmark.db')}"
+os.environ.setdefault("TOGETHER_AI_API_KEY", "benchmark")
+os.environ.setdefault("RECEIPT_COUNT_CACHE_SECONDS", "0")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel
+
+from api.endpoints import receipt as receipt_endpoints
+from db.session import engine
+from models.receipt_table import Receipt
+
+
+def seed(receipts: int) -> None:
+    SQLModel.metadata.create_all(engine)
+    rng = random.Random(0)
+    start = datetime(2020, 1, 1)
+    with Session(engine) as session:
+        for first in range(0, receipts, 10000):
+            session.bulk_insert_mappings(Receipt, [
+                {
+                    "id": uuid.uuid4(),
+                    "file_path": f"uploads/{index}.pdf",
+                    "merchant_name": f"STORE #{index % 500:03d}",
+                    "total_amount": round(rng.uniform(1, 200), 2),
+                    "purchased_at": None if index % 50 == 0 else start + timedelta(minutes=rng.randint(0, 2_000_000)),
+                    "is_active": True,
+                    "created_at": start + timedelta(seconds=index),
+                    "updated_at": start,
+                }
+                for index in range(first, min(receipts, first + 10000))
+            ])
+        session.commit()
+
+
+def timed_get(client: TestClient, params: dict) -> tuple:
+    start = time.perf_counter()
+    response = client.get("/receipt/all_receipts", params=params)
+    response.raise_for_status()
+    return time.perf_counter() - start, response.json()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    seed(args.receipts)
+    app = FastAPI()
+    app.include_router(receipt_endpoints.router)
+    pages = args.receipts // args.limit
+    depths = sorted({1, 10, 100, pages // 10, pages // 2, pages} - {0})
+
+    print(f"receipts: {args.receipts}  limit: {args.limit}")
+    print(f"{'page':>8} {'offset ms':>10} {'cursor ms':>10}")
+    with TestClient(app) as client:
+        timed_get(client, {"limit": args.limit})  # warm-up
+        cursor_times = {}
+        params = {"pagination": "cursor", "limit": args.limit}
+        for page in range(1, pages + 1):
+            elapsed, body = timed_get(client, params)
+            if page in depths:
+                cursor_times[page] = elapsed
+            if not body["next_cursor"]:
+                break
+            params = {"cursor": body["next_cursor"], "limit": args.limit}
+
+        for page in depths:
+            offset_time, _ = timed_get(client, {"page": page, "limit": args.limit})
+            print(f"{page:>8} {offset_time * 1000:>10.1f} {cursor_times.get(page, float('nan')) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Time filtered and full-text receipt listings on a large synthetic table.
+
+Seeds a SQLite database with receipts whose merchants, addresses, items and
+payment methods are drawn from small vocabularies (inserted through the
+receipt_fts triggers), then times GET /receipt/all_receipts with each filter,
+in cursor mode without totals. Reports the median of --repeat runs.
+
+Run from the App folder:
+    python -m benchmarks.search --receipts 1000000
+"""
+import argparse
+import atexit
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+if "SQL_CONNECTION" not in os.environ:
+    _tmp_dir = tempfile.mkdtemp(prefix="search_")
+    atexit.register(shutil.rmtree, _tmp_dir, True)
+    os.environ["SQL_CONNECTION"] = f"sqlite:///{os.path.join(_tmp_dir, 'benchmark.db')}"
+os.environ.setdefault("TOGETHER_AI_API_KEY", "benchmark")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from api.endpoints import receipt as receipt_endpoints
+from db.base import create_db_and_tables
+from db.session import engine
+from models.receipt_table import Receipt
+
+
+MERCHANTS = [f"{prefix} {suffix}" for prefix in (
+    "Whole", "Trader", "Lucky", "Corner", "Blue", "Green", "Harbor", "Summit", "Maple", "Golden",
+) for suffix in ("Foods", "Market", "Deli", "Grocer", "Cafe", "Pharmacy", "Hardware", "Books", "Bakery", "Outfitters")]
+ITEMS = [f"{adjective} {noun}" for adjective in (
+    "Organic", "Large", "Small", "Fresh", "Frozen", "Spicy", "Sweet", "Roasted", "Whole", "Lowfat",
+) for noun in ("Mango", "Salmon", "Coffee", "Bread", "Cheese", "Tomato", "Yogurt", "Almonds", "Spinach", "Batteries")]
+PAYMENT_METHODS = ["VISA", "MASTERCARD", "AMEX", "DEBIT CARD", "CASH"]
+
+
+def seed(receipts: int) -> None:
+    create_db_and_tables()
+    rng = random.Random(0)
+    start = datetime(2020, 1, 1)
+    with Session(engine) as session:
+        for first in range(0, receipts, 20000):
+            session.bulk_insert_mappings(Receipt, [
+                {
+                    "id": uuid.uuid4(),
+                    "file_path": f"uploads/{index}.pdf",
+                    "merchant_name": rng.choice(MERCHANTS),
+                    "store_address": f"{rng.randint(1, 9999)} Main St, Springfield",
+                    "total_amount": round(rng.uniform(1, 300), 2),
+                    "purchased_at": start + timedelta(minutes=rng.randint(0, 3_000_000)),
+                    "payment_method": rng.choice(PAYMENT_METHODS),
+                    "items": [{"name": name, "price": 1.0} for name in rng.sample(ITEMS, 3)]
+                    + ([{"name": "Saffron Threads", "price": 12.0}] if index % 10000 == 0 else []),
+                    "is_active": True,
+                    "created_at": start + timedelta(seconds=index),
+                    "updated_at": start,
+                }
+                for index in range(first, min(receipts, first + 20000))
+            ])
+            session.commit()
+
+
+QUERIES = {
+    "no filter": {},
+    "merchant prefix": {"merchant": "harbor b"},
+    "merchant exact": {"merchant": "summit deli", "merchant_match": "exact"},
+    "purchased range": {"purchased_from": "2022-03-01T00:00:00", "purchased_to": "2022-03-02T00:00:00"},
+    "amount range": {"min_total": 299.5},
+    "payment method": {"payment_method": "amex"},
+    "search rare item": {"q": "saffron"},
+    "search common": {"q": "organic mango"},
+    "search + merchant": {"q": "salmon", "merchant": "lucky"},
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    seed(args.receipts)
+    print(f"seeded {args.receipts} receipts in {time.perf_counter() - start:.1f}s")
+
+    app = FastAPI()
+    app.include_router(receipt_endpoints.router)
+    print(f"{'query':<20} {'median ms':>10} {'rows':>6}")
+    with TestClient(app) as client:
+        for name, params in QUERIES.items():
+            params = {"pagination": "cursor", "limit": args.limit, **params}
+            timings = []
+            for _ in range(args.repeat):
+                begin = time.perf_counter()
+                response = client.get("/receipt/all_receipts", params=params)
+                response.raise_for_status()
+                timings.append(time.perf_counter() - begin)
+            rows = len(response.json()["results"])
+            print(f"{name:<20} {statistics.median(timings) * 1000:>10.1f} {rows:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Measure the find_tables() time saved by the ruling-line pre-check.
+
+Builds a text-layer PDF where some pages are plain thermal-printer receipts and
+the rest carry a ruled item table, then extracts every page with
+TABLE_DETECTION set to "always" and to "auto" and compares time and output.
+
+Run from the App folder:
+    python -m benchmarks.table_gate --pages 20 --table-every 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("SQL_CONNECTION", "sqlite:///./benchmark.db")
+os.environ.setdefault("TOGETHER_AI_API_KEY", "benchmark")
+
+import fitz  # PyMuPDF
+
+from core.config import settings
+from services.pdf import utils as pdf_utils
+
+
+def build_text_pdf(path: str, pages: int, table_every: int) -> None:
+    """Write a text-layer PDF; every table_every-th page draws its items in a ruled table."""
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page(width=226, height=600)
+        header = [f"STORE #{page_num:03d}", "123 MAIN ST", "(555) 010-0000", ""]
+        page.insert_text((10, 20), "\n".join(header), fontsize=7, fontname="cour")
+        items = [(f"ITEM {i:02d} WIDGET", f"{i * 1.25:6.2f}") for i in range(1, 25)]
+        top = 70
+        if table_every and page_num % table_every == 0:
+            row_height = 12
+            for index, (name, price) in enumerate(items):
+                y = top + index * row_height
+                page.draw_rect(fitz.Rect(10, y, 150, y + row_height), width=0.5)
+                page.draw_rect(fitz.Rect(150, y, 216, y + row_height), width=0.5)
+                page.insert_text((13, y + 9), name, fontsize=7, fontname="cour")
+                page.insert_text((153, y + 9), price, fontsize=7, fontname="cour")
+        else:
+            lines = [f"{name}        {price}" for name, price in items]
+            page.insert_text((10, top), "\n".join(lines), fontsize=7, fontname="cour")
+        page.insert_text((10, 380), "TOTAL               30.00\n2024-05-28 14:31", fontsize=7, fontname="cour")
+    doc.save(path)
+
+
+def extract_all(doc: "fitz.Document", mode: str) -> tuple:
+    settings.TABLE_DETECTION = mode
+    start = time.perf_counter()
+    texts = [pdf_utils._extract_page_text_conventional(page) for page in doc]
+    return time.perf_counter() - start, texts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--table-every", type=int, default=4)
+    args = parser.parse_args()
+
+    pdf_utils.logger.disabled = True
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "receipts.pdf")
+        build_text_pdf(path, args.pages, args.table_every)
+        with fitz.open(path) as doc:
+            extract_all(doc, "always")  # warm-up
+            always_time, always_texts = extract_all(doc, "always")
+            auto_time, auto_texts = extract_all(doc, "auto")
+            gated = sum(1 for page in doc if pdf_utils.should_detect_tables(page, "auto"))
+
+    print(f"pages: {args.pages}  pages passed to find_tables in auto mode: {gated}")
+    print(f"{'mode':<8} {'total ms':>10} {'ms/page':>10}")
+    for mode, elapsed in (("always", always_time), ("auto", auto_time)):
+        print(f"{mode:<8} {elapsed * 1000:>10.1f} {elapsed / args.pages * 1000:>10.2f}")
+    print(f"identical output: {always_texts == auto_texts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare vision-model payload size and encode time across image profiles.
+
+"legacy" reproduces the previous premium path: render at 300 DPI in color,
+encode with pix.tobytes(), decode into PIL and re-encode as PNG. The other
+rows use prepare_page_image with the listed profile.
+
+Run from the App folder:
+    python -m benchmarks.vision_payload --pages 3
+"""
+import argparse
+import base64
+import io
+import os
+import tempfile
+import time
+
+os.environ.setdefault("SQL_CONNECTION", "sqlite:///./benchmark.db")
+os.environ.setdefault("TOGETHER_AI_API_KEY", "benchmark")
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from benchmarks.ocr_scaling import build_scanned_pdf
+from models.schema import VisionImageProfile
+from services.pdf.utils import prepare_page_image
+
+
+PROFILES = {
+    "png-300-color": VisionImageProfile(dpi=300, grayscale=False, crop_margins=False, max_side=None, image_format="PNG"),
+    "jpeg-200-gray": VisionImageProfile(),
+    "jpeg-150-gray-1600": VisionImageProfile(dpi=150, max_side=1600, quality=75),
+    "webp-200-gray": VisionImageProfile(image_format="WEBP", quality=75),
+    "webp-150-gray-1280": VisionImageProfile(dpi=150, max_side=1280, image_format="WEBP", quality=70),
+}
+
+
+def encode_legacy(page) -> bytes:
+    pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
+    img = Image.open(io.BytesIO(pix.tobytes()))
+    buffered = io.BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scanned.pdf")
+        build_scanned_pdf(path, args.pages)
+
+        encoders = {"legacy": encode_legacy}
+        for name, profile in PROFILES.items():
+            encoders[name] = lambda page, profile=profile: prepare_page_image(page, profile)[0]
+
+        with fitz.open(path) as doc:
+            print(f"{'profile':<20} {'base64 KB/page':>15} {'encode ms/page':>15}")
+            for name, encode in encoders.items():
+                total_bytes = 0
+                start = time.perf_counter()
+                for page in doc:
+                    total_bytes += len(base64.b64encode(encode(page)))
+                elapsed = time.perf_counter() - start
+                print(f"{name:<20} {total_bytes / len(doc) / 1024:>15.1f} {elapsed / len(doc) * 1000:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
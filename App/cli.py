@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import uuid
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+load_dotenv()
+
+from db.fts import RECEIPT_FTS_REBUILD
+from db.session import engine
+from models.receipt_table import ReceiptFile
+from services.llm.utils import EXTRACTION_VERSION
+from services.processing.utils import outdated_receipts_query, process_receipt_files_batch, reextract_receipts
+
+
+async def process_batch(args: argparse.Namespace) -> None:
+    """Process uploaded receipt files in chunks, sharing LLM calls across each chunk."""
+    with Session(engine) as session:
+        query = select(ReceiptFile).order_by(ReceiptFile.created_at)
+        if args.file_ids:
+            query = query.where(ReceiptFile.id.in_([uuid.UUID(file_id) for file_id in args.file_ids]))
+        elif not args.include_processed:
+            query = query.where(ReceiptFile.is_processed == False)
+        if args.limit:
+            query = query.limit(args.limit)
+        receipt_files = session.exec(query).all()
+
+        print(f"Processing {len(receipt_files)} receipt files")
+        succeeded = failed = 0
+        for start in range(0, len(receipt_files), args.chunk_size):
+            chunk = receipt_files[start:start + args.chunk_size]
+            outcomes = await process_receipt_files_batch(
+                session, chunk, args.premium, concurrency=args.concurrency
+            )
+            for file_id, outcome in outcomes.items():
+                if outcome.startswith("error: "):
+                    failed += 1
+                    print(f"{file_id}: {outcome}")
+                else:
+                    succeeded += 1
+            print(f"{start + len(chunk)}/{len(receipt_files)} done ({succeeded} ok, {failed} failed)")
+
+
+async def reextract(args: argparse.Namespace) -> None:
+    """Re-run structured extraction on stored receipt text whose version is out of date."""
+    receipt_ids = [uuid.UUID(receipt_id) for receipt_id in args.receipt_ids] if args.receipt_ids else None
+    with Session(engine) as session:
+        query = outdated_receipts_query(receipt_ids, args.force)
+        if args.limit:
+            query = query.limit(args.limit)
+        receipts = session.exec(query).all()
+
+        print(f"Re-extracting {len(receipts)} receipts to version {EXTRACTION_VERSION}")
+        succeeded = failed = 0
+        for start in range(0, len(receipts), args.chunk_size):
+            chunk = receipts[start:start + args.chunk_size]
+            outcomes = await reextract_receipts(session, chunk, concurrency=args.concurrency)
+            session.commit()
+            for receipt_id, outcome in outcomes.items():
+                if outcome.startswith("error: "):
+                    failed += 1
+                    print(f"{receipt_id}: {outcome}")
+                else:
+                    succeeded += 1
+            print(f"{start + len(chunk)}/{len(receipts)} done ({succeeded} ok, {failed} failed)")
+
+
+async def rebuild_search_index(args: argparse.Namespace) -> None:
+    """Refill the receipt_fts full-text index from the receipt table (SQLite only)."""
+    if engine.dialect.name != "sqlite":
+        print("The full-text index only exists on SQLite")
+        return
+    with Session(engine) as session:
+        for statement in RECEIPT_FTS_REBUILD:
+            session.exec(text(statement))
+        session.commit()
+        count = session.exec(text("SELECT count(*) FROM receipt_fts")).one()[0]
+    print(f"Rebuilt the search index for {count} receipts")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Receipt processing maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("process-batch", help="Process uploaded receipts with batched LLM extraction")
+    batch.add_argument("--file-ids", nargs="*", help="Receipt file IDs to process (default: all unprocessed)")
+    batch.add_argument("--include-processed", action="store_true", help="Also reprocess already processed files")
+    batch.add_argument("--premium", action="store_true", help="Use AI vision extraction for text")
+    batch.add_argument("--limit", type=int, default=None, help="Maximum number of files")
+    batch.add_argument("--chunk-size", type=int, default=50, help="Files per processing chunk")
+    batch.add_argument("--concurrency", type=int, default=4, help="Files whose text is extracted at once")
+    batch.set_defaults(handler=process_batch)
+
+    redo = subparsers.add_parser("reextract", help="Re-run LLM extraction on stored text of outdated receipts")
+    redo.add_argument("--receipt-ids", nargs="*", help="Receipt IDs to re-extract (default: all outdated)")
+    redo.add_argument("--force", action="store_true", help="Also re-extract receipts at the current version")
+    redo.add_argument("--limit", type=int, default=None, help="Maximum number of receipts")
+    redo.add_argument("--chunk-size", type=int, default=200, help="Receipts per chunk")
+    redo.add_argument("--concurrency", type=int, default=8, help="LLM extractions in flight at once")
+    redo.set_defaults(handler=reextract)
+
+    search = subparsers.add_parser("rebuild-search-index", help="Refill the receipt full-text search index")
+    search.set_defaults(handler=rebuild_search_index)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
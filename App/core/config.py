@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
 
@@ -14,6 +16,114 @@ class Settings(BaseSettings):
     SQL_CONNECTION: str
     TOGETHER_AI_API_KEY:str
 
+    # Async driver URL for the API endpoints; derived from SQL_CONNECTION when unset
+    # (sqlite:// becomes sqlite+aiosqlite://, postgresql:// becomes postgresql+asyncpg://)
+    SQL_ASYNC_CONNECTION: Optional[str] = None
+
+    # Connection pool shared by each engine, and SQL statement logging
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_PRE_PING: bool = True
+    SQL_ECHO: bool = False
+
+    # How long receipt list totals are reused before counting again
+    RECEIPT_COUNT_CACHE_SECONDS: float = 30.0
+
+    # Full-text searches matching at most this many receipts read them by rowid and
+    # sort them; broader searches walk the listing index instead
+    SEARCH_DIRECT_MATCH_LIMIT: int = 2000
+
+    # Override the Together API endpoint, e.g. to point at a local fake server
+    TOGETHER_BASE_URL: Optional[str] = None
+
+    # LLM backend: "together" or "openai_compatible" (any OpenAI-style /chat/completions API,
+    # including the bundled fake_llm_server.py)
+    LLM_PROVIDER: str = "together"
+    LLM_BASE_URL: str = "http://127.0.0.1:8100/v1"
+    LLM_API_KEY: Optional[str] = None
+
+    # Number of background workers running receipt processing jobs
+    JOB_WORKERS: int = 2
+    # A running job's lease is renewed every third of this; jobs whose lease lapsed
+    # (their process died) are picked up again by any server process
+    JOB_LEASE_SECONDS: int = 60
+
+    # Number of processes used to render and OCR pages in parallel (defaults to CPU count)
+    OCR_WORKERS: Optional[int] = None
+
+    # OCR engine: "batch" runs one tesseract process per group of pages through a list
+    # file, "per_page" runs one per page. Language, page segmentation and engine mode
+    # are passed to every call.
+    OCR_ENGINE: str = "batch"
+    OCR_BATCH_SIZE: int = 8
+    OCR_LANG: str = "eng"
+    OCR_PSM: Optional[int] = None
+    OCR_OEM: Optional[int] = None
+
+    # Page preprocessing before OCR (grayscale, crop, Otsu binarization, deskew) and
+    # choosing the render DPI from the measured text line height
+    OCR_PREPROCESS: bool = True
+    OCR_ADAPTIVE_DPI: bool = True
+
+    # On-disk cache of per-page renders and OCR/vision text, keyed by page content
+    PAGE_CACHE_ENABLED: bool = True
+    PAGE_CACHE_DIR: str = "page_cache"
+    PAGE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Maximum number of concurrent vision model calls per document
+    VISION_MAX_CONCURRENCY: int = 4
+
+    # Table detection on text pages: "auto" runs find_tables() only when the page has
+    # ruling lines, "always" or "never" force it on or off
+    TABLE_DETECTION: str = "auto"
+
+    # Page image preparation for the vision model
+    VISION_DPI: int = 200
+    VISION_GRAYSCALE: bool = True
+    VISION_CROP_MARGINS: bool = True
+    VISION_MAX_SIDE: Optional[int] = 2000
+    VISION_IMAGE_FORMAT: str = "JPEG"
+    VISION_IMAGE_QUALITY: int = 80
+
+    # Cache for structured-extraction results
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "llm_cache.db"
+    LLM_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    LLM_CACHE_MAX_ENTRIES: int = 100_000
+    LLM_CACHE_MEMORY_ENTRIES: int = 1024
+
+    # Rule-based extraction; the LLM is only asked for fields below the threshold
+    RULES_ENABLED: bool = True
+    RULES_CONFIDENCE_THRESHOLD: float = 0.8
+
+    # Batched structured extraction
+    LLM_BATCH_TOKEN_BUDGET: int = 6000
+    LLM_BATCH_MAX_ITEMS: int = 8
+    LLM_BATCH_OUTPUT_TOKENS_PER_ITEM: int = 600
+
+    # Stream structured-extraction completions and stop once the JSON object closes
+    LLM_STREAMING: bool = True
+
+    # Compact receipt text (duplicate tables, whitespace, junk lines, footer boilerplate) before prompting
+    PROMPT_COMPACTION_ENABLED: bool = True
+    PROMPT_FOOTER_MAX_LINES: int = 5
+
+    # Resilience for LLM calls: retries with jittered backoff, per-attempt timeout,
+    # hedged requests after the observed p95 latency, and a circuit breaker
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_RETRY_MAX_DELAY: float = 8.0
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_HEDGING_ENABLED: bool = False
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+
+    # Fall back to OCR text and rule-based extraction while the LLM provider is unavailable
+    LLM_FALLBACK_ENABLED: bool = True
+
     
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
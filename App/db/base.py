@@ -1,5 +1,6 @@
 from sqlmodel import SQLModel
 from .session import engine
+from . import fts  # noqa: F401  registers the receipt FTS5 table and triggers
 
 
 def create_db_and_tables():
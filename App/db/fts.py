@@ -0,0 +1,50 @@
+from sqlalchemy import DDL, event
+
+from models.receipt_table import Receipt
+
+
+# Item names indexed for a receipt: the "name" of every object in its items JSON
+_ITEM_NAMES_SQL = (
+    "(SELECT group_concat(json_extract(value, '$.name'), ' ') "
+    "FROM json_each(CASE WHEN json_valid({row}.items) THEN {row}.items ELSE '[]' END) "
+    "WHERE type = 'object')"
+)
+
+_INSERT_ROW_SQL = (
+    "INSERT INTO receipt_fts(rowid, merchant_name, store_address, item_names) "
+    "VALUES (new.search_rowid, new.merchant_name, new.store_address, " + _ITEM_NAMES_SQL.format(row="new") + ");"
+)
+
+# SQLite FTS5 index over merchant, address and line-item names, kept in sync by
+# triggers so every insert or update through process_receipt (or anything else)
+# is searchable immediately. receipt has a UUID primary key, so its implicit
+# rowid can be renumbered by VACUUM or a table rebuild; FTS rows are keyed on
+# receipt.search_rowid instead, an ordinary column the insert trigger fills.
+RECEIPT_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS receipt_fts USING fts5("
+    "merchant_name, store_address, item_names, tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS receipt_fts_insert AFTER INSERT ON receipt BEGIN "
+    "UPDATE receipt SET search_rowid = (SELECT coalesce(max(search_rowid), 0) + 1 FROM receipt) "
+    "WHERE rowid = new.rowid AND search_rowid IS NULL; "
+    "INSERT INTO receipt_fts(rowid, merchant_name, store_address, item_names) "
+    "SELECT search_rowid, merchant_name, store_address, " + _ITEM_NAMES_SQL.format(row="receipt") + " "
+    "FROM receipt WHERE rowid = new.rowid; END",
+    "CREATE TRIGGER IF NOT EXISTS receipt_fts_update AFTER UPDATE OF merchant_name, store_address, items ON receipt BEGIN "
+    "DELETE FROM receipt_fts WHERE rowid = old.search_rowid; " + _INSERT_ROW_SQL + " END",
+    "CREATE TRIGGER IF NOT EXISTS receipt_fts_delete AFTER DELETE ON receipt BEGIN "
+    "DELETE FROM receipt_fts WHERE rowid = old.search_rowid; END",
+]
+
+# Refill the index from the receipt table (python cli.py rebuild-search-index),
+# e.g. after restoring a backup or editing receipt outside the triggers
+RECEIPT_FTS_REBUILD = [
+    "DELETE FROM receipt_fts",
+    "UPDATE receipt SET search_rowid = rowid + (SELECT coalesce(max(search_rowid), 0) FROM receipt) "
+    "WHERE search_rowid IS NULL",
+    "INSERT INTO receipt_fts(rowid, merchant_name, store_address, item_names) "
+    "SELECT receipt.search_rowid, receipt.merchant_name, receipt.store_address, "
+    + _ITEM_NAMES_SQL.format(row="receipt") + " FROM receipt",
+]
+
+for statement in RECEIPT_FTS_DDL:
+    event.listen(Receipt.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -1,17 +1,70 @@
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 
 from core.config import settings
 
-engine = create_engine(url=settings.SQL_CONNECTION, echo=True)
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_connection_url(url: str) -> str:
+    """
+    Return the async driver variant of a database URL.
+
+    URLs that already name a driver (e.g. sqlite+aiosqlite://) are returned unchanged.
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def pool_options(url: str) -> dict:
+    """Connection pool settings, skipped for in-memory SQLite, which uses a single connection."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+# Sync engine for the job workers, CLI and migrations
+engine = create_engine(
+    url=settings.SQL_CONNECTION,
+    echo=settings.SQL_ECHO,
+    **pool_options(settings.SQL_CONNECTION),
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the API endpoints, so queries do not block the event loop
+ASYNC_SQL_CONNECTION = settings.SQL_ASYNC_CONNECTION or async_connection_url(settings.SQL_CONNECTION)
+async_engine = create_async_engine(
+    ASYNC_SQL_CONNECTION,
+    echo=settings.SQL_ECHO,
+    **pool_options(ASYNC_SQL_CONNECTION),
+)
+
 
 def get_session():
     with Session(engine) as session:
         yield session
 
 
-
+async def get_async_session():
+    # Objects stay usable after commit, since async sessions cannot lazy-load expired attributes
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
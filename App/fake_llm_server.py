@@ -0,0 +1,226 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions API.
+
+Answers the prompts sent by services/llm/utils.py without any network access:
+vision requests get a canned receipt transcript, and structured-extraction
+requests (single or batched) get ReceiptExtractedData JSON built by the
+rule-based parser or taken from a canned answer. Latency and error rate are
+configurable so the real pipeline can be load-tested offline.
+
+Run from the App folder:
+    python fake_llm_server.py --port 8100 --latency-dist lognormal --latency-mean 0.8 --error-rate 0.05
+
+Then point the app at it, either through the generic backend:
+    LLM_PROVIDER=openai_compatible LLM_BASE_URL=http://127.0.0.1:8100/v1
+or through the Together SDK:
+    TOGETHER_BASE_URL=http://127.0.0.1:8100/v1
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from models.schema import ReceiptExtractedData
+from services.rules.utils import extract_receipt_data_rules
+
+
+CANNED_RECEIPT_TEXT = """EXAMPLE MART
+123 Main Street, Springfield
+Store #042  Tel (555) 123-4567
+08/14/2025 14:32
+Milk 2%                 3.49
+Bread                   2.99
+Eggs Dozen              4.25
+SUBTOTAL               10.73
+TAX                     0.86
+TOTAL                  11.59
+VISA XXXX1234          11.59
+Cashier: 17
+THANK YOU FOR SHOPPING
+"""
+
+CANNED_EXTRACTION = {
+    "merchant_name": "EXAMPLE MART",
+    "total_amount": 11.59,
+    "purchased_at": "2025-08-14 14:32:00",
+    "store_address": "123 Main Street, Springfield",
+    "phone_number": "(555) 123-4567",
+    "store_number": "042",
+    "cashier_number": "17",
+    "barcode_num": None,
+    "items": [
+        {"name": "Milk 2%", "price": 3.49},
+        {"name": "Bread", "price": 2.99},
+        {"name": "Eggs Dozen", "price": 4.25},
+    ],
+    "payment_details": {"method": "VISA", "card_last4": "1234"},
+    "additional_info": {"subtotal": 10.73, "tax": 0.86},
+}
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+SINGLE_TEXT_RE = re.compile(r"Receipt text:\n(.*?)\n\nReturn the output in JSON format", re.DOTALL)
+BATCH_SECTION_RE = re.compile(r"^### RECEIPT (\S+)\n(.*?)(?=\n\n### RECEIPT |\n\nReturn a JSON array)", re.DOTALL | re.MULTILINE)
+TEMPLATE_FIELD_RE = re.compile(r'^\s*"(\w+)": null', re.MULTILINE)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--mode", choices=["rules", "canned"], default="rules",
+                        help="Build extraction answers with the rule-based parser or return a canned receipt")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-mean", type=float, default=0.0, help="Mean response latency in seconds")
+    parser.add_argument("--latency-stddev", type=float, default=0.0,
+                        help="Spread for the uniform, normal and lognormal distributions, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-statuses", default="429,500,503", help="Comma-separated HTTP statuses to fail with")
+    parser.add_argument("--stream-chunk-size", type=int, default=16, help="Characters per streamed chunk")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def sample_latency(options: argparse.Namespace, rng: random.Random) -> float:
+    """Draw one response latency, in seconds, from the configured distribution."""
+    mean, spread = options.latency_mean, options.latency_stddev
+    if mean <= 0:
+        return 0.0
+    if options.latency_dist == "uniform":
+        value = rng.uniform(mean - spread, mean + spread)
+    elif options.latency_dist == "normal":
+        value = rng.gauss(mean, spread)
+    elif options.latency_dist == "lognormal":
+        # Parameterized so the distribution has the requested mean and standard deviation
+        sigma = math.sqrt(math.log(1 + (spread / mean) ** 2))
+        value = rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+    elif options.latency_dist == "exponential":
+        value = rng.expovariate(1 / mean)
+    else:
+        value = mean
+    return max(0.0, value)
+
+
+def extraction_answer(text: str, fields: List[str], mode: str) -> dict:
+    """Structured data for one receipt, limited to the requested fields."""
+    if mode == "canned":
+        data = CANNED_EXTRACTION
+    else:
+        data = extract_receipt_data_rules(text).data.model_dump()
+    return {field: data.get(field) for field in fields}
+
+
+def answer_prompt(messages: List[dict], mode: str) -> str:
+    """Build the assistant reply for a chat request."""
+    content = messages[-1].get("content") if messages else ""
+    if isinstance(content, list):
+        # Vision request: the page image is not read, a transcript is returned
+        return CANNED_RECEIPT_TEXT
+
+    prompt = content or ""
+    fields = TEMPLATE_FIELD_RE.findall(prompt) or list(ReceiptExtractedData.model_fields)
+    sections = BATCH_SECTION_RE.findall(prompt)
+    if sections:
+        answers = [{"id": key, **extraction_answer(text, fields, mode)} for key, text in sections]
+        return json.dumps(answers)
+
+    match = SINGLE_TEXT_RE.search(prompt)
+    text = match.group(1) if match else prompt
+    return json.dumps(extraction_answer(text, fields, mode))
+
+
+def create_app(options: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Fake LLM server")
+    rng = random.Random(options.seed)
+    error_statuses = [int(status) for status in options.error_statuses.split(",") if status.strip()]
+    counters: Counter = Counter()
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "fake-model", "object": "model"}]}
+
+    @app.get("/stats")
+    async def stats():
+        return dict(counters)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        counters["requests"] += 1
+        await asyncio.sleep(sample_latency(options, rng))
+
+        if error_statuses and rng.random() < options.error_rate:
+            status = rng.choice(error_statuses)
+            counters[f"errors_{status}"] += 1
+            return JSONResponse(
+                status_code=status,
+                content={"error": {"message": f"Injected error {status}", "type": "server_error"}},
+            )
+
+        content = answer_prompt(body.get("messages", []), options.mode)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "fake-model")
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+        completion_tokens = len(content) // 4
+
+        if not body.get("stream"):
+            counters["completions"] += 1
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+
+        def chunk(delta: Dict[str, str], finish_reason: Optional[str] = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            counters["streams"] += 1
+            yield chunk({"role": "assistant", "content": ""})
+            size = max(1, options.stream_chunk_size)
+            for start in range(0, len(content), size):
+                yield chunk({"content": content[start:start + size]})
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    options = parse_args()
+    uvicorn.run(create_app(options), host=options.host, port=options.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 from api.endpoints import receipt
+from api.middleware import RequestBodyLimitMiddleware
 from db.base import create_db_and_tables
+from db.session import async_engine
+from services.jobs.utils import job_pool
+from services.llm.utils import client as llm_client
+from services.pdf.utils import shutdown_ocr_executor
 
 
 load_dotenv()
@@ -15,8 +20,13 @@ load_dotenv()
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:  # Changed return type
     print("server is starting")
     create_db_and_tables()
+    job_pool.start()
     yield  # This is crucial - yields control to FastAPI
     print("server is shutting down")
+    job_pool.stop()
+    shutdown_ocr_executor()
+    await llm_client.aclose()
+    await async_engine.dispose()
 
 
 
@@ -39,6 +49,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Reject oversized bodies before the multipart form is spooled (added first so CORS wraps its 413)
+app.add_middleware(RequestBodyLimitMiddleware, max_body_size=receipt.MAX_REQUEST_SIZE)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -1,7 +1,8 @@
 import enum
 from typing import List, Optional, Annotated,List, Dict
 
-from sqlmodel import SQLModel, Column, JSON ,Field as SQLModelField
+from sqlalchemy import Index, text
+from sqlmodel import SQLModel, Column, JSON, Text, Field as SQLModelField
 import uuid
 from datetime import datetime
 
@@ -15,12 +16,22 @@ class ReceiptFile(SQLModel, table=True):
     )
     file_name: Annotated[
         str, 
-        SQLModelField(max_length=255, description="Name of the uploaded file")
+        SQLModelField(max_length=255, index=True, description="Name of the uploaded file")
     ]
     file_path: Annotated[
         str, 
         SQLModelField(max_length=512, description="Storage path of the uploaded file")
     ]
+    content_hash: Annotated[
+        Optional[str],
+        SQLModelField(
+            max_length=64,
+            default=None,
+            unique=True,
+            index=True,
+            description="SHA-256 of the file content, used for content-addressed storage",
+        )
+    ]
     is_valid: Annotated[
         bool, 
         SQLModelField(default=False, description="Indicates if the file is a valid PDF")
@@ -46,18 +57,30 @@ class ReceiptFile(SQLModel, table=True):
 
 
 class Receipt(SQLModel, table=True):
+    __table_args__ = (
+        # Serve the active receipt listings for each sort column
+        Index("ix_receipt_active_purchased_at_id", "is_active", "purchased_at", "id"),
+        Index("ix_receipt_active_created_at_id", "is_active", "created_at", "id"),
+        # Case-insensitive merchant filters
+        Index("ix_receipt_merchant_name_lower", text("lower(merchant_name)")),
+    )
+
     id: uuid.UUID = SQLModelField(
         default_factory=uuid.uuid4,
         primary_key=True,
         description="Unique receipt identifier",
     )
+    receipt_file_id: Annotated[
+        Optional[uuid.UUID],
+        SQLModelField(default=None, foreign_key="receiptfile.id", index=True, description="Receipt file the data was extracted from")
+    ]
     purchased_at: Annotated[
         Optional[datetime], 
-        SQLModelField(default=None, description="Date and time of purchase")
+        SQLModelField(default=None, index=True, description="Date and time of purchase")
     ]
     merchant_name: Annotated[
         Optional[str], 
-        SQLModelField(max_length=255, default=None, description="Merchant name")
+        SQLModelField(max_length=255, default=None, index=True, description="Merchant name")
     ]
 
     is_active: Annotated[
@@ -113,12 +136,142 @@ class Receipt(SQLModel, table=True):
         Optional[Dict], 
         SQLModelField(default=None, sa_type=JSON, description="Payment method and details")
     ]
+    payment_method: Annotated[
+        Optional[str],
+        SQLModelField(max_length=50, default=None, index=True, description="Upper-cased payment method from payment_details")
+    ]
     additional_info: Annotated[
         Optional[Dict], 
         SQLModelField(default=None, sa_type=JSON, description="Additional receipt information")
     ]
+    raw_text: Annotated[
+        Optional[str],
+        SQLModelField(default=None, sa_type=Text, description="Text the structured data was extracted from")
+    ]
+    extractor: Annotated[
+        Optional[str],
+        SQLModelField(max_length=50, default=None, description="Text extractor used: vision or hybrid")
+    ]
+    extraction_version: Annotated[
+        Optional[str],
+        SQLModelField(max_length=255, default=None, index=True, description="Prompt and model version of the structured data")
+    ]
+    search_rowid: Annotated[
+        Optional[int],
+        SQLModelField(
+            default=None, unique=True, index=True,
+            description="Stable key of the receipt's receipt_fts row; assigned by a trigger on SQLite",
+        )
+    ]
 
   
 
 
+class ReceiptItem(SQLModel, table=True):
+    __tablename__ = "receipt_item"
+    __table_args__ = (
+        # Items of a receipt in printed order
+        Index("ix_receipt_item_receipt_id_position", "receipt_id", "position"),
+        # Case-insensitive item name filters and grouping, and SKU lookups; both
+        # cover the summary aggregates so they are answered from the index alone
+        Index("ix_receipt_item_name_lower", text("lower(name)"), "name", "receipt_id", "quantity", "line_total"),
+        Index("ix_receipt_item_sku", "sku", "receipt_id", "quantity", "line_total"),
+    )
+
+    id: uuid.UUID = SQLModelField(
+        default_factory=uuid.uuid4,
+        primary_key=True,
+        description="Unique receipt item identifier",
+    )
+    receipt_id: Annotated[
+        uuid.UUID,
+        SQLModelField(foreign_key="receipt.id", description="Receipt the item was printed on")
+    ]
+    position: Annotated[
+        int,
+        SQLModelField(default=0, description="Position of the item on the receipt")
+    ]
+    name: Annotated[
+        Optional[str],
+        SQLModelField(max_length=255, default=None, description="Item name as printed")
+    ]
+    sku: Annotated[
+        Optional[str],
+        SQLModelField(max_length=100, default=None, description="SKU, UPC or item code, if printed")
+    ]
+    quantity: Annotated[
+        Optional[float],
+        SQLModelField(default=None, description="Quantity bought")
+    ]
+    unit_price: Annotated[
+        Optional[float],
+        SQLModelField(default=None, description="Price per unit")
+    ]
+    line_total: Annotated[
+        Optional[float],
+        SQLModelField(default=None, description="Amount charged for the line")
+    ]
+
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 
+class ProcessingJob(SQLModel, table=True):
+    id: uuid.UUID = SQLModelField(
+        default_factory=uuid.uuid4,
+        primary_key=True,
+        description="Unique processing job identifier",
+    )
+    receipt_file_id: Annotated[
+        uuid.UUID,
+        SQLModelField(foreign_key="receiptfile.id", index=True, description="Receipt file to process")
+    ]
+    is_premium_user: Annotated[
+        bool,
+        SQLModelField(default=False, description="Use AI-based text extraction")
+    ]
+    status: Annotated[
+        str,
+        SQLModelField(max_length=20, default=JobStatus.QUEUED.value, index=True, description="Job status")
+    ]
+    result: Annotated[
+        Optional[Dict],
+        SQLModelField(default=None, sa_type=JSON, description="Processed receipt data")
+    ]
+    error: Annotated[
+        Optional[str],
+        SQLModelField(max_length=1000, default=None, description="Failure reason")
+    ]
+    attempts: Annotated[
+        int,
+        SQLModelField(default=0, description="Number of times a worker picked up the job")
+    ]
+    created_at: Annotated[
+        datetime,
+        SQLModelField(default_factory=datetime.now, description="Creation time")
+    ]
+    started_at: Annotated[
+        Optional[datetime],
+        SQLModelField(default=None, description="Time a worker started the job")
+    ]
+    finished_at: Annotated[
+        Optional[datetime],
+        SQLModelField(default=None, description="Completion or failure time")
+    ]
+    worker_id: Annotated[
+        Optional[str],
+        SQLModelField(max_length=100, default=None, description="Worker process that claimed the job")
+    ]
+    lease_expires_at: Annotated[
+        Optional[datetime],
+        SQLModelField(default=None, description="Time after which a running job may be reclaimed")
+    ]
+    updated_at: Annotated[
+        datetime,
+        SQLModelField(default_factory=datetime.now, description="Last update time")
+    ]
@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+import uuid
+from datetime import datetime
+
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 
 
@@ -16,5 +19,63 @@ class ReceiptExtractedData(BaseModel):
     additional_info: Optional[Dict] = None
 
 
+class RuleExtractionResult(BaseModel):
+    data: ReceiptExtractedData
+    confidence: Dict[str, float] = {}
+
+
+class PromptCompactionResult(BaseModel):
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+
+
 class ProcessReceiptRequest(BaseModel):
-    is_premium_user: bool = False    
\ No newline at end of file
+    is_premium_user: bool = False
+    force_reprocess: bool = False
+
+
+class ReextractRequest(BaseModel):
+    receipt_ids: Optional[List[uuid.UUID]] = None
+    limit: int = Field(100, ge=1, le=1000)
+    concurrency: int = Field(4, ge=1, le=32)
+    force: bool = False
+
+
+class ReceiptFilters(BaseModel):
+    merchant: Optional[str] = None
+    merchant_match: str = "prefix"  # prefix or exact, case-insensitive
+    purchased_from: Optional[datetime] = None
+    purchased_to: Optional[datetime] = None
+    min_total: Optional[float] = None
+    max_total: Optional[float] = None
+    payment_method: Optional[str] = None
+    q: Optional[str] = None  # full-text search over merchant, address and item names
+
+
+class ItemFilters(BaseModel):
+    name: Optional[str] = None
+    name_match: str = "prefix"  # prefix or exact, case-insensitive
+    sku: Optional[str] = None
+    merchant: Optional[str] = None  # case-insensitive prefix
+    purchased_from: Optional[datetime] = None
+    purchased_to: Optional[datetime] = None
+
+
+class VisionImageProfile(BaseModel):
+    """Settings for rendering and encoding page images sent to the vision model."""
+    dpi: int = 200
+    grayscale: bool = True
+    crop_margins: bool = True
+    max_side: Optional[int] = 2000
+    image_format: str = "JPEG"  # JPEG, WEBP or PNG
+    quality: int = 80
+
+
+class OCRConfig(BaseModel):
+    """Per-call Tesseract options."""
+    lang: str = "eng"
+    psm: Optional[int] = None  # page segmentation mode
+    oem: Optional[int] = None  # OCR engine mode
+    preprocess: bool = True  # grayscale, crop, binarize and deskew before OCR
+    adaptive_dpi: bool = True  # pick the render DPI from the measured text height
@@ -0,0 +1,267 @@
+import asyncio
+import os
+import queue
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, select
+
+from core.config import settings
+from core.logging import setup_logger
+from db.session import engine
+from models.receipt_table import JobStatus, ProcessingJob, ReceiptFile
+from services.llm.utils import client as llm_client
+from services.processing.utils import process_receipt_file, receipt_to_response
+
+
+logger = setup_logger(__name__)
+
+
+def create_job(
+    session: Session,
+    receipt_file: ReceiptFile,
+    is_premium_user: bool,
+    result: Optional[dict] = None,
+) -> ProcessingJob:
+    """
+    Persist a processing job for a receipt file.
+
+    Args:
+        session: Database session.
+        receipt_file: The file to process.
+        is_premium_user: Use AI-based text extraction.
+        result: Already available receipt data. The job is stored as completed when given.
+
+    Returns:
+        ProcessingJob: The stored job.
+    """
+    job = ProcessingJob(receipt_file_id=receipt_file.id, is_premium_user=is_premium_user)
+    if result is not None:
+        job.status = JobStatus.COMPLETED.value
+        job.result = result
+        job.finished_at = datetime.now()
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def job_to_response(job: ProcessingJob) -> dict:
+    """
+    Serialize a ProcessingJob for the jobs endpoints.
+
+    Args:
+        job (ProcessingJob): The stored job.
+
+    Returns:
+        dict: Job status, timestamps and result or error.
+    """
+    return {
+        "job_id": str(job.id),
+        "file_id": str(job.receipt_file_id),
+        "status": job.status,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class JobWorkerPool:
+    """
+    Pool of local worker threads that run receipt processing jobs.
+
+    Job state lives in the processingjob table, so jobs that were queued when
+    the server stopped are picked up again on the next start. Each worker
+    keeps its own event loop for the async extraction pipeline.
+
+    A job is claimed with a conditional update that records this pool's
+    worker_id and a lease of settings.JOB_LEASE_SECONDS. A heartbeat thread
+    renews the lease of every job this pool is running. Running jobs are only
+    reclaimed, by any process sharing the database, once their lease has
+    lapsed, so a job whose process is alive is never run twice.
+    """
+
+    def __init__(self, num_workers: int, lease_seconds: int = 60):
+        self.num_workers = max(1, num_workers)
+        self.lease_seconds = max(3, lease_seconds)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: "queue.Queue[Optional[uuid.UUID]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        # Jobs waiting in this pool's queue, and jobs its workers are running
+        self._pending: Set[uuid.UUID] = set()
+        self._running: Set[uuid.UUID] = set()
+        self._stopping = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the workers and the heartbeat, and queue unfinished jobs."""
+        if self._threads:
+            return
+        self._stopping.clear()
+
+        with Session(engine) as session:
+            pending = session.exec(
+                select(ProcessingJob.id)
+                .where(or_(ProcessingJob.status == JobStatus.QUEUED.value, self._lease_expired(datetime.now())))
+                .order_by(ProcessingJob.created_at)
+            ).all()
+        for job_id in pending:
+            self.submit(job_id)
+        if pending:
+            logger.info(f"Recovered {len(pending)} unfinished processing jobs")
+
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._work, name=f"receipt-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._heartbeat = threading.Thread(target=self._renew_leases, name="receipt-job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Ask the workers to exit once their current job is done."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stopping.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join(timeout)
+            self._heartbeat = None
+
+    def submit(self, job_id: uuid.UUID) -> None:
+        """Queue a persisted job for execution."""
+        with self._lock:
+            self._pending.add(job_id)
+        self._queue.put(job_id)
+
+    @staticmethod
+    def _lease_expired(now: datetime):
+        """Condition for running jobs whose owner stopped renewing the lease."""
+        return and_(
+            ProcessingJob.status == JobStatus.RUNNING.value,
+            or_(ProcessingJob.lease_expires_at.is_(None), ProcessingJob.lease_expires_at < now),
+        )
+
+    def _renew_leases(self) -> None:
+        """Extend the leases of running jobs and pick up jobs whose lease lapsed elsewhere."""
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                now = datetime.now()
+                with self._lock:
+                    running = list(self._running)
+                with Session(engine) as session:
+                    if running:
+                        session.execute(
+                            update(ProcessingJob)
+                            .where(ProcessingJob.id.in_(running), ProcessingJob.worker_id == self.worker_id)
+                            .values(lease_expires_at=now + timedelta(seconds=self.lease_seconds))
+                        )
+                        session.commit()
+                    expired = session.exec(select(ProcessingJob.id).where(self._lease_expired(now))).all()
+                with self._lock:
+                    expired = [job_id for job_id in expired if job_id not in self._pending]
+                for job_id in expired:
+                    logger.info(f"Lease of job {job_id} expired, re-queuing")
+                    self.submit(job_id)
+            except Exception as e:
+                logger.exception(f"Job lease renewal failed: {str(e)}")
+
+    def _work(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            while True:
+                job_id = self._queue.get()
+                if job_id is None:
+                    break
+                try:
+                    loop.run_until_complete(self._run_job(job_id))
+                except Exception as e:
+                    logger.exception(f"Worker failed on job {job_id}: {str(e)}")
+        finally:
+            loop.run_until_complete(llm_client.aclose())
+            loop.close()
+
+    def _claim(self, session: Session, job_id: uuid.UUID) -> bool:
+        """
+        Atomically mark a job as running under this pool's lease.
+
+        Queued jobs can be claimed, and so can running jobs whose lease has
+        expired. The conditional update lets only one process or thread win.
+
+        Returns:
+            bool: True if this worker claimed the job.
+        """
+        now = datetime.now()
+        result = session.execute(
+            update(ProcessingJob)
+            .where(ProcessingJob.id == job_id)
+            .where(or_(ProcessingJob.status == JobStatus.QUEUED.value, self._lease_expired(now)))
+            .values(
+                status=JobStatus.RUNNING.value,
+                attempts=ProcessingJob.attempts + 1,
+                worker_id=self.worker_id,
+                lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                started_at=now,
+                updated_at=now,
+            )
+        )
+        session.commit()
+        return result.rowcount == 1
+
+    async def _run_job(self, job_id: uuid.UUID) -> None:
+        with self._lock:
+            self._pending.discard(job_id)
+        with Session(engine) as session:
+            if not self._claim(session, job_id):
+                logger.info(f"Job {job_id} is finished or claimed by another worker, skipping")
+                return
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                await self._execute(session, job_id)
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+
+    async def _execute(self, session: Session, job_id: uuid.UUID) -> None:
+        job = session.get(ProcessingJob, job_id)
+        receipt_file = session.get(ReceiptFile, job.receipt_file_id)
+        outcome = {"result": None, "error": None}
+        try:
+            if not receipt_file:
+                raise RuntimeError("File not found")
+            receipt = await process_receipt_file(session, receipt_file, job.is_premium_user)
+            outcome["status"] = JobStatus.COMPLETED.value
+            outcome["result"] = receipt_to_response(receipt)
+        except RuntimeError as e:
+            outcome["status"] = JobStatus.FAILED.value
+            outcome["error"] = str(e)[:1000]
+        except Exception as e:
+            session.rollback()
+            logger.exception(f"Job {job_id} failed: {str(e)}")
+            outcome["status"] = JobStatus.FAILED.value
+            outcome["error"] = f"Internal server error: {str(e)}"[:1000]
+
+        # Only record the outcome while this pool still holds the job
+        now = datetime.now()
+        finished = session.execute(
+            update(ProcessingJob)
+            .where(ProcessingJob.id == job_id, ProcessingJob.worker_id == self.worker_id)
+            .values(finished_at=now, updated_at=now, lease_expires_at=None, **outcome)
+        )
+        session.commit()
+        if finished.rowcount == 0:
+            logger.warning(f"Job {job_id} was reclaimed by another worker after its lease expired")
+
+
+job_pool = JobWorkerPool(settings.JOB_WORKERS, settings.JOB_LEASE_SECONDS)
@@ -0,0 +1,155 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from core.config import settings
+from core.logging import setup_logger
+
+
+logger = setup_logger(__name__)
+
+# Expired rows are purged from the SQLite tier once every this many inserts
+PURGE_EVERY = 1000
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return " ".join(text.split())
+
+
+class ExtractionCache:
+    """
+    Two-tier cache for structured-extraction results.
+
+    Entries are keyed on a hash of (normalized text, model name, prompt version).
+    Lookups hit an in-process LRU first, then a SQLite table that survives
+    restarts. Both tiers expire entries ttl_seconds after they were stored, and
+    the SQLite tier evicts the least recently used rows once it holds more than
+    max_entries. Its row count is tracked in memory and only recounted when
+    expired rows are purged, every PURGE_EVERY inserts.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int, memory_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        # key -> (value, created_at)
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extraction_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_extraction_cache_accessed_at ON extraction_cache (accessed_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_extraction_cache_created_at ON extraction_cache (created_at)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT count(*) FROM extraction_cache").fetchone()[0]
+        self._inserts_since_purge = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(text: str, model: str, prompt_version: str) -> str:
+        """Build the cache key for a receipt text, model and prompt version."""
+        payload = "\x00".join([normalize_text(text), model, prompt_version])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None on a miss or expired entry."""
+        with self._lock:
+            now = time.time()
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM extraction_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._count -= self._conn.execute("DELETE FROM extraction_cache WHERE key = ?", (key,)).rowcount
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE extraction_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._remember(key, row[0], row[1])
+            self.disk_hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """Store value under key in both tiers, evicting old rows if needed."""
+        with self._lock:
+            now = time.time()
+            exists = self._conn.execute("SELECT 1 FROM extraction_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            if exists is None:
+                self._count += 1
+
+            self._inserts_since_purge += 1
+            if self._inserts_since_purge >= PURGE_EVERY:
+                self._inserts_since_purge = 0
+                self._conn.execute("DELETE FROM extraction_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+                # Resync with rows other processes sharing the file added or removed
+                self._count = self._conn.execute("SELECT count(*) FROM extraction_cache").fetchone()[0]
+            if self._count > self.max_entries:
+                evicted = self._conn.execute(
+                    "DELETE FROM extraction_cache WHERE key IN ("
+                    " SELECT key FROM extraction_cache ORDER BY accessed_at LIMIT ?)",
+                    (self._count - self.max_entries,),
+                ).rowcount
+                self._count -= evicted
+                self.evictions += evicted
+            self._conn.commit()
+            self._remember(key, value, now)
+
+    def stats(self) -> dict:
+        """Return hit, miss and eviction counters."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+
+extraction_cache: Optional[ExtractionCache] = None
+if settings.LLM_CACHE_ENABLED:
+    extraction_cache = ExtractionCache(
+        path=settings.LLM_CACHE_PATH,
+        ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+        max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        memory_entries=settings.LLM_CACHE_MEMORY_ENTRIES,
+    )
@@ -0,0 +1,129 @@
+import re
+from typing import List
+
+from models.schema import PromptCompactionResult
+from services.rules.utils import AMOUNT_RE, PAYMENT_RE
+
+
+TABLES_HEADER = "--- TABLES ---"
+TABLE_CELL_SEPARATOR = " | "
+
+WHITESPACE_RE = re.compile(r"\s+")
+USEFUL_CHAR_RE = re.compile(r"[^\W_]")
+LONG_NUMBER_RE = re.compile(r"\d{8,}")
+FOOTER_BOILERPLATE_RE = re.compile(
+    r"\b(?:thank|thanks|visit|survey|feedback|tell us|returns?|refund|exchange|policy|www\.|https?:|\.com|"
+    r"keep (?:this|your) receipt|rewards?|member|sign up|follow us|chance to win|customer service|"
+    r"hours|open \d|come again|have a (?:nice|great) day)\b",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def _normalize(line: str) -> str:
+    return WHITESPACE_RE.sub(" ", line).strip()
+
+
+def _drop_duplicate_table_rows(lines: List[str]) -> List[str]:
+    """
+    Drop table rows whose cells already appear in the text layer.
+
+    Conventional extraction appends each page's tables after its text under a
+    TABLES_HEADER line, so the same content usually shows up twice.
+    """
+    result: List[str] = []
+    seen_text = ""
+    in_tables = False
+    header_index = None
+    for line in lines:
+        if line.strip() == TABLES_HEADER:
+            in_tables = True
+            header_index = len(result)
+            result.append(line)
+            continue
+        if in_tables and TABLE_CELL_SEPARATOR in line:
+            cells = [_normalize(cell) for cell in line.split(TABLE_CELL_SEPARATOR)]
+            cells = [cell for cell in cells if cell and cell != "None"]
+            if any(cell not in seen_text for cell in cells):
+                result.append(TABLE_CELL_SEPARATOR.join(cells))
+            continue
+        if in_tables and line.strip():
+            in_tables = False
+        if header_index is not None and not in_tables:
+            # Remove the header of a table section where every row was a duplicate
+            if all(not row.strip() for row in result[header_index + 1:]):
+                del result[header_index:]
+            header_index = None
+        seen_text += " " + _normalize(line)
+        result.append(line)
+    if header_index is not None and all(not row.strip() for row in result[header_index + 1:]):
+        del result[header_index:]
+    return result
+
+
+def _truncate_footer(lines: List[str], max_lines: int) -> List[str]:
+    """
+    Trim boilerplate after the last amount or payment line.
+
+    Footer lines matching FOOTER_BOILERPLATE_RE are dropped and at most max_lines
+    of the rest are kept. Lines with long digit runs (barcodes, transaction IDs)
+    are always kept.
+    """
+    last_useful = -1
+    for index, line in enumerate(lines):
+        if AMOUNT_RE.search(line) or PAYMENT_RE.search(line):
+            last_useful = index
+    if last_useful < 0:
+        return lines
+
+    footer: List[str] = []
+    kept = 0
+    for line in lines[last_useful + 1:]:
+        if LONG_NUMBER_RE.search(line):
+            footer.append(line)
+        elif not line or FOOTER_BOILERPLATE_RE.search(line):
+            continue
+        elif kept < max_lines:
+            footer.append(line)
+            kept += 1
+    return lines[:last_useful + 1] + footer
+
+
+def compact_receipt_text(text: str, footer_max_lines: int = 5) -> PromptCompactionResult:
+    """
+    Shrink receipt text before it is placed in an LLM prompt.
+
+    Removes table rows duplicated from the text layer, collapses whitespace and
+    blank lines, drops lines with no letters or digits, and truncates
+    boilerplate after the last amount or payment line. Repeated text lines are
+    kept: the same item scanned twice is two purchases.
+
+    Args:
+        text: Extracted receipt text.
+        footer_max_lines: Footer lines kept after boilerplate is removed.
+
+    Returns:
+        PromptCompactionResult: Compacted text with estimated token counts before and after.
+    """
+    lines = _drop_duplicate_table_rows(text.splitlines())
+
+    compacted: List[str] = []
+    for line in lines:
+        line = _normalize(line)
+        if line and not USEFUL_CHAR_RE.search(line):
+            continue
+        if not line and (not compacted or not compacted[-1]):
+            continue
+        compacted.append(line)
+
+    compacted = _truncate_footer(compacted, footer_max_lines)
+    compacted_text = "\n".join(compacted).strip()
+    return PromptCompactionResult(
+        text=compacted_text,
+        original_tokens=estimate_tokens(text),
+        compacted_tokens=estimate_tokens(compacted_text),
+    )
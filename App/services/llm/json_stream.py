@@ -0,0 +1,126 @@
+import json
+from typing import List, Optional
+
+
+CLOSERS = {"{": "}", "[": "]"}
+
+
+class IncrementalJSONObjectParser:
+    """
+    Track the first top-level JSON object in streamed model output.
+
+    Feed chunks as they arrive; feed() returns True as soon as the top-level
+    object closes, so the caller can stop the stream without waiting for any
+    trailing text. If the output ends early, recover() cuts the truncated
+    object after its last complete top-level field, so a partially received
+    value is never returned.
+    """
+
+    OPENER = "{"
+    RESULT_TYPE = dict
+
+    def __init__(self):
+        self.complete = False
+        self._chars: List[str] = []
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        # Text lengths just after each complete top-level field, where the object can be cut
+        self._cut_points: List[int] = []
+
+    @property
+    def started(self) -> bool:
+        return bool(self._chars)
+
+    @property
+    def text(self) -> str:
+        """JSON text received so far, starting at the opening brace or bracket."""
+        return "".join(self._chars)
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Consume a chunk of model output.
+
+        Args:
+            chunk: Next piece of streamed text.
+
+        Returns:
+            bool: True once the top-level object is complete.
+        """
+        for ch in chunk:
+            if self.complete:
+                break
+            if not self._chars:
+                if ch != self.OPENER:
+                    continue  # skip any preamble before the object
+                self._chars.append(ch)
+                self._stack.append(ch)
+                continue
+
+            self._chars.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in CLOSERS:
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self.complete = True
+            elif ch == "," and len(self._stack) == 1:
+                self._cut_points.append(len(self._chars) - 1)
+        return self.complete
+
+    def result(self) -> Optional[dict]:
+        """Return the parsed object if it is complete and valid JSON, else None."""
+        if not self.complete:
+            return None
+        try:
+            value = json.loads(self.text)
+        except json.JSONDecodeError:
+            return None
+        return value if isinstance(value, self.RESULT_TYPE) else None
+
+    def recover(self) -> Optional[dict]:
+        """
+        Parse the complete top-level fields of a truncated object.
+
+        Returns:
+            dict | None: The fields received in full, or None if nothing was received.
+        """
+        if not self._chars:
+            return None
+        if self.complete:
+            return self.result()
+
+        text = self.text
+        for length in reversed(self._cut_points):
+            try:
+                value = json.loads(text[:length] + CLOSERS[self.OPENER])
+            except json.JSONDecodeError:
+                continue
+            if isinstance(value, self.RESULT_TYPE):
+                return value
+        return self.RESULT_TYPE()
+
+
+class IncrementalJSONArrayParser(IncrementalJSONObjectParser):
+    """
+    Track the first top-level JSON array in streamed model output.
+
+    Works like IncrementalJSONObjectParser; result() and recover() return a
+    list, and recover() keeps the elements of a truncated array that arrived
+    in full.
+    """
+
+    OPENER = "["
+    RESULT_TYPE = list
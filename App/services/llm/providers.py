@@ -0,0 +1,142 @@
+import asyncio
+import json
+import weakref
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Optional
+
+import aiohttp
+from together import AsyncTogether
+
+from core.config import settings
+
+
+# Backends accepted by settings.LLM_PROVIDER
+PROVIDERS = ("together", "openai_compatible")
+
+
+class ProviderHTTPError(RuntimeError):
+    """Non-2xx response from an OpenAI-compatible endpoint."""
+
+    def __init__(self, message: str, http_status: int):
+        super().__init__(message)
+        self.http_status = http_status
+
+
+def _to_namespace(value: Any) -> Any:
+    """Turn decoded JSON into attribute-accessible objects, like the SDK response types."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+class _CompletionStream:
+    """Async iterator over server-sent completion chunks."""
+
+    def __init__(self, response: aiohttp.ClientResponse):
+        self._response = response
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._chunks()
+
+    async def _chunks(self) -> AsyncIterator[Any]:
+        async for raw_line in self._response.content:
+            line = raw_line.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            yield _to_namespace(json.loads(data))
+
+    async def aclose(self) -> None:
+        self._response.release()
+
+
+class OpenAICompatibleClient:
+    """
+    Minimal async client for any OpenAI-compatible `/chat/completions` endpoint.
+
+    Supports the same `chat.completions.create(**kwargs)` call as AsyncTogether,
+    including `stream=True`. One HTTP session is kept per event loop, since the
+    job workers each run their own loop.
+
+    Args:
+        base_url: API root, e.g. "http://127.0.0.1:8100/v1".
+        api_key: Sent as a bearer token when set.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            session = aiohttp.ClientSession(headers=headers)
+            self._sessions[loop] = session
+        return session
+
+    async def create(self, **kwargs: Any) -> Any:
+        """
+        POST a chat completion request.
+
+        Returns:
+            Any: The parsed response, or an async iterator of chunks when stream=True.
+
+        Raises:
+            ProviderHTTPError: On a non-2xx response.
+            aiohttp.ClientError: On connection failures.
+        """
+        response = await self._session().post(f"{self.base_url}/chat/completions", json=kwargs)
+        if response.status >= 300:
+            body = await response.text()
+            response.release()
+            raise ProviderHTTPError(f"Error code: {response.status} - {body[:500]}", response.status)
+        if kwargs.get("stream"):
+            return _CompletionStream(response)
+        try:
+            return _to_namespace(await response.json(content_type=None))
+        finally:
+            response.release()
+
+    async def close(self) -> None:
+        """Close the session bound to the running event loop."""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+
+def create_provider_client(provider: Optional[str] = None) -> Any:
+    """
+    Build the raw LLM client for the configured backend.
+
+    Creating a client makes no network calls. Retries are left to the
+    resilience layer, so SDK retries are turned off.
+
+    Args:
+        provider: Backend name from PROVIDERS. Defaults to settings.LLM_PROVIDER.
+
+    Returns:
+        Any: Client exposing `chat.completions.create(**kwargs)`.
+
+    Raises:
+        ValueError: If the provider name is unknown.
+    """
+    provider = provider or settings.LLM_PROVIDER
+    if provider == "together":
+        return AsyncTogether(
+            api_key=settings.TOGETHER_AI_API_KEY,
+            base_url=settings.TOGETHER_BASE_URL,
+            max_retries=0,
+        )
+    if provider == "openai_compatible":
+        return OpenAICompatibleClient(settings.LLM_BASE_URL, settings.LLM_API_KEY)
+    raise ValueError(f"Unknown LLM provider '{provider}', expected one of: {', '.join(PROVIDERS)}")
@@ -0,0 +1,329 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Optional
+
+import aiohttp
+from together import error as together_error
+
+from core.logging import setup_logger
+
+
+logger = setup_logger(__name__)
+
+# HTTP statuses worth retrying: timeouts, rate limits and server-side failures
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    together_error.RateLimitError,
+    together_error.Timeout,
+    together_error.APIConnectionError,
+    together_error.ServiceUnavailableError,
+    aiohttp.ClientConnectionError,
+    # A stream cut off mid-response
+    aiohttp.ClientPayloadError,
+    ConnectionError,
+)
+
+
+class ProviderUnavailableError(RuntimeError):
+    """The LLM provider kept failing with retryable errors."""
+
+
+class CircuitOpenError(ProviderUnavailableError):
+    """The circuit breaker is open and calls are rejected without reaching the provider."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether an error from the provider is transient and worth retrying."""
+    if isinstance(exc, RETRYABLE_ERRORS):
+        return True
+    return getattr(exc, "http_status", None) in RETRYABLE_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After failure_threshold consecutive failures the breaker opens and rejects
+    calls for reset_seconds. It then lets a single probe through (half-open);
+    the probe's outcome closes or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.opened_count = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may go out now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """End a call without counting it as a success or a failure, freeing the half-open probe slot."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened_count += 1
+                    logger.warning(f"LLM circuit breaker opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of call latencies, in seconds."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class ResilientClient:
+    """
+    Wraps an LLM provider client with retries, timeouts, hedging and a circuit breaker.
+
+    Exposes the same `chat.completions.create(**kwargs)` call as the wrapped
+    client. Each attempt is bounded by timeout_seconds. Retryable errors are
+    retried up to max_retries times with full-jitter exponential backoff. When
+    hedging is enabled and enough latencies have been observed, an attempt that
+    runs past the p95 latency gets a duplicate request, and the first success
+    wins. Once the breaker is open, calls fail fast with CircuitOpenError.
+
+    Streamed requests should pass `consume`, an async function that reads the
+    stream and returns the result. It runs inside each attempt, so reading the
+    stream shares the attempt's deadline, and a stream that stalls or breaks
+    mid-response is retried like a failed request.
+
+    Args:
+        client: Client to wrap.
+        max_retries: Retries after the first attempt.
+        base_delay: Backoff base, in seconds.
+        max_delay: Backoff cap, in seconds.
+        timeout_seconds: Per-attempt timeout.
+        hedging_enabled: Send a duplicate request for slow non-streaming calls.
+        hedge_min_samples: Latencies needed before hedging starts.
+        hedge_min_delay: Lower bound on the hedge delay, in seconds.
+        breaker: Circuit breaker shared by all calls.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        max_retries: int,
+        base_delay: float,
+        max_delay: float,
+        timeout_seconds: float,
+        hedging_enabled: bool,
+        hedge_min_samples: int,
+        hedge_min_delay: float,
+        breaker: CircuitBreaker,
+    ):
+        self._client = client
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout_seconds = timeout_seconds
+        self.hedging_enabled = hedging_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self._counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "breaker_rejections": 0,
+        }
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry number (starting at 0)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while hedging is off or unwarmed."""
+        if not self.hedging_enabled or len(self.latency) < self.hedge_min_samples:
+            return None
+        p95 = self.latency.percentile(95)
+        return max(self.hedge_min_delay, p95) if p95 is not None else None
+
+    async def _request(self, kwargs: dict, consume: Optional[Callable[[Any], Awaitable[Any]]]) -> Any:
+        response = await self._client.chat.completions.create(**kwargs)
+        if consume is None:
+            return response
+        try:
+            return await consume(response)
+        finally:
+            close = getattr(response, "aclose", None)
+            if close is not None:
+                await close()
+
+    async def _attempt(self, kwargs: dict, consume: Optional[Callable[[Any], Awaitable[Any]]]) -> Any:
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(self._request(kwargs, consume), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise
+        # An unconsumed stream has only started, so its latency says nothing
+        if consume is not None or not kwargs.get("stream"):
+            self.latency.record(time.monotonic() - started)
+        return response
+
+    async def _hedged_attempt(self, kwargs: dict, consume: Optional[Callable[[Any], Awaitable[Any]]]) -> Any:
+        delay = None if kwargs.get("stream") and consume is None else self.hedge_delay()
+        if delay is None:
+            return await self._attempt(kwargs, consume)
+
+        primary = asyncio.ensure_future(self._attempt(kwargs, consume))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count("hedges")
+        hedge = asyncio.ensure_future(self._attempt(kwargs, consume))
+        pending = {primary, hedge}
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins")
+                        return task.result()
+                    last_error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise last_error
+
+    async def create(self, consume: Optional[Callable[[Any], Awaitable[Any]]] = None, **kwargs: Any) -> Any:
+        """
+        Run a chat completion with retries, timeouts, hedging and the circuit breaker.
+
+        Args:
+            consume: For stream=True, reads the stream within each attempt and
+                returns the call's result. The stream is closed afterwards.
+            **kwargs: Arguments for the wrapped client's create().
+
+        Returns:
+            Any: The response, or what consume returned.
+
+        Raises:
+            CircuitOpenError: If the breaker is open.
+            ProviderUnavailableError: If every attempt failed with a retryable error.
+            Exception: Non-retryable provider errors are re-raised unchanged.
+        """
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count("breaker_rejections")
+                raise CircuitOpenError("LLM provider circuit breaker is open")
+            try:
+                response = await self._hedged_attempt(kwargs, consume)
+            except Exception as e:
+                if not is_retryable(e):
+                    # A rejected request says nothing either way about the provider's health
+                    self.breaker.release()
+                    self._count("failures")
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    self._count("failures")
+                    raise ProviderUnavailableError(
+                        f"LLM provider failed after {attempt + 1} attempts: {type(e).__name__}: {e}"
+                    ) from e
+                delay = self.backoff_delay(attempt)
+                logger.warning(f"Retryable LLM error ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+                self._count("retries")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self._count("successes")
+            return response
+
+    async def aclose(self) -> None:
+        """Release connections the wrapped client holds for the running event loop."""
+        close = getattr(self._client, "close", None)
+        if close is not None:
+            await close()
+
+    def stats(self) -> dict:
+        """Counters, breaker state and latency percentiles."""
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.opened_count,
+            "latency_p50": self.latency.percentile(50),
+            "latency_p95": self.latency.percentile(95),
+        }
+
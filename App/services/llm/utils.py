@@ -1,29 +1,62 @@
 # Helper function to extract structured data using Together AI
-from models.schema import ReceiptExtractedData
-from together import Together
+import asyncio
+import json
+from typing import Callable, Dict, List, Optional, Type, Tuple
 
+from models.schema import ReceiptExtractedData
 from core.config import settings
 
-client = Together(api_key=settings.TOGETHER_AI_API_KEY)
+from services.llm.cache import ExtractionCache, extraction_cache
+from services.llm.compaction import compact_receipt_text, estimate_tokens
+from services.llm.json_stream import IncrementalJSONArrayParser, IncrementalJSONObjectParser
+from services.llm.providers import create_provider_client
+from services.llm.resilience import CircuitBreaker, ProviderUnavailableError, ResilientClient
+from core.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# Async client for the configured provider (settings.LLM_PROVIDER), wrapped in
+# the resilience layer so model calls never block the event loop
+client = ResilientClient(
+    create_provider_client(),
+    max_retries=settings.LLM_MAX_RETRIES,
+    base_delay=settings.LLM_RETRY_BASE_DELAY,
+    max_delay=settings.LLM_RETRY_MAX_DELAY,
+    timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+    hedging_enabled=settings.LLM_HEDGING_ENABLED,
+    hedge_min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+    hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY_SECONDS,
+    breaker=CircuitBreaker(settings.LLM_BREAKER_FAILURE_THRESHOLD, settings.LLM_BREAKER_RESET_SECONDS),
+)
 
+VISION_MODEL = "meta-llama/Llama-3.2-11B-Vision-Instruct-Turbo"
+EXTRACTION_MODEL = "meta-llama/Llama-3.2-11B-Vision-Instruct-Turbo"
 
+# Bump whenever the extraction prompt changes so cached results are not reused
+PROMPT_VERSION = "1"
 
-async def extract_text_pdf(image_base64: str) -> str:
+# Stored on each receipt; receipts with a different version are re-extracted from raw_text
+EXTRACTION_VERSION = f"{PROMPT_VERSION}:{EXTRACTION_MODEL}"
+
+
+async def extract_text_pdf(image_base64: str, mime_type: str = "image/png") -> str:
     """
     Extract text from a base64-encoded image using Together AI's vision model.
 
     Args:
         image_base64: Base64-encoded string of the image.
+        mime_type: MIME type of the encoded image.
 
     Returns:
         str: Extracted text from the image.
 
     Raises:
+        ProviderUnavailableError: If the provider is down or the circuit breaker is open.
         RuntimeError: If the API call fails or returns invalid data.
     """
     try:
-        response = client.chat.completions.create(
-            model="meta-llama/Llama-3.2-11B-Vision-Instruct-Turbo",
+        response = await client.chat.completions.create(
+            model=VISION_MODEL,
             messages=[
                 {
                     "role": "user",
@@ -34,7 +67,7 @@ async def extract_text_pdf(image_base64: str) -> str:
                         },
                         {
                             "type": "image_url",
-                            "image_url": {"url": f"data:image/png;base64,{image_base64}"}
+                            "image_url": {"url": f"data:{mime_type};base64,{image_base64}"}
                         }
                     ]
                 }
@@ -44,72 +77,406 @@ async def extract_text_pdf(image_base64: str) -> str:
         )
         page_text = response.choices[0].message.content.strip()
         return page_text
+    except ProviderUnavailableError:
+        raise
     except Exception as e:
         raise RuntimeError(f"Failed to extract text from image: {str(e)}")
     
 
 
 
-async def extract_receipt_data(text: str) -> ReceiptExtractedData:
-    """Use Together AI to parse receipt text into structured data."""
-    prompt = f"""
-Extract the following information from the receipt text:
-- merchant_name (string): Name of the merchant or store
-- total_amount (float): Total amount spent
-- purchased_at (string): Date and time of purchase in 'YYYY-MM-DD HH:MM:SS' format. 
+async def extract_text_pdf_pages(
+    images_base64: List[str],
+    mime_type: str = "image/png",
+    on_page: Optional[Callable[[int, str], None]] = None,
+) -> List[Tuple[str, Optional[Exception]]]:
+    """
+    Extract text from several page images concurrently.
+
+    At most settings.VISION_MAX_CONCURRENCY vision calls are in flight at once.
+    A failing page does not cancel or discard the others.
+
+    Args:
+        images_base64: Base64-encoded page images, in page order.
+        mime_type: MIME type shared by the encoded images.
+        on_page: Called with (index, text) as soon as each page succeeds, e.g. to cache it.
+
+    Returns:
+        list: (text, error or None) for each page, in the same order; failed pages have empty text.
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.VISION_MAX_CONCURRENCY))
+
+    async def extract_page(index: int, image_base64: str) -> Tuple[str, Optional[Exception]]:
+        try:
+            async with semaphore:
+                page_text = await extract_text_pdf(image_base64, mime_type)
+        except Exception as e:
+            return "", e
+        if on_page is not None:
+            on_page(index, page_text)
+        return page_text, None
+
+    return await asyncio.gather(
+        *(extract_page(index, image_base64) for index, image_base64 in enumerate(images_base64))
+    )
+
+
+# Prompt description for each extractable field, in output order
+FIELD_PROMPTS = {
+    "merchant_name": "- merchant_name (string): Name of the merchant or store",
+    "total_amount": "- total_amount (float): Total amount spent",
+    "purchased_at": """- purchased_at (string): Date and time of purchase in 'YYYY-MM-DD HH:MM:SS' format. 
   - Parse any date/time format in the text (e.g., MM/DD/YYYY, DD-MM-YYYY, Month DD YYYY, HH:MM AM/PM, etc.).
   - If time is missing, assume 00:00:00.
-  - If date is ambiguous or missing, return null.
-- store_address (string): Store address, if available
-- phone_number (string): Store phone number, if available
-- store_number (string): Store number, if available
-- cashier_number (string): Cashier number, if available
-- barcode_num (string): Barcode number, if available
-- items (list of dicts): List of purchased items, each with at least 'name' and 'price', if available
-- payment_details (dict): Payment method and details, if available
-- additional_info (dict): Any additional receipt information, if available
+  - If date is ambiguous or missing, return null.""",
+    "store_address": "- store_address (string): Store address, if available",
+    "phone_number": "- phone_number (string): Store phone number, if available",
+    "store_number": "- store_number (string): Store number, if available",
+    "cashier_number": "- cashier_number (string): Cashier number, if available",
+    "barcode_num": "- barcode_num (string): Barcode number, if available",
+    "items": "- items (list of dicts): List of purchased items, each with at least 'name' and 'price', if available",
+    "payment_details": "- payment_details (dict): Payment method and details, if available",
+    "additional_info": "- additional_info (dict): Any additional receipt information, if available",
+}
+
+
+def build_extraction_prompt(text: str, fields: Optional[List[str]] = None) -> str:
+    """
+    Build the structured-extraction prompt for a receipt.
+
+    Args:
+        text: Receipt text.
+        fields: Fields to ask for. Defaults to every field in FIELD_PROMPTS.
+
+    Returns:
+        str: Prompt text.
+    """
+    fields = [field for field in FIELD_PROMPTS if fields is None or field in fields]
+    descriptions = "\n".join(FIELD_PROMPTS[field] for field in fields)
+    template = ",\n".join(f'  "{field}": null' for field in fields)
+    return f"""
+Extract the following information from the receipt text:
+{descriptions}
 
 Receipt text:
 {text}
 
 Return the output in JSON format with null for missing fields:
 {{
-  "merchant_name": null,
-  "total_amount": null,
-  "purchased_at": null,
-  "store_address": null,
-  "phone_number": null,
-  "store_number": null,
-  "cashier_number": null,
-  "barcode_num": null,
-  "items": null,
-  "payment_details": null,
-  "additional_info": null
+{template}
 }}
 """
+
+
+def compact_for_prompt(text: str) -> str:
+    """
+    Apply prompt compaction when enabled and log the token savings.
+
+    Args:
+        text: Receipt text.
+
+    Returns:
+        str: Text to place in the prompt.
+    """
+    if not settings.PROMPT_COMPACTION_ENABLED:
+        return text
+    result = compact_receipt_text(text, settings.PROMPT_FOOTER_MAX_LINES)
+    logger.info(f"Compacted receipt text from ~{result.original_tokens} to ~{result.compacted_tokens} tokens")
+    return result.text
+
+
+def _extraction_cache_key(text: str, fields: Optional[List[str]] = None) -> str:
+    prompt_version = PROMPT_VERSION if fields is None else f"{PROMPT_VERSION}:{','.join(sorted(fields))}"
+    return ExtractionCache.make_key(text, EXTRACTION_MODEL, prompt_version)
+
+
+async def _complete_json_object(
+    prompt: str,
+    max_tokens: int = 1000,
+    parser_class: Type[IncrementalJSONObjectParser] = IncrementalJSONObjectParser,
+) -> IncrementalJSONObjectParser:
+    """
+    Run a completion and capture the first JSON object in its output.
+
+    With LLM_STREAMING enabled the response is streamed and the stream is
+    closed as soon as the top-level object is complete. The stream is read
+    inside the resilient client's attempt, so it is covered by the same
+    timeout, retries and circuit breaker as the request itself.
+
+    Args:
+        prompt: User prompt.
+        max_tokens: Output token limit for the completion.
+        parser_class: Parser to feed the output to; IncrementalJSONArrayParser
+            captures a top-level array instead.
+
+    Returns:
+        IncrementalJSONObjectParser: Parser holding the (possibly truncated) object.
+    """
+    request = dict(
+        model=EXTRACTION_MODEL,
+        messages=[
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=max_tokens,
+        temperature=0.5
+    )
+
+    if not settings.LLM_STREAMING:
+        response = await client.chat.completions.create(**request)
+        parser = parser_class()
+        parser.feed(response.choices[0].message.content or "")
+        return parser
+
+    async def read_stream(stream) -> IncrementalJSONObjectParser:
+        # A fresh parser per attempt, so a retried stream starts over
+        parser = parser_class()
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content if chunk.choices[0].delta else None
+            if delta and parser.feed(delta):
+                break
+        return parser
+
+    return await client.chat.completions.create(stream=True, consume=read_stream, **request)
+
+
+def _valid_fields(values: Optional[dict]) -> dict:
+    """Keep only known fields whose values validate on their own."""
+    valid = {}
+    for field, value in (values or {}).items():
+        if field not in ReceiptExtractedData.model_fields:
+            continue
+        try:
+            ReceiptExtractedData.model_validate({field: value})
+        except Exception:
+            continue
+        valid[field] = value
+    return valid
+
+
+async def extract_receipt_data(
+    text: str,
+    fields: Optional[List[str]] = None,
+    allow_followup: bool = True,
+    compact: bool = True,
+) -> ReceiptExtractedData:
+    """
+    Use Together AI to parse receipt text into structured data.
+
+    If the model output is cut off, the fields that arrived in full are kept and
+    a follow-up request asks only for the missing ones.
+
+    Args:
+        text: Receipt text.
+        fields: Only ask the model for these fields. Defaults to all fields.
+        allow_followup: Whether a truncated response may trigger a follow-up request.
+        compact: Apply prompt compaction; False when the text was already compacted.
+
+    Returns:
+        ReceiptExtractedData: Parsed data; fields not requested are left as None.
+
+    Raises:
+        ProviderUnavailableError: If the provider is down or the circuit breaker is open.
+        RuntimeError: If the API call fails or returns invalid data.
+    """
+    if compact:
+        text = compact_for_prompt(text)
+    prompt = build_extraction_prompt(text, fields)
+    cache_key = _extraction_cache_key(text, fields)
+    if extraction_cache is not None:
+        cached = extraction_cache.get(cache_key)
+        if cached is not None:
+            return ReceiptExtractedData.model_validate_json(cached)
+
     try:
-        response = client.chat.completions.create(
-            model="meta-llama/Llama-3.2-11B-Vision-Instruct-Turbo",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,  # Increased max_tokens to handle larger JSON output
-            temperature=0.5
-        )
-        generated_text = response.choices[0].message.content.strip()
-        
-        # Extract JSON from response
-        start = generated_text.find("{")
-        end = generated_text.rfind("}") + 1
-        if start == -1 or end == 0:
-            raise RuntimeError("Invalid JSON response from LLM")
-        json_str = generated_text[start:end]
-        print(json_str,"json")
-        
-        return ReceiptExtractedData.model_validate_json(json_str)
+        parser = await _complete_json_object(prompt)
+
+        if parser.complete:
+            extracted_data = ReceiptExtractedData.model_validate_json(parser.text)
+        else:
+            # Output was truncated: keep the fields received in full and ask only for the rest
+            requested = fields or list(FIELD_PROMPTS)
+            partial = _valid_fields(parser.recover())
+            if not partial and not parser.started:
+                raise RuntimeError("Invalid JSON response from LLM")
+            missing = [field for field in requested if field not in partial]
+            logger.warning(f"Truncated LLM output, re-requesting {len(missing)} fields: {', '.join(missing)}")
+            if missing and allow_followup:
+                followup = await extract_receipt_data(text, missing, allow_followup=False, compact=False)
+                partial.update({field: getattr(followup, field) for field in missing})
+            extracted_data = ReceiptExtractedData.model_validate(partial)
+    except ProviderUnavailableError:
+        raise
     except Exception as e:
         raise RuntimeError(f"Failed to parse receipt data: {str(e)}")
 
+    if extraction_cache is not None:
+        extraction_cache.set(cache_key, extracted_data.model_dump_json())
+    return extracted_data
+
+
+def pack_batches(texts: Dict[str, str], token_budget: int, max_items: int) -> List[Dict[str, str]]:
+    """
+    Group receipt texts into batches that fit a prompt token budget.
+
+    Texts are packed greedily in the given order. A text larger than the budget
+    gets a batch of its own.
+
+    Args:
+        texts: Receipt texts keyed by caller-chosen id.
+        token_budget: Maximum estimated input tokens per batch.
+        max_items: Maximum receipts per batch.
+
+    Returns:
+        list: Batches of {id: text}.
+    """
+    batches: List[Dict[str, str]] = []
+    current: Dict[str, str] = {}
+    current_tokens = 0
+    for key, text in texts.items():
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = {}, 0
+        current[key] = text
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_prompt(texts: Dict[str, str], fields: Optional[List[str]] = None) -> str:
+    """
+    Build a prompt asking for structured data from several receipts at once.
+
+    Args:
+        texts: Receipt texts keyed by id.
+        fields: Fields to ask for. Defaults to every field in FIELD_PROMPTS.
+
+    Returns:
+        str: Prompt text requesting a JSON array keyed by "id".
+    """
+    fields = [field for field in FIELD_PROMPTS if fields is None or field in fields]
+    descriptions = "\n".join(FIELD_PROMPTS[field] for field in fields)
+    template = ",\n".join(f'    "{field}": null' for field in fields)
+    receipts = "\n\n".join(f"### RECEIPT {key}\n{text}" for key, text in texts.items())
+    return f"""
+Extract the following information from each receipt text below:
+{descriptions}
+
+Each receipt starts with a line "### RECEIPT <id>".
+
+{receipts}
+
+Return a JSON array with exactly one object per receipt, in the same order, with null for missing fields:
+[
+  {{
+    "id": "<id>",
+{template}
+  }}
+]
+"""
+
+
+async def _extract_batch(texts: Dict[str, str], fields: Optional[List[str]] = None) -> Dict[str, ReceiptExtractedData]:
+    """Run one batched completion and return the elements that arrived in full and validated."""
+    parser = await _complete_json_object(
+        build_batch_prompt(texts, fields),
+        max_tokens=min(settings.LLM_BATCH_OUTPUT_TOKENS_PER_ITEM * len(texts), 8000),
+        parser_class=IncrementalJSONArrayParser,
+    )
+    if not parser.started:
+        raise RuntimeError("Invalid JSON array response from LLM")
+    # A truncated array still yields the elements received in full; the rest fall back
+    elements = parser.result() if parser.complete else parser.recover()
+    if elements is None:
+        raise RuntimeError("Invalid JSON array response from LLM")
+
+    results: Dict[str, ReceiptExtractedData] = {}
+    for element in elements:
+        if not isinstance(element, dict):
+            continue
+        key = str(element.pop("id", ""))
+        if key not in texts or key in results:
+            continue
+        try:
+            results[key] = ReceiptExtractedData.model_validate(element)
+        except Exception as e:
+            logger.warning(f"Batch element {key} failed validation: {str(e)}")
+    return results
+
+
+async def extract_receipt_data_batch(
+    texts: Dict[str, str],
+    fields: Optional[Dict[str, List[str]]] = None,
+    concurrency: int = 4,
+) -> Dict[str, ReceiptExtractedData]:
+    """
+    Parse several receipt texts into structured data with as few LLM calls as possible.
+
+    Cached results are used first. The remaining texts are grouped by the fields
+    requested for them, packed into batches within settings.LLM_BATCH_TOKEN_BUDGET
+    and sent as one request each, asking for a JSON array keyed by id. Any receipt
+    whose element is missing or fails validation, or whose whole batch fails, is
+    retried with extract_receipt_data. Up to `concurrency` requests run at once.
+
+    Args:
+        texts: Receipt texts keyed by caller-chosen id.
+        fields: Per id, only ask the model for these fields. Ids not present get all fields.
+        concurrency: Maximum LLM requests in flight.
+
+    Returns:
+        dict: Structured data keyed by id. Receipts that still fail are omitted.
+    """
+    fields = fields or {}
+    texts = {key: compact_for_prompt(text) for key, text in texts.items()}
+    results: Dict[str, ReceiptExtractedData] = {}
+    pending: Dict[Optional[Tuple[str, ...]], Dict[str, str]] = {}
+    for key, text in texts.items():
+        key_fields = fields.get(key)
+        cached = extraction_cache.get(_extraction_cache_key(text, key_fields)) if extraction_cache is not None else None
+        if cached is not None:
+            results[key] = ReceiptExtractedData.model_validate_json(cached)
+        else:
+            group = tuple(sorted(key_fields)) if key_fields is not None else None
+            pending.setdefault(group, {})[key] = text
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def extract_batch(batch: Dict[str, str], group: Optional[Tuple[str, ...]]) -> List[str]:
+        """Extract one batch and return the ids that still need a single request."""
+        group_fields = list(group) if group is not None else None
+        try:
+            async with semaphore:
+                batch_results = await _extract_batch(batch, group_fields)
+        except Exception as e:
+            logger.warning(f"Batch extraction of {len(batch)} receipts failed: {str(e)}")
+            batch_results = {}
+        for key, text in batch.items():
+            if key in batch_results:
+                results[key] = batch_results[key]
+                if extraction_cache is not None:
+                    extraction_cache.set(_extraction_cache_key(text, group_fields), batch_results[key].model_dump_json())
+        return [key for key in batch if key not in batch_results]
 
+    async def extract_single(key: str) -> None:
+        try:
+            async with semaphore:
+                results[key] = await extract_receipt_data(texts[key], fields.get(key), compact=False)
+        except RuntimeError as e:
+            logger.warning(f"Single extraction of receipt {key} failed: {str(e)}")
 
+    fallback: List[str] = []
+    batches = []
+    for group, group_texts in pending.items():
+        for batch in pack_batches(group_texts, settings.LLM_BATCH_TOKEN_BUDGET, settings.LLM_BATCH_MAX_ITEMS):
+            if len(batch) == 1:
+                fallback.extend(batch)
+            else:
+                batches.append(extract_batch(batch, group))
+    for keys in await asyncio.gather(*batches):
+        fallback.extend(keys)
 
+    await asyncio.gather(*(extract_single(key) for key in fallback))
+    return results
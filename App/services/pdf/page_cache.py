@@ -0,0 +1,216 @@
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from typing import Optional
+
+from PIL import Image
+
+from core.config import settings
+from core.logging import setup_logger
+
+
+logger = setup_logger(__name__)
+
+
+# Indirect references in PDF object source, with the dictionary key they belong to, if any
+REFERENCE_RE = re.compile(r"(?:/(\w+)\s+)?\b(\d+)\s+\d+\s+R\b")
+# Back-links to the page tree; following them would hash other pages
+SKIP_REFERENCE_KEYS = {"Parent", "P", "Popup", "IRT"}
+
+
+def _hash_pdf_value(doc, kind: str, value: str, digest, seen: set) -> None:
+    """
+    Hash a PDF value and every object it references, streams included.
+
+    Object numbers are replaced by the referenced object's own hash input, so
+    the same resources stored under different xrefs hash the same.
+    """
+    if kind == "xref":
+        xref = int(value.split()[0])
+        if xref in seen:
+            digest.update(b"<seen>")
+            return
+        seen.add(xref)
+        value = doc.xref_object(xref, compressed=True)
+        if doc.xref_is_stream(xref):
+            digest.update(doc.xref_stream_raw(xref) or b"")
+    elif kind in ("null", "none"):
+        return
+    digest.update(REFERENCE_RE.sub(lambda m: f"/{m.group(1)} R" if m.group(1) else "R", value).encode("utf-8"))
+    for match in REFERENCE_RE.finditer(value):
+        if match.group(1) not in SKIP_REFERENCE_KEYS:
+            _hash_pdf_value(doc, "xref", f"{match.group(2)} 0 R", digest, seen)
+
+
+def page_fingerprint(page) -> str:
+    """
+    Hash everything that determines how a page renders.
+
+    Covers the page geometry, its content streams, and its resources followed
+    recursively: images, form XObjects and their own resources, and fonts
+    down to the embedded font programs. Annotations and form fields are
+    covered through their rectangles, flags and appearance streams. Identical
+    pages in different files share a fingerprint.
+
+    Args:
+        page: fitz page object.
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    doc = page.parent
+    digest = hashlib.sha256()
+    seen: set = set()
+    digest.update(repr((tuple(page.rect), page.rotation)).encode("utf-8"))
+    for xref in page.get_contents():
+        digest.update(doc.xref_stream_raw(xref) or b"")
+
+    # Resources may be inherited from an ancestor in the page tree
+    node = page.xref
+    resources = doc.xref_get_key(node, "Resources")
+    while resources[0] == "null":
+        parent = doc.xref_get_key(node, "Parent")
+        if parent[0] != "xref":
+            break
+        node = int(parent[1].split()[0])
+        resources = doc.xref_get_key(node, "Resources")
+    _hash_pdf_value(doc, *resources, digest, seen)
+
+    for annot_xref, *_ in page.annot_xrefs():
+        for key in ("Rect", "F", "AP"):
+            digest.update(key.encode("utf-8"))
+            _hash_pdf_value(doc, *doc.xref_get_key(annot_xref, key), digest, seen)
+    return digest.hexdigest()
+
+
+class PageArtifactCache:
+    """
+    Disk cache for per-page render and OCR artifacts.
+
+    Entries are files named by a hash of the page fingerprint, the artifact kind
+    and the parameters that produced it. Reads refresh the file's modification
+    time, and once the directory grows past max_bytes the least recently used
+    files are deleted down to 90% of the limit. Several processes can share the
+    directory: writes go through a temporary file and an atomic rename.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._approx_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(fingerprint: str, kind: str, **params) -> str:
+        """Build the cache key for one artifact of a page."""
+        payload = json.dumps({"page": fingerprint, "kind": kind, **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def get_bytes(self, key: str, suffix: str) -> Optional[bytes]:
+        """Return the stored artifact, or None on a miss."""
+        path = self._path(key, suffix)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def set_bytes(self, key: str, suffix: str, data: bytes) -> None:
+        """Store an artifact, evicting old files if the cache is over its size limit."""
+        path = self._path(key, suffix)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write page cache entry {key}{suffix}: {str(e)}")
+            return
+
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._directory_size()
+            self._approx_bytes += len(data)
+            if self._approx_bytes > self.max_bytes:
+                self._evict()
+
+    def get_text(self, key: str) -> Optional[str]:
+        data = self.get_bytes(key, ".txt")
+        return data.decode("utf-8") if data is not None else None
+
+    def set_text(self, key: str, text: str) -> None:
+        self.set_bytes(key, ".txt", text.encode("utf-8"))
+
+    def get_image(self, key: str) -> Optional[Image.Image]:
+        data = self.get_bytes(key, ".png")
+        if data is None:
+            return None
+        img = Image.open(io.BytesIO(data))
+        img.load()
+        return img
+
+    def set_image(self, key: str, img: Image.Image) -> None:
+        buffered = io.BytesIO()
+        img.save(buffered, format="PNG", optimize=False)
+        self.set_bytes(key, ".png", buffered.getvalue())
+
+    def _entries(self):
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    yield entry
+
+    def _directory_size(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _evict(self) -> None:
+        """Delete least recently used files until the cache is at 90% of max_bytes."""
+        files = []
+        for entry in self._entries():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self._approx_bytes = total
+
+    def stats(self) -> dict:
+        """Return hit, miss and eviction counters for this process."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+page_cache: Optional[PageArtifactCache] = None
+if settings.PAGE_CACHE_ENABLED:
+    page_cache = PageArtifactCache(settings.PAGE_CACHE_DIR, settings.PAGE_CACHE_MAX_BYTES)
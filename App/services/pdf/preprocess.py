@@ -0,0 +1,161 @@
+from typing import Optional, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+
+PROBE_DPI = 100  # resolution used to measure text height before the real render
+TARGET_LINE_HEIGHT = 40  # pixels per text line that Tesseract reads most reliably
+MIN_OCR_DPI = 150
+MAX_OCR_DPI = 400
+MIN_DARK_PIXELS = 0.002  # share of a row or column that must be dark to count as content
+CROP_PADDING = 10
+MAX_SKEW_ANGLE = 5.0  # degrees
+SKEW_STEP = 0.25  # degrees
+SKEW_SAMPLE_POINTS = 20000
+
+
+def render_gray(page, dpi: int) -> np.ndarray:
+    """Render a page straight to an 8-bit grayscale array."""
+    pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), colorspace=fitz.csGRAY, alpha=False)
+    samples = np.frombuffer(pix.samples, dtype=np.uint8)
+    return samples.reshape(pix.height, pix.stride)[:, :pix.width]
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Otsu's threshold: the gray level that maximizes between-class variance."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight = np.cumsum(hist)
+    total = weight[-1]
+    if total == 0:
+        return 128
+    cumulative_mean = np.cumsum(hist * np.arange(256))
+    background = weight
+    foreground = total - weight
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_background = cumulative_mean / background
+        mean_foreground = (cumulative_mean[-1] - cumulative_mean) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+    variance = np.nan_to_num(variance)
+    return int(np.argmax(variance))
+
+
+def content_bbox(mask: np.ndarray, padding: int = CROP_PADDING) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box (top, bottom, left, right) of the dark pixels in a mask.
+
+    Rows and columns with fewer than MIN_DARK_PIXELS dark pixels are treated as
+    noise. Returns None for a blank page.
+    """
+    height, width = mask.shape
+    rows = np.flatnonzero(mask.sum(axis=1) > max(1, width * MIN_DARK_PIXELS))
+    cols = np.flatnonzero(mask.sum(axis=0) > max(1, height * MIN_DARK_PIXELS))
+    if rows.size == 0 or cols.size == 0:
+        return None
+    return (
+        max(0, rows[0] - padding),
+        min(height, rows[-1] + 1 + padding),
+        max(0, cols[0] - padding),
+        min(width, cols[-1] + 1 + padding),
+    )
+
+
+def estimate_line_height(mask: np.ndarray) -> Optional[float]:
+    """
+    Median height in pixels of the text lines in a mask.
+
+    Lines are the runs of rows that contain dark pixels in the horizontal projection.
+    """
+    inked = (mask.sum(axis=1) > max(1, mask.shape[1] * MIN_DARK_PIXELS)).astype(np.int8)
+    edges = np.diff(np.concatenate(([0], inked, [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    heights = ends - starts
+    heights = heights[heights >= 2]
+    if heights.size == 0:
+        return None
+    return float(np.median(heights))
+
+
+def estimate_skew(mask: np.ndarray, max_angle: float = MAX_SKEW_ANGLE, step: float = SKEW_STEP) -> float:
+    """
+    Estimate the text skew angle in degrees (counter-clockwise positive).
+
+    Dark pixels are projected onto the vertical axis at each candidate angle, and
+    the angle whose projection has the sharpest peaks (text lines aligned with
+    rows) wins. All angles are scored in one vectorized pass over a sample of points.
+    """
+    ys, xs = np.nonzero(mask)
+    if ys.size < 100:
+        return 0.0
+    if ys.size > SKEW_SAMPLE_POINTS:
+        picks = np.random.default_rng(0).choice(ys.size, SKEW_SAMPLE_POINTS, replace=False)
+        ys, xs = ys[picks], xs[picks]
+
+    angles = np.arange(-max_angle, max_angle + step / 2, step)
+    radians = np.deg2rad(angles)[:, None]
+    projected = np.round(ys[None, :] * np.cos(radians) + xs[None, :] * np.sin(radians)).astype(np.int64)
+    projected -= projected.min()
+    bins = int(projected.max()) + 1
+    offsets = (np.arange(len(angles)) * bins)[:, None]
+    histograms = np.bincount((projected + offsets).ravel(), minlength=bins * len(angles)).reshape(len(angles), bins)
+    scores = (histograms.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[int(np.argmax(scores))])
+
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    """Dark-pixel mask of a grayscale image, cropped to its content."""
+    mask = gray < otsu_threshold(gray)
+    bbox = content_bbox(mask)
+    if bbox is not None:
+        top, bottom, left, right = bbox
+        mask = mask[top:bottom, left:right]
+    return mask
+
+
+def mask_to_image(mask: np.ndarray, angle: float = 0.0) -> Image.Image:
+    """Black-on-white image of a mask, rotated to undo a skew angle."""
+    img = Image.fromarray(np.where(mask, 0, 255).astype(np.uint8), "L")
+    if abs(angle) >= SKEW_STEP:
+        # Rotating by minus the projection angle brings the text lines level
+        img = img.rotate(-angle, resample=Image.NEAREST, expand=True, fillcolor=255)
+    return img
+
+
+def choose_ocr_dpi(line_height: Optional[float], default_dpi: int) -> int:
+    """
+    Pick a render DPI that gives text lines about TARGET_LINE_HEIGHT pixels tall.
+
+    Args:
+        line_height: Line height measured at PROBE_DPI, or None if no lines were found.
+        default_dpi: Resolution to use when line_height is unknown.
+    """
+    if not line_height:
+        return default_dpi
+    dpi = PROBE_DPI * TARGET_LINE_HEIGHT / line_height
+    return int(min(MAX_OCR_DPI, max(MIN_OCR_DPI, round(dpi / 10) * 10)))
+
+
+def preprocess_page_for_ocr(page, dpi: int, adaptive_dpi: bool = True) -> Image.Image:
+    """
+    Render a page as a cropped, binarized and deskewed grayscale image for OCR.
+
+    A low-resolution probe render is used to estimate the skew angle and, when
+    adaptive_dpi is set, the text line height that decides the final resolution.
+
+    Args:
+        page: fitz page object.
+        dpi: Render resolution, or the fallback when adaptive_dpi finds no text.
+        adaptive_dpi: Choose the resolution from the measured text line height.
+
+    Returns:
+        Image.Image: Black-on-white "L" image.
+    """
+    probe = binarize(render_gray(page, PROBE_DPI))
+    angle = estimate_skew(probe)
+    if adaptive_dpi:
+        level = np.asarray(mask_to_image(probe, angle)) < 128
+        dpi = choose_ocr_dpi(estimate_line_height(level), dpi)
+
+    return mask_to_image(binarize(render_gray(page, dpi)), angle)
@@ -1,16 +1,731 @@
 import io
+import asyncio
+from abc import ABC, abstractmethod
+import math
+import multiprocessing
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Optional, Tuple
 from fastapi import HTTPException
 from PyPDF2 import PdfReader
+from core.config import settings
 from core.logging import setup_logger
-import os,fitz,tempfile,time,pytesseract
+import os,fitz,pytesseract
+import re
+import unicodedata
 from PIL import Image
+from models.schema import OCRConfig, VisionImageProfile
+from services.pdf.page_cache import PageArtifactCache, page_cache, page_fingerprint
+from services.pdf.preprocess import preprocess_page_for_ocr
        
 
 logger = setup_logger(__name__)
 
+OCR_DPI = 300
 
+_ocr_executor: Optional[ProcessPoolExecutor] = None
+_ocr_executor_lock = threading.Lock()
 
 
+def pixmap_to_image(pix: "fitz.Pixmap") -> Image.Image:
+    """
+    Wrap a rendered pixmap as a PIL image without encoding it.
+
+    The image is tagged as PPM so pytesseract hands it to the tesseract binary
+    as raw pixels instead of compressing it to PNG first.
+
+    Args:
+        pix: Pixmap rendered by PyMuPDF (grayscale or RGB, with or without alpha).
+
+    Returns:
+        Image.Image: Image sharing the pixmap's sample layout.
+    """
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)  # drop alpha channel
+    mode = "L" if pix.n == 1 else "RGB"
+    img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+    img.format = "PPM"
+    return img
+
+
+IMAGE_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+# Pixels darker than this (0-255) count as content when cropping margins
+CONTENT_THRESHOLD = 235
+CROP_PADDING = 8
+
+
+def vision_profile_from_settings() -> VisionImageProfile:
+    """Build the vision image profile configured in settings."""
+    return VisionImageProfile(
+        dpi=settings.VISION_DPI,
+        grayscale=settings.VISION_GRAYSCALE,
+        crop_margins=settings.VISION_CROP_MARGINS,
+        max_side=settings.VISION_MAX_SIDE,
+        image_format=settings.VISION_IMAGE_FORMAT,
+        quality=settings.VISION_IMAGE_QUALITY,
+    )
+
+
+def crop_to_content(img: Image.Image, padding: int = CROP_PADDING) -> Image.Image:
+    """
+    Crop near-white margins from an image.
+
+    Args:
+        img: Grayscale or RGB image.
+        padding: Pixels of margin kept around the content.
+
+    Returns:
+        Image.Image: Cropped image, or the original if it has no content.
+    """
+    gray = img if img.mode == "L" else img.convert("L")
+    mask = gray.point(lambda v: 255 if v < CONTENT_THRESHOLD else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return img
+    left, top, right, bottom = bbox
+    return img.crop((
+        max(left - padding, 0),
+        max(top - padding, 0),
+        min(right + padding, img.width),
+        min(bottom + padding, img.height),
+    ))
+
+
+def prepare_page_image(page, profile: VisionImageProfile) -> Tuple[bytes, str]:
+    """
+    Render a page and encode it compactly for the vision model.
+
+    The page is rendered straight into the target colorspace, optionally cropped
+    to its content and downscaled, then encoded once in the profile's format.
+
+    Args:
+        page: fitz page object.
+        profile: Rendering and encoding settings.
+
+    Returns:
+        tuple: (encoded image bytes, MIME type).
+    """
+    image_format = profile.image_format.upper()
+    if image_format not in IMAGE_MIME_TYPES:
+        raise ValueError(f"Unsupported vision image format: {profile.image_format}")
+
+    colorspace = fitz.csGRAY if profile.grayscale else fitz.csRGB
+    pix = page.get_pixmap(
+        matrix=fitz.Matrix(profile.dpi/72, profile.dpi/72),
+        colorspace=colorspace,
+        alpha=False,
+    )
+    img = pixmap_to_image(pix)
+
+    if profile.crop_margins:
+        img = crop_to_content(img)
+
+    if profile.max_side and max(img.size) > profile.max_side:
+        img.thumbnail((profile.max_side, profile.max_side), Image.LANCZOS)
+
+    buffered = io.BytesIO()
+    if image_format == "PNG":
+        img.save(buffered, format="PNG", optimize=False)
+    else:
+        img.save(buffered, format=image_format, quality=profile.quality)
+    return buffered.getvalue(), IMAGE_MIME_TYPES[image_format]
+
+
+def _ocr_worker_count() -> int:
+    return settings.OCR_WORKERS or os.cpu_count() or 1
+
+
+def get_ocr_executor() -> ProcessPoolExecutor:
+    """
+    Return the shared process pool used for page rendering and OCR.
+
+    The pool is created on first use with settings.OCR_WORKERS processes. It uses
+    the spawn start method because the server also runs worker threads, and
+    forking a multi-threaded process is unsafe. Job worker threads call this
+    concurrently, so creation is guarded by a lock to start only one pool.
+    """
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is None:
+            _ocr_executor = ProcessPoolExecutor(
+                max_workers=_ocr_worker_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _ocr_executor
+
+
+def shutdown_ocr_executor() -> None:
+    """Shut down the shared OCR pool if it was started."""
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is not None:
+            _ocr_executor.shutdown(wait=False)
+            _ocr_executor = None
+
+
+def ocr_config_from_settings() -> OCRConfig:
+    """Build the default OCR options from settings."""
+    return OCRConfig(
+        lang=settings.OCR_LANG,
+        psm=settings.OCR_PSM,
+        oem=settings.OCR_OEM,
+        preprocess=settings.OCR_PREPROCESS,
+        adaptive_dpi=settings.OCR_ADAPTIVE_DPI,
+    )
+
+
+def render_page_for_ocr(page, dpi: int, config: OCRConfig) -> Image.Image:
+    """
+    Render a page for OCR, preprocessed when config.preprocess is set.
+
+    Args:
+        page: fitz page object.
+        dpi: Render resolution (the fallback resolution with adaptive DPI).
+        config: OCR options.
+
+    Returns:
+        Image.Image: Page image.
+    """
+    if config.preprocess:
+        return preprocess_page_for_ocr(page, dpi, config.adaptive_dpi)
+    pix = page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72))
+    return pixmap_to_image(pix)
+
+
+def tesseract_config_args(config: OCRConfig) -> List[str]:
+    """Command-line flags for the page segmentation and engine modes."""
+    args = []
+    if config.psm is not None:
+        args += ["--psm", str(config.psm)]
+    if config.oem is not None:
+        args += ["--oem", str(config.oem)]
+    return args
+
+
+class OCREngine(ABC):
+    """Turns page images into text. Results are returned in input order."""
+
+    name = ""
+
+    @abstractmethod
+    def recognize(self, images: List[Image.Image], config: OCRConfig) -> List[str]:
+        """Recognize the images, raising if any of them fails."""
+
+
+class PerImageTesseractEngine(OCREngine):
+    """Runs one tesseract process per image through pytesseract."""
+
+    name = "per_page"
+
+    def recognize(self, images: List[Image.Image], config: OCRConfig) -> List[str]:
+        flags = " ".join(tesseract_config_args(config))
+        return [pytesseract.image_to_string(img, lang=config.lang, config=flags) for img in images]
+
+
+class BatchTesseractEngine(OCREngine):
+    """
+    Recognizes many images with a single tesseract process.
+
+    The images are written as uncompressed PNM files and passed through a list
+    file, so process startup and language data loading are paid once per batch
+    instead of once per page. Tesseract ends each page's text with a form feed,
+    which is used to split the output back into pages.
+    """
+
+    name = "batch"
+
+    def recognize(self, images: List[Image.Image], config: OCRConfig) -> List[str]:
+        if len(images) <= 1:
+            return PerImageTesseractEngine().recognize(images, config)
+
+        with tempfile.TemporaryDirectory(prefix="ocr-") as tmp:
+            paths = []
+            for index, img in enumerate(images):
+                path = os.path.join(tmp, f"{index:04d}.pnm")
+                img.save(path)
+                paths.append(path)
+            list_path = os.path.join(tmp, "pages.txt")
+            with open(list_path, "w") as f:
+                f.write("\n".join(paths) + "\n")
+
+            cmd = [pytesseract.pytesseract.tesseract_cmd, list_path, "stdout", "-l", config.lang]
+            result = subprocess.run(cmd + tesseract_config_args(config), capture_output=True)
+
+        if result.returncode != 0:
+            raise RuntimeError(f"tesseract exited with {result.returncode}: {result.stderr.decode(errors='replace').strip()}")
+        pages = result.stdout.decode("utf-8", errors="replace").split("\f")
+        if len(pages) == len(images) + 1 and not pages[-1].strip():
+            pages.pop()
+        if len(pages) != len(images):
+            raise RuntimeError(f"tesseract returned {len(pages)} pages for {len(images)} images")
+        return pages
+
+
+OCR_ENGINES = {engine.name: engine for engine in (PerImageTesseractEngine, BatchTesseractEngine)}
+
+
+def get_ocr_engine(name: Optional[str] = None) -> OCREngine:
+    """
+    Return an OCR engine by name.
+
+    Args:
+        name: Key of OCR_ENGINES. Defaults to settings.OCR_ENGINE.
+
+    Raises:
+        ValueError: If the engine name is unknown.
+    """
+    name = name or settings.OCR_ENGINE
+    if name not in OCR_ENGINES:
+        raise ValueError(f"Unknown OCR engine '{name}', expected one of: {', '.join(OCR_ENGINES)}")
+    return OCR_ENGINES[name]()
+
+
+def ocr_image_results(
+    images: List[Image.Image],
+    config: Optional[OCRConfig] = None,
+    engine: Optional[str] = None,
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    OCR several page images, in order, isolating failures per image.
+
+    If a batched call fails, the images are retried one by one so a single bad
+    page does not lose the others.
+
+    Args:
+        images: Page images.
+        config: Tesseract options. Defaults to ocr_config_from_settings().
+        engine: Engine name. Defaults to settings.OCR_ENGINE.
+
+    Returns:
+        list: (text, error message or None) per image; failed images have empty text.
+    """
+    config = config or ocr_config_from_settings()
+    ocr_engine = get_ocr_engine(engine)
+    try:
+        return [(text, None) for text in ocr_engine.recognize(images, config)]
+    except Exception as e:
+        if len(images) <= 1:
+            return [("", str(e)) for _ in images]
+        logger.warning(f"Batched OCR of {len(images)} pages failed, retrying page by page: {str(e)}")
+
+    fallback = PerImageTesseractEngine()
+    results = []
+    for img in images:
+        try:
+            results.append((fallback.recognize([img], config)[0], None))
+        except Exception as e:
+            results.append(("", str(e)))
+    return results
+
+
+def ocr_images(images: List[Image.Image], config: Optional[OCRConfig] = None, engine: Optional[str] = None) -> List[str]:
+    """
+    OCR several page images, in order.
+
+    Args:
+        images: Page images.
+        config: Tesseract options. Defaults to ocr_config_from_settings().
+        engine: Engine name. Defaults to settings.OCR_ENGINE.
+
+    Returns:
+        list: Text per image. Images that fail are logged and left empty.
+    """
+    texts = []
+    for index, (text, error) in enumerate(ocr_image_results(images, config, engine)):
+        if error is not None:
+            logger.warning(f"OCR of image {index} failed: {error}")
+        texts.append(text)
+    return texts
+
+
+def ocr_cache_keys(page, dpi: int, config: OCRConfig) -> Tuple[str, str]:
+    """
+    Page cache keys for a page's OCR image and OCR text.
+
+    Args:
+        page: fitz page object.
+        dpi: Render resolution.
+        config: OCR options.
+
+    Returns:
+        tuple: (image key, text key).
+    """
+    image_key = PageArtifactCache.make_key(
+        page_fingerprint(page), "ocr-image",
+        dpi=dpi, preprocess=config.preprocess, adaptive_dpi=config.adaptive_dpi,
+    )
+    text_key = PageArtifactCache.make_key(image_key, "ocr-text", lang=config.lang, psm=config.psm, oem=config.oem)
+    return image_key, text_key
+
+
+def _ocr_pages(
+    file_path: str,
+    page_numbers: List[int],
+    dpi: int,
+    config: OCRConfig,
+    engine: str,
+) -> List[Tuple[int, str, Optional[str]]]:
+    """
+    Render and OCR a group of pages. Runs inside a pool worker process.
+
+    Pages whose OCR text is in the page cache skip both steps, and cached
+    renders skip rendering.
+
+    Returns:
+        list: (page number, extracted text, error message or None) per page.
+    """
+    results = {}
+    images = []
+    rendered = []
+    try:
+        with fitz.open(file_path) as doc:
+            for page_num in page_numbers:
+                try:
+                    page = doc.load_page(page_num)
+                    keys = ocr_cache_keys(page, dpi, config) if page_cache is not None else None
+                    img = None
+                    if keys:
+                        cached_text = page_cache.get_text(keys[1])
+                        if cached_text is not None:
+                            results[page_num] = (page_num, cached_text, None)
+                            continue
+                        img = page_cache.get_image(keys[0])
+                    if img is None:
+                        img = render_page_for_ocr(page, dpi, config)
+                        if keys:
+                            page_cache.set_image(keys[0], img)
+                    images.append(img)
+                    rendered.append((page_num, keys))
+                except Exception as e:
+                    results[page_num] = (page_num, "", str(e))
+    except Exception as e:
+        return [(page_num, "", str(e)) for page_num in page_numbers]
+
+    if len(rendered) < len(page_numbers):
+        logger.info(f"Page cache: reused OCR text for {len(page_numbers) - len(rendered)} of {len(page_numbers)} pages")
+
+    if images:
+        try:
+            outcomes = ocr_image_results(images, config, engine)
+        except Exception as e:
+            outcomes = [("", str(e))] * len(images)
+        for (page_num, keys), (text, error) in zip(rendered, outcomes):
+            results[page_num] = (page_num, text, error)
+            if keys and error is None:
+                page_cache.set_text(keys[1], text)
+    return [results[page_num] for page_num in page_numbers]
+
+
+def _chunk_pages(page_numbers: List[int], engine: str) -> List[List[int]]:
+    """Split pages into per-task groups: one page each, or batches spread over the pool."""
+    if engine != BatchTesseractEngine.name or not page_numbers:
+        return [[page_num] for page_num in page_numbers]
+    size = max(1, min(settings.OCR_BATCH_SIZE, math.ceil(len(page_numbers) / _ocr_worker_count())))
+    return [page_numbers[i:i + size] for i in range(0, len(page_numbers), size)]
+
+
+async def ocr_pages_parallel(
+    file_path: str,
+    page_numbers: List[int],
+    dpi: int = OCR_DPI,
+    executor: Optional[Executor] = None,
+    config: Optional[OCRConfig] = None,
+) -> List[str]:
+    """
+    OCR the given pages concurrently in a process pool.
+
+    With the batch engine, pages are grouped so each pool task runs a single
+    tesseract process over several pages. A failure on one page is logged and
+    leaves that page empty; the other pages are still returned.
+
+    Args:
+        file_path: Path to the PDF file.
+        page_numbers: Zero-based pages to OCR.
+        dpi: Rendering resolution.
+        executor: Pool to run pages on. Defaults to the shared OCR pool.
+        config: Tesseract options. Defaults to ocr_config_from_settings().
+
+    Returns:
+        list: Text for each requested page, in the order of page_numbers.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or get_ocr_executor()
+    config = config or ocr_config_from_settings()
+    chunks = _chunk_pages(page_numbers, settings.OCR_ENGINE)
+    futures = [
+        loop.run_in_executor(executor, _ocr_pages, file_path, chunk, dpi, config, settings.OCR_ENGINE)
+        for chunk in chunks
+    ]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+
+    texts = {}
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, BaseException):
+            for page_num in chunk:
+                logger.error(f"Error processing page {page_num}: {str(result)}")
+                texts[page_num] = ""
+            continue
+        for page_num, page_text, error in result:
+            if error:
+                logger.error(f"Error processing page {page_num}: {error}")
+            texts[page_num] = page_text
+
+    return [texts[page_num] for page_num in page_numbers]
+
+
+async def extract_text_via_ocr_parallel(
+    file_path: str,
+    page_count: int,
+    dpi: int = OCR_DPI,
+    executor: Optional[Executor] = None,
+    config: Optional[OCRConfig] = None,
+) -> str:
+    """
+    Extracts text using OCR with pages rendered and recognised concurrently in a process pool.
+
+    Page order is preserved, and a failed page is left empty without affecting the others.
+
+    Args:
+        file_path: Path to the PDF file.
+        page_count: Number of pages in the document.
+        dpi: Rendering resolution.
+        executor: Pool to run pages on. Defaults to the shared OCR pool.
+        config: Tesseract options. Defaults to ocr_config_from_settings().
+
+    Returns:
+        str: Extracted text or empty string if every page failed.
+    """
+    pages = await ocr_pages_parallel(file_path, list(range(page_count)), dpi, executor, config)
+    return "".join(page_text + "\n\n" for page_text in pages)
+
+
+# Page classification thresholds for hybrid extraction
+MIN_TEXT_CHARS = 20  # fewer non-whitespace characters than this means no usable text layer
+MIN_TEXT_DENSITY = 5.0  # characters per 100x100 pt of page area
+SCANNED_IMAGE_COVERAGE = 0.5  # fraction of the page covered by images
+MAX_UNMAPPED_GLYPH_RATIO = 0.1  # share of U+FFFD characters from fonts without a Unicode map
+MIN_PLAUSIBLE_TOKEN_RATIO = 0.5  # share of words that read as numbers or single-script words
+
+# Tokens a correctly decoded text layer is made of: numbers and amounts, Latin
+# words with a consistent case pattern, and runs of CJK or Hangul characters
+PLAUSIBLE_TOKEN_PATTERNS = (
+    re.compile(r"^[\d.,:/$%#@*+\-()]+$"),
+    re.compile(r"^[(\"'#]?(?:[A-Z][a-z]+|[a-z]+|[A-Z]+)(?:[-'&/.][A-Za-z]+)*[.,:;)\"'!?%]*$"),
+    re.compile(r"^[\u3040-\u30ff\u4e00-\u9fff\uac00-\ud7af]+$"),
+)
+
+
+def text_plausibility(text: str) -> float:
+    """
+    Score how much a text layer looks like correctly decoded text.
+
+    A font with a broken ToUnicode map can decode to valid but wrong
+    codepoints, giving tokens that mix scripts, case and digits
+    ("ReceIPI", "Sub[c1al", "鵬Ⅲ上川ｒ"). Fullwidth forms are folded with NFKC
+    before matching.
+
+    Args:
+        text: Text extracted from a page.
+
+    Returns:
+        float: Share of alphanumeric tokens matching PLAUSIBLE_TOKEN_PATTERNS, 1.0 if there are none.
+    """
+    tokens = [token for token in unicodedata.normalize("NFKC", text).split() if any(ch.isalnum() for ch in token)]
+    if not tokens:
+        return 1.0
+    plausible = sum(1 for token in tokens if any(pattern.match(token) for pattern in PLAUSIBLE_TOKEN_PATTERNS))
+    return plausible / len(tokens)
+
+
+def classify_page(page) -> str:
+    """
+    Decide whether a page should be read from its text layer or OCR'd.
+
+    Looks at the amount and density of extractable text, whether that text
+    decodes to plausible words, the fonts on the page, and how much of the
+    page is covered by images.
+
+    Args:
+        page: fitz page object.
+
+    Returns:
+        str: "text" for native extraction or "ocr" for OCR.
+    """
+    text = page.get_text()
+    chars = sum(1 for ch in text if not ch.isspace())
+
+    if chars < MIN_TEXT_CHARS or not page.get_fonts():
+        return "ocr"
+
+    # Fonts without a Unicode map extract as replacement characters
+    if text.count("\ufffd") / chars > MAX_UNMAPPED_GLYPH_RATIO:
+        return "ocr"
+
+    # Broken Unicode maps can also decode to wrong but valid characters
+    if text_plausibility(text) < MIN_PLAUSIBLE_TOKEN_RATIO:
+        return "ocr"
+
+    page_area = abs(page.rect) or 1.0
+    image_area = 0.0
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"]) & page.rect
+        image_area += abs(bbox)
+    image_coverage = min(image_area / page_area, 1.0)
+
+    density = chars / (page_area / 10000)
+    if image_coverage >= SCANNED_IMAGE_COVERAGE and density < MIN_TEXT_DENSITY:
+        # Mostly a scanned image with a small text stamp on top
+        return "ocr"
+
+    return "text"
+
+
+TABLE_DETECTION_MODES = ("auto", "always", "never")
+MIN_TABLE_RULINGS = 2  # horizontal and vertical ruling lines each needed to bound a table cell
+RULING_TOLERANCE = 2.0  # max thickness (pt) for a drawn rectangle to count as a line
+
+
+def count_table_rulings(page, needed: int = MIN_TABLE_RULINGS) -> Tuple[int, int]:
+    """
+    Count horizontal and vertical rulings among the page's vector drawings.
+
+    find_tables() locates tables from these lines, so a page without enough of
+    both kinds has nothing for it to find. Counting stops once both reach needed.
+
+    Args:
+        page: fitz page object.
+        needed: Count at which to stop early.
+
+    Returns:
+        tuple: (horizontal, vertical) ruling counts.
+    """
+    horizontal = vertical = 0
+    for drawing in page.get_cdrawings():
+        for item in drawing["items"]:
+            kind = item[0]
+            if kind == "l":
+                (x0, y0), (x1, y1) = item[1], item[2]
+                if abs(y1 - y0) <= RULING_TOLERANCE:
+                    horizontal += 1
+                elif abs(x1 - x0) <= RULING_TOLERANCE:
+                    vertical += 1
+            elif kind in ("re", "qu"):
+                if kind == "re":
+                    x0, y0, x1, y1 = item[1]
+                else:
+                    xs = [point[0] for point in item[1]]
+                    ys = [point[1] for point in item[1]]
+                    x0, y0, x1, y1 = min(xs), min(ys), max(xs), max(ys)
+                width, height = abs(x1 - x0), abs(y1 - y0)
+                if height <= RULING_TOLERANCE:
+                    horizontal += 1
+                elif width <= RULING_TOLERANCE:
+                    vertical += 1
+                else:
+                    horizontal += 2
+                    vertical += 2
+            if horizontal >= needed and vertical >= needed:
+                return horizontal, vertical
+    return horizontal, vertical
+
+
+def should_detect_tables(page, mode: Optional[str] = None) -> bool:
+    """
+    Decide whether find_tables() is worth running on a page.
+
+    Args:
+        page: fitz page object.
+        mode: "always", "never" or "auto". Defaults to settings.TABLE_DETECTION.
+
+    Returns:
+        bool: True if table detection should run.
+    """
+    mode = mode or settings.TABLE_DETECTION
+    if mode == "always":
+        return True
+    if mode == "never":
+        return False
+    horizontal, vertical = count_table_rulings(page)
+    return horizontal >= MIN_TABLE_RULINGS and vertical >= MIN_TABLE_RULINGS
+
+
+def _extract_page_text_conventional(page) -> str:
+    """Extract the text layer and, when the page looks like it has any, its tables."""
+    start = time.perf_counter()
+    text = page.get_text()
+    text_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    detect_tables = should_detect_tables(page)
+    check_ms = (time.perf_counter() - start) * 1000
+
+    tables_ms = 0.0
+    if detect_tables:
+        start = time.perf_counter()
+        tables = page.find_tables()
+        if tables and tables.tables:
+            text += "\n\n--- TABLES ---\n\n"
+            for table in tables.tables:
+                rows = table.extract()
+                for row in rows:
+                    text += " | ".join([str(cell) for cell in row]) + "\n"
+                text += "\n"
+        tables_ms = (time.perf_counter() - start) * 1000
+
+    logger.info(
+        f"Page {page.number}: text {text_ms:.1f} ms, table check {check_ms:.1f} ms, "
+        f"find_tables {f'{tables_ms:.1f} ms' if detect_tables else 'skipped'}"
+    )
+    return text
+
+
+async def extract_text_hybrid_with_file(doc) -> str:
+    """
+    Extracts text page by page, using the text layer where it exists and OCR elsewhere.
+
+    Each page is classified with classify_page. Text pages are read natively, the
+    rest are OCR'd concurrently on the process pool, and the results are merged
+    in page order.
+
+    Args:
+        doc: Opened fitz document object backed by a file on disk.
+
+    Returns:
+        str: Extracted text or empty string if extraction fails.
+    """
+    try:
+        pages: List[str] = [""] * len(doc)
+        ocr_page_numbers: List[int] = []
+
+        for page_num, page in enumerate(doc):
+            if classify_page(page) == "text":
+                try:
+                    pages[page_num] = _extract_page_text_conventional(page)
+                except Exception as e:
+                    logger.warning(f"Native extraction failed on page {page_num}, using OCR: {str(e)}")
+                    ocr_page_numbers.append(page_num)
+            else:
+                ocr_page_numbers.append(page_num)
+
+        logger.info(
+            f"Hybrid extraction: {len(doc) - len(ocr_page_numbers)} text pages, "
+            f"{len(ocr_page_numbers)} OCR pages"
+        )
+
+        if ocr_page_numbers:
+            ocr_texts = await ocr_pages_parallel(doc.name, ocr_page_numbers)
+            for page_num, page_text in zip(ocr_page_numbers, ocr_texts):
+                pages[page_num] = page_text + "\n\n"
+
+        return "".join(pages)
+    except Exception as e:
+        print(f"Hybrid text extraction failed: {str(e)}")
+        return ""
+
 
 
 
@@ -28,18 +743,8 @@ async def extract_text_conventional_with_file(doc) -> str:
     try:
         text = ""
         for page_num, page in enumerate(doc):
-            # Extract regular text
-            text += page.get_text()
-            
-            # Extract tables
-            tables = page.find_tables()
-            if tables and tables.tables:
-                text += "\n\n--- TABLES ---\n\n"
-                for table in tables.tables:
-                    rows = table.extract()
-                    for row in rows:
-                        text += " | ".join([str(cell) for cell in row]) + "\n"
-                    text += "\n"
+            # Extract regular text and tables
+            text += _extract_page_text_conventional(page)
         return text
     except Exception as e:
         print(f"Conventional text extraction failed: {str(e)}")
@@ -56,49 +761,17 @@ async def extract_text_via_ocr_with_file(doc) -> str:
     Returns:
         str: Extracted text or empty string if extraction fails.
     """
-    print("function start")
     try:
-        
-  
-        
-
-        extracted_text = ""
-        temp_files = []  # List to track temporary files
-        
+        config = ocr_config_from_settings()
+        images = []
         for page_num, page in enumerate(doc):
-            # Get page as image
-            pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-            
-            # Create a unique filename for the temporary file
-            temp_filename = tempfile.mktemp(suffix=".png")
-            
             try:
-                # Save image to file
-                pix.save(temp_filename)
-                temp_files.append(temp_filename)
-                
-                # Use pytesseract to extract text from the image
-                img = Image.open(temp_filename)
-                page_text = pytesseract.image_to_string(img)
-                extracted_text += page_text + "\n\n"
-                
-                # Close the image to release the file handle
-                img.close()
-                
+                # Render the page and hand the image straight to Tesseract
+                images.append(render_page_for_ocr(page, OCR_DPI, config))
             except Exception as e:
                 print(f"Error processing page {page_num}: {str(e)}")
-        
-        # Clean up temporary files after processing all pages
-        for temp_file in temp_files:
-            try:
-                # Wait briefly to ensure file handles are released
-                time.sleep(0.1)
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-            except Exception as e:
-                print(f"Failed to remove temporary file {temp_file}: {str(e)}")
-        
-        return extracted_text
+
+        return "".join(page_text + "\n\n" for page_text in ocr_images(images, config))
     except Exception as e:
         print(f"OCR text extraction failed: {str(e)}")
         return ""
@@ -122,18 +795,8 @@ async def extract_text_conventional(file_path: str) -> str:
         with fitz.open(file_path) as doc:
             text = ""
             for page_num, page in enumerate(doc):
-                # Extract regular text
-                text += page.get_text()
-                
-                # Extract tables
-                tables = page.find_tables()
-                if tables and tables.tables:
-                    text += "\n\n--- TABLES ---\n\n"
-                    for table in tables.tables:
-                        rows = table.extract()
-                        for row in rows:
-                            text += " | ".join([str(cell) for cell in row]) + "\n"
-                        text += "\n"
+                # Extract regular text and tables
+                text += _extract_page_text_conventional(page)
             return text
     except Exception as e:
         print(f"Conventional text extraction failed: {str(e)}")
@@ -155,44 +818,17 @@ async def extract_text_via_ocr(file_path: str) -> str:
         # Set the path to Tesseract executable
         pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
         
-        extracted_text = ""
-        temp_files = []  # List to track temporary files
-        
+        config = ocr_config_from_settings()
+        images = []
         with fitz.open(file_path) as doc:
             for page_num, page in enumerate(doc):
-                # Get page as image
-                pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-                
-                # Create a unique filename for the temporary file
-                temp_filename = tempfile.mktemp(suffix=".png")
-                
                 try:
-                    # Save image to file
-                    pix.save(temp_filename)
-                    temp_files.append(temp_filename)
-                    
-                    # Use pytesseract to extract text from the image
-                    img = Image.open(temp_filename)
-                    page_text = pytesseract.image_to_string(img)
-                    extracted_text += page_text + "\n\n"
-                    
-                    # Close the image to release the file handle
-                    img.close()
-                    
+                    # Render the page and hand the image straight to Tesseract
+                    images.append(render_page_for_ocr(page, OCR_DPI, config))
                 except Exception as e:
                     print(f"Error processing page {page_num}: {str(e)}")
-        
-        # Clean up temporary files after processing all pages
-        for temp_file in temp_files:
-            try:
-                # Wait briefly to ensure file handles are released
-                time.sleep(0.1)
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-            except Exception as e:
-                print(f"Failed to remove temporary file {temp_file}: {str(e)}")
-        
-        return extracted_text
+
+        return "".join(page_text + "\n\n" for page_text in ocr_images(images, config))
     except Exception as e:
         print(f"OCR text extraction failed: {str(e)}")
         return ""
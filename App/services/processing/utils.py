@@ -0,0 +1,548 @@
+import asyncio
+import base64
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+import fitz  # PyMuPDF
+from dateutil.parser import parse as parse_date
+from sqlalchemy import delete, or_
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.receipt_table import Receipt, ReceiptFile, ReceiptItem
+from models.schema import ReceiptExtractedData
+from services.llm.resilience import ProviderUnavailableError
+from services.llm.utils import EXTRACTION_VERSION, VISION_MODEL, extract_text_pdf_pages, extract_receipt_data, extract_receipt_data_batch
+from services.receipts.utils import payment_method_from_details, receipt_items_from_data
+from services.rules.utils import confident_data, extract_receipt_data_rules, fields_needing_llm
+from services.pdf.page_cache import page_cache, page_fingerprint
+from services.pdf.utils import (
+    IMAGE_MIME_TYPES,
+    extract_text_hybrid_with_file,
+    prepare_page_image,
+    vision_profile_from_settings,
+)
+from core.config import settings
+from core.logging import setup_logger
+
+
+logger = setup_logger(__name__)
+
+MAX_PAGES = 10
+
+# Text extractors recorded on each receipt
+EXTRACTOR_VISION = "vision"
+EXTRACTOR_HYBRID = "hybrid"
+
+
+def receipt_to_response(receipt: Receipt) -> dict:
+    """
+    Serialize a Receipt into the response returned by the process endpoint.
+
+    Args:
+        receipt (Receipt): The stored receipt.
+
+    Returns:
+        dict: Receipt fields with ISO-formatted timestamps.
+    """
+    return {
+        "receipt_id": str(receipt.id),
+        "receipt_file_id": str(receipt.receipt_file_id) if receipt.receipt_file_id else None,
+        "merchant_name": receipt.merchant_name,
+        "total_amount": receipt.total_amount,
+        "purchased_at": receipt.purchased_at.isoformat() if receipt.purchased_at else None,
+        "store_address": receipt.store_address,
+        "phone_number": receipt.phone_number,
+        "store_number": receipt.store_number,
+        "cashier_number": receipt.cashier_number,
+        "barcode_num": receipt.barcode_num,
+        "items": receipt.items,
+        "payment_details": receipt.payment_details,
+        "additional_info": receipt.additional_info,
+        "extractor": receipt.extractor,
+        "extraction_version": receipt.extraction_version,
+        "created_at": receipt.created_at.isoformat(),
+        "updated_at": receipt.updated_at.isoformat()
+    }
+
+
+async def extract_receipt_text(file_path: str, is_premium_user: bool) -> Tuple[str, str]:
+    """
+    Extract raw text from a receipt PDF.
+
+    Page renders and per-page OCR or vision text are reused from the page cache,
+    so a retry after a later failure does not repeat that work.
+
+    Args:
+        file_path: Path to the PDF file.
+        is_premium_user: Use the AI vision model instead of conventional/OCR extraction.
+
+    Returns:
+        tuple: (extracted text, extractor name: EXTRACTOR_VISION or EXTRACTOR_HYBRID).
+
+    Raises:
+        RuntimeError: If the PDF has too many pages, a page fails in the vision model
+            (pages that succeeded stay cached for the retry), or no text could be extracted.
+    """
+    # Open PDF document once and share it
+    doc = fitz.open(file_path)
+
+    try:
+        if len(doc) > MAX_PAGES:
+            raise RuntimeError("PDF has too many pages")
+
+        text = ""
+        extractor = EXTRACTOR_HYBRID
+        if is_premium_user:
+            # Premium version: Use AI-based text extraction
+            profile = vision_profile_from_settings()
+            page_texts: List[Optional[str]] = [None] * len(doc)
+            text_keys: List[Optional[str]] = [None] * len(doc)
+            pending_pages = []
+            images_base64 = []
+            mime_type = IMAGE_MIME_TYPES.get(profile.image_format.upper(), "image/png")
+            for page_num in range(len(doc)):
+                page = doc.load_page(page_num)
+                image_bytes = None
+                if page_cache is not None:
+                    # Reuse vision text and page images from an earlier attempt on the same pages
+                    image_key = page_cache.make_key(page_fingerprint(page), "vision-image", **profile.model_dump())
+                    text_keys[page_num] = page_cache.make_key(image_key, "vision-text", model=VISION_MODEL)
+                    page_texts[page_num] = page_cache.get_text(text_keys[page_num])
+                    if page_texts[page_num] is not None:
+                        continue
+                    image_bytes = page_cache.get_bytes(image_key, ".img")
+                if image_bytes is None:
+                    image_bytes, mime_type = prepare_page_image(page, profile)
+                    if page_cache is not None:
+                        page_cache.set_bytes(image_key, ".img", image_bytes)
+
+                # Convert image to base64
+                images_base64.append(base64.b64encode(image_bytes).decode('utf-8'))
+                pending_pages.append(page_num)
+
+            def store_page_text(index: int, page_text: str) -> None:
+                # Cache each page as soon as it arrives, so a retry only repeats the pages that failed
+                page_num = pending_pages[index]
+                page_texts[page_num] = page_text
+                if text_keys[page_num] is not None:
+                    page_cache.set_text(text_keys[page_num], page_text)
+
+            # Extract text using Together AI vision model, all pages concurrently
+            try:
+                if pending_pages:
+                    outcomes = await extract_text_pdf_pages(images_base64, mime_type, on_page=store_page_text)
+                    errors = [(page_num, error) for page_num, (_, error) in zip(pending_pages, outcomes) if error]
+                    if errors:
+                        logger.warning(
+                            f"Vision extraction failed for {len(errors)} of {len(doc)} pages: "
+                            + "; ".join(f"page {page_num}: {str(error)}" for page_num, error in errors)
+                        )
+                        unavailable = next((e for _, e in errors if isinstance(e, ProviderUnavailableError)), None)
+                        if unavailable is not None:
+                            raise unavailable
+                        raise RuntimeError(f"Failed to extract text from page {errors[0][0]}: {str(errors[0][1])}")
+                text = "".join(page_text + "\n\n" for page_text in page_texts)
+                extractor = EXTRACTOR_VISION
+            except ProviderUnavailableError as e:
+                if not settings.LLM_FALLBACK_ENABLED:
+                    raise
+                # Provider is degraded: use the free extraction path instead of failing
+                logger.warning(f"Vision model unavailable, falling back to OCR: {str(e)}")
+                text = await extract_text_hybrid_with_file(doc)
+        else:
+            # Free version: Read the text layer where it exists and OCR the other pages
+            # Pass the opened document to avoid reopening
+            text = await extract_text_hybrid_with_file(doc)
+    finally:
+        # Always close the document
+        doc.close()
+
+    if not text.strip():
+        raise RuntimeError("No text extracted from PDF")
+
+    return text, extractor
+
+
+async def extract_structured_data(text: str) -> ReceiptExtractedData:
+    """
+    Extract structured receipt data, using local rules first and the LLM only where needed.
+
+    Fields the rule-based extractor fills with at least RULES_CONFIDENCE_THRESHOLD
+    confidence are kept as-is. The LLM is asked only for the remaining fields,
+    whose rule values are discarded when the LLM does not confirm them, and
+    is skipped entirely when the core fields are all confident; optional fields
+    below the threshold are then dropped rather than stored. While the LLM
+    provider is unavailable the rule-based result is returned on its own.
+
+    Args:
+        text: Receipt text.
+
+    Returns:
+        ReceiptExtractedData: Merged structured data.
+
+    Raises:
+        RuntimeError: If the LLM call fails.
+    """
+    rules = extract_receipt_data_rules(text) if settings.RULES_ENABLED else None
+    fields = fields_needing_llm(rules, settings.RULES_CONFIDENCE_THRESHOLD) if rules is not None else None
+    if rules is not None and not fields:
+        logger.info("Rule-based extraction is confident for all core fields, skipping LLM")
+        return confident_data(rules, settings.RULES_CONFIDENCE_THRESHOLD)
+
+    if fields:
+        logger.info(f"Requesting {len(fields)} low-confidence fields from LLM: {', '.join(fields)}")
+    try:
+        llm_data = await extract_receipt_data(text, fields)
+    except ProviderUnavailableError as e:
+        if not settings.LLM_FALLBACK_ENABLED:
+            raise
+        # Provider is degraded: keep whatever the rules found rather than failing
+        logger.warning(f"LLM unavailable, using rule-based extraction only: {str(e)}")
+        return (rules or extract_receipt_data_rules(text)).data
+
+    if rules is None:
+        return llm_data
+
+    # Fields sent to the LLM were below the threshold: its answer replaces the
+    # rule value, and when it has none the unconfirmed rule value is dropped
+    data = rules.data
+    for field in fields:
+        setattr(data, field, getattr(llm_data, field))
+    return data
+
+
+async def extract_structured_data_batch(
+    texts: Dict[str, str],
+    concurrency: int = 4,
+) -> Dict[str, ReceiptExtractedData]:
+    """
+    Batch version of extract_structured_data.
+
+    Receipts the rules handle confidently skip the LLM; the rest are sent through
+    batched LLM extraction, asking only for their low-confidence fields, and
+    merged with the rule results field by field.
+
+    Args:
+        texts: Receipt texts keyed by id.
+        concurrency: Maximum LLM requests in flight.
+
+    Returns:
+        dict: Structured data keyed by id. Receipts whose extraction failed are omitted.
+    """
+    if not settings.RULES_ENABLED:
+        return await extract_receipt_data_batch(texts, concurrency=concurrency)
+
+    results: Dict[str, ReceiptExtractedData] = {}
+    needs_llm: Dict[str, List[str]] = {}
+    for key, text in texts.items():
+        rules = extract_receipt_data_rules(text)
+        fields = fields_needing_llm(rules, settings.RULES_CONFIDENCE_THRESHOLD)
+        if fields:
+            results[key] = rules.data
+            needs_llm[key] = fields
+        else:
+            results[key] = confident_data(rules, settings.RULES_CONFIDENCE_THRESHOLD)
+
+    logger.info(f"Rules handled {len(texts) - len(needs_llm)} of {len(texts)} receipts without LLM")
+    llm_results = await extract_receipt_data_batch(
+        {key: texts[key] for key in needs_llm}, needs_llm, concurrency
+    )
+
+    for key, fields in needs_llm.items():
+        if key not in llm_results:
+            del results[key]
+            continue
+        for field in fields:
+            setattr(results[key], field, getattr(llm_results[key], field))
+    return results
+
+
+def parse_purchased_at(extracted_data: ReceiptExtractedData):
+    """
+    Parse the extracted purchase date with dateutil.
+
+    Args:
+        extracted_data: Structured data returned by the extractor.
+
+    Returns:
+        datetime | None: Purchase time without microseconds, or None if missing or unparseable.
+    """
+    if not extracted_data.purchased_at:
+        return None
+    try:
+        # Parse the date string with dateutil.parser for flexibility
+        parsed_date = parse_date(extracted_data.purchased_at, fuzzy=True)
+        # Ensure the format is standardized to YYYY-MM-DD HH:MM:SS
+        return parsed_date.replace(microsecond=0)
+    except (ValueError, OverflowError) as e:
+        logger.warning(f"Date parsing error: {str(e)}")
+        extracted_data.purchased_at = None  # Set to None if parsing fails
+        return None
+
+
+def apply_extracted_data(receipt: Receipt, extracted_data: ReceiptExtractedData) -> None:
+    """
+    Copy structured data onto a receipt and stamp the current extraction version.
+
+    Args:
+        receipt: Receipt to update.
+        extracted_data: Structured data extracted from the receipt.
+    """
+    receipt.merchant_name = extracted_data.merchant_name
+    receipt.total_amount = extracted_data.total_amount
+    receipt.purchased_at = parse_purchased_at(extracted_data)
+    receipt.store_address = extracted_data.store_address
+    receipt.phone_number = extracted_data.phone_number
+    receipt.store_number = extracted_data.store_number
+    receipt.cashier_number = extracted_data.cashier_number
+    receipt.barcode_num = extracted_data.barcode_num
+    receipt.items = extracted_data.items or []
+    receipt.payment_details = extracted_data.payment_details or {}
+    receipt.payment_method = payment_method_from_details(extracted_data.payment_details)
+    receipt.additional_info = extracted_data.additional_info or {}
+    receipt.extraction_version = EXTRACTION_VERSION
+    receipt.updated_at = datetime.now()
+
+
+def replace_receipt_items(session: Session, receipt: Receipt) -> None:
+    """
+    Rewrite a receipt's receipt_item rows from its items JSON.
+
+    The delete flushes the receipt first, so a new receipt exists before its
+    items are inserted. Nothing is committed.
+
+    Args:
+        session: Database session (sync; use AsyncSession.run_sync from async code).
+        receipt: Receipt whose items were just set by apply_extracted_data.
+    """
+    session.exec(delete(ReceiptItem).where(ReceiptItem.receipt_id == receipt.id))
+    session.add_all(
+        ReceiptItem(receipt_id=receipt.id, **row)
+        for row in receipt_items_from_data(receipt.items)
+    )
+
+
+def store_extracted_receipt(
+    session: Session,
+    receipt_file: ReceiptFile,
+    extracted_data: ReceiptExtractedData,
+    raw_text: Optional[str] = None,
+    extractor: Optional[str] = None,
+) -> Receipt:
+    """
+    Create or update the Receipt for a file and mark the file as processed.
+
+    Args:
+        session: Database session.
+        receipt_file: The processed ReceiptFile.
+        extracted_data: Structured data extracted from the receipt.
+        raw_text: Text the structured data was extracted from, kept for re-extraction.
+        extractor: Text extractor that produced raw_text.
+
+    Returns:
+        Receipt: The stored receipt.
+    """
+    # Check for existing receipt to avoid duplicates
+    query = select(Receipt).where(Receipt.receipt_file_id == receipt_file.id)
+    receipt = session.exec(query).first()
+
+    if receipt is None:
+        # Create new Receipt record
+        receipt = Receipt(
+            receipt_file_id=receipt_file.id,
+            file_path=receipt_file.file_path,
+            created_at=datetime.now(),
+        )
+
+    apply_extracted_data(receipt, extracted_data)
+    receipt.file_path = receipt_file.file_path
+    receipt.raw_text = raw_text
+    receipt.extractor = extractor
+    session.add(receipt)
+    replace_receipt_items(session, receipt)
+
+    # Update ReceiptFile
+    receipt_file.is_processed = True
+    receipt_file.is_valid = True
+    receipt_file.invalid_reason = None
+    receipt_file.updated_at = datetime.now()
+    session.add(receipt_file)
+
+    session.commit()
+    session.refresh(receipt)
+    return receipt
+
+
+async def process_receipt_file(
+    session: Session,
+    receipt_file: ReceiptFile,
+    is_premium_user: bool,
+) -> Receipt:
+    """
+    Run the full extraction pipeline for a receipt file and store the result.
+
+    Args:
+        session: Database session.
+        receipt_file: The ReceiptFile to process.
+        is_premium_user: Use the AI vision model for text extraction.
+
+    Returns:
+        Receipt: The stored receipt.
+
+    Raises:
+        RuntimeError: If extraction fails. The file is marked invalid with the reason.
+    """
+    try:
+        text, extractor = await extract_receipt_text(receipt_file.file_path, is_premium_user)
+
+        # Extract structured data with local rules, falling back to AI for uncertain fields
+        extracted_data = await extract_structured_data(text)
+    except RuntimeError as e:
+        receipt_file.is_valid = False
+        receipt_file.invalid_reason = str(e)
+        receipt_file.updated_at = datetime.now()
+        session.add(receipt_file)
+        session.commit()
+        raise
+
+    return store_extracted_receipt(session, receipt_file, extracted_data, text, extractor)
+
+
+async def process_receipt_files_batch(
+    session: Session,
+    receipt_files: List[ReceiptFile],
+    is_premium_user: bool,
+    concurrency: int = 4,
+) -> Dict[str, str]:
+    """
+    Process many receipt files, sharing LLM calls across receipts.
+
+    Text is extracted for up to `concurrency` files at a time, then structured
+    data for all of them goes through batched extraction with the same bound
+    on LLM requests in flight.
+
+    Args:
+        session: Database session.
+        receipt_files: Files to process.
+        is_premium_user: Use the AI vision model for text extraction.
+        concurrency: Maximum files whose text is extracted at once, and LLM requests in flight.
+
+    Returns:
+        dict: Per file ID, the receipt ID on success or an error message.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    # One entry per file, in input order; a repeated file is processed once
+    files_by_id: Dict[str, ReceiptFile] = {}
+    for receipt_file in receipt_files:
+        files_by_id.setdefault(str(receipt_file.id), receipt_file)
+    unique_files = list(files_by_id.items())
+
+    async def extract_text(receipt_file: ReceiptFile) -> Tuple[str, str]:
+        async with semaphore:
+            return await extract_receipt_text(receipt_file.file_path, is_premium_user)
+
+    outcomes: Dict[str, str] = {}
+    texts: Dict[str, str] = {}
+    extractors: Dict[str, str] = {}
+    extracted_texts = await asyncio.gather(
+        *(extract_text(receipt_file) for _, receipt_file in unique_files),
+        return_exceptions=True,
+    )
+    for (file_id, _), result in zip(unique_files, extracted_texts):
+        if isinstance(result, BaseException):
+            outcomes[file_id] = f"error: {str(result)}"
+        else:
+            texts[file_id], extractors[file_id] = result
+
+    extracted = await extract_structured_data_batch(texts, concurrency)
+
+    for file_id in texts:
+        receipt_file = files_by_id[file_id]
+        if file_id not in extracted:
+            outcomes[file_id] = "error: Failed to parse receipt data"
+            continue
+        receipt = store_extracted_receipt(
+            session, receipt_file, extracted[file_id], texts[file_id], extractors[file_id]
+        )
+        outcomes[file_id] = str(receipt.id)
+
+    for file_id, outcome in outcomes.items():
+        if outcome.startswith("error: "):
+            receipt_file = files_by_id[file_id]
+            receipt_file.is_valid = False
+            receipt_file.invalid_reason = outcome[len("error: "):]
+            receipt_file.updated_at = datetime.now()
+            session.add(receipt_file)
+    session.commit()
+
+    return outcomes
+
+
+def outdated_receipts_query(receipt_ids: Optional[List[uuid.UUID]] = None, force: bool = False):
+    """
+    Select active receipts with stored text that can be re-extracted.
+
+    Args:
+        receipt_ids: Restrict to these receipts.
+        force: Include receipts already at the current extraction version.
+
+    Returns:
+        Select: Query over Receipt, oldest first.
+    """
+    query = select(Receipt).where(Receipt.is_active == True, Receipt.raw_text.is_not(None))
+    if receipt_ids:
+        query = query.where(Receipt.id.in_(receipt_ids))
+    if not force:
+        query = query.where(or_(
+            Receipt.extraction_version.is_(None),
+            Receipt.extraction_version != EXTRACTION_VERSION,
+        ))
+    return query.order_by(Receipt.created_at)
+
+
+async def reextract_receipts(
+    session: Union[Session, AsyncSession],
+    receipts: List[Receipt],
+    concurrency: int = 4,
+) -> Dict[str, str]:
+    """
+    Re-run structured extraction on the stored text of receipts, without OCR or vision.
+
+    Up to `concurrency` extractions run at once. Each receipt is updated,
+    stamped with the current EXTRACTION_VERSION and added to the session as soon
+    as its extraction succeeds, with its receipt_item rows rewritten; the caller
+    commits.
+
+    Args:
+        session: Database session (sync or async).
+        receipts: Receipts with raw_text.
+        concurrency: Maximum extractions in flight.
+
+    Returns:
+        dict: Per receipt ID, "ok" or an error message.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def reextract(receipt: Receipt):
+        async with semaphore:
+            try:
+                return receipt, await extract_structured_data(receipt.raw_text)
+            except RuntimeError as e:
+                return receipt, e
+
+    outcomes: Dict[str, str] = {}
+    for next_result in asyncio.as_completed([reextract(receipt) for receipt in receipts]):
+        receipt, result = await next_result
+        if isinstance(result, RuntimeError):
+            outcomes[str(receipt.id)] = f"error: {str(result)}"
+            continue
+        apply_extracted_data(receipt, result)
+        session.add(receipt)
+        if isinstance(session, AsyncSession):
+            await session.run_sync(replace_receipt_items, receipt)
+        else:
+            replace_receipt_items(session, receipt)
+        outcomes[str(receipt.id)] = "ok"
+    return outcomes
@@ -0,0 +1,511 @@
+import base64
+import binascii
+import json
+import re
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, text, tuple_
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from models.receipt_table import Receipt, ReceiptItem
+from models.schema import ItemFilters, ReceiptFilters
+
+
+SORT_COLUMNS = {
+    "purchased_at": Receipt.purchased_at,
+    "created_at": Receipt.created_at,
+}
+
+# Item summary groupings and the aggregate each can be ranked by
+ITEM_GROUP_COLUMNS = {
+    "name": func.lower(ReceiptItem.name),
+    "sku": ReceiptItem.sku,
+}
+ITEM_SUMMARY_ORDERS = ("spend", "quantity", "receipts")
+
+
+# Keys under which extraction results report the payment method
+PAYMENT_METHOD_KEYS = ("method", "payment_method", "type", "card_type")
+
+# Keys under which extracted items report each receipt_item column. "price" is
+# the amount charged for the line, which is what the rules extractor reports.
+ITEM_NAME_KEYS = ("name", "description", "item")
+ITEM_SKU_KEYS = ("sku", "upc", "item_code", "code", "item_number")
+ITEM_QUANTITY_KEYS = ("quantity", "qty", "count")
+ITEM_UNIT_PRICE_KEYS = ("unit_price", "price_each", "unit_cost")
+ITEM_LINE_TOTAL_KEYS = ("line_total", "total", "amount", "price")
+
+AMOUNT_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+FTS_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded or does not match the request."""
+
+
+def encode_cursor(sort_by: str, order: str, key: Optional[datetime], receipt_id: uuid.UUID, direction: str) -> str:
+    """
+    Build an opaque cursor pointing just past a receipt.
+
+    Args:
+        sort_by: Sort column name, a key of SORT_COLUMNS.
+        order: "desc" or "asc".
+        key: The receipt's value in the sort column (purchased_at may be None).
+        receipt_id: The receipt's ID, which breaks ties between equal keys.
+        direction: "next" to continue after the receipt, "prev" to go back before it.
+
+    Returns:
+        str: URL-safe base64 cursor.
+    """
+    payload = {
+        "s": sort_by,
+        "o": order,
+        "k": key.isoformat() if key else None,
+        "i": str(receipt_id),
+        "d": direction,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, order: str) -> Tuple[Optional[datetime], uuid.UUID, str]:
+    """
+    Decode a cursor produced by encode_cursor for the same sort.
+
+    Returns:
+        tuple: (sort key, receipt ID, direction).
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed or was issued for another sort.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        key = datetime.fromisoformat(payload["k"]) if payload["k"] is not None else None
+        receipt_id = uuid.UUID(payload["i"])
+        direction = payload["d"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Malformed cursor: {str(e)}")
+    if payload.get("s") != sort_by or payload.get("o") != order:
+        raise InvalidCursorError("Cursor was issued for a different sort order")
+    if direction not in ("next", "prev"):
+        raise InvalidCursorError("Malformed cursor direction")
+    return key, receipt_id, direction
+
+
+def payment_method_from_details(payment_details: Optional[Dict]) -> Optional[str]:
+    """Upper-cased payment method from extracted payment details, if one is reported."""
+    if not isinstance(payment_details, dict):
+        return None
+    for key in PAYMENT_METHOD_KEYS:
+        value = payment_details.get(key)
+        if isinstance(value, str) and value.strip():
+            return value.strip().upper()[:50]
+    return None
+
+
+def _first_value(item: Dict, keys: Tuple[str, ...]) -> Any:
+    for key in keys:
+        value = item.get(key)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+def _to_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = AMOUNT_RE.search(value.replace(",", ""))
+        if match:
+            return float(match.group())
+    return None
+
+
+def _to_text(value: Any, max_length: int) -> Optional[str]:
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    text_value = str(value).strip()
+    return text_value[:max_length] or None
+
+
+def receipt_items_from_data(items: Optional[List[Dict]]) -> List[Dict[str, Any]]:
+    """
+    Normalize extracted line items into receipt_item column values.
+
+    Extraction results name item fields inconsistently, so each column is read
+    from the first key of its ITEM_*_KEYS that is set. A missing line total is
+    quantity * unit price and a missing unit price is line total / quantity.
+    Entries that are not objects, or carry neither a name nor an amount, are skipped.
+
+    Args:
+        items: The items list of ReceiptExtractedData.
+
+    Returns:
+        list: Dicts with position, name, sku, quantity, unit_price and line_total.
+    """
+    rows = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        name = _to_text(_first_value(item, ITEM_NAME_KEYS), 255)
+        quantity = _to_number(_first_value(item, ITEM_QUANTITY_KEYS))
+        unit_price = _to_number(_first_value(item, ITEM_UNIT_PRICE_KEYS))
+        line_total = _to_number(_first_value(item, ITEM_LINE_TOTAL_KEYS))
+        if line_total is None and unit_price is not None:
+            line_total = round(unit_price * (quantity if quantity is not None else 1), 2)
+        if unit_price is None and line_total is not None and quantity:
+            unit_price = round(line_total / quantity, 2)
+        if name is None and line_total is None:
+            continue
+        rows.append({
+            "position": len(rows),
+            "name": name,
+            "sku": _to_text(_first_value(item, ITEM_SKU_KEYS), 100),
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "line_total": line_total,
+        })
+    return rows
+
+
+def _ascii_lower(value: str) -> str:
+    # SQLite's lower() only folds ASCII letters
+    return "".join(ch.lower() if ch.isascii() else ch for ch in value)
+
+
+def fts_match_query(text: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression: every word, as a prefix, must appear.
+
+    Words are quoted, so FTS5 operators and punctuation in user input are matched
+    literally instead of raising syntax errors. Returns None if there are no words.
+    """
+    tokens = FTS_TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _name_conditions(column, value: str, match: str) -> list:
+    """Case-insensitive exact or prefix match on lower(column), as an index range for prefixes."""
+    value = _ascii_lower(value.strip())
+    lowered = func.lower(column)
+    if match == "exact":
+        return [lowered == value]
+    return [lowered >= value, lowered < value + "\U0010ffff"]
+
+
+async def receipt_list_query(session: AsyncSession, filters: ReceiptFilters):
+    """
+    Build the query for active receipts matching the list filters.
+
+    Merchant filters compare lower(merchant_name), served by an expression
+    index; a prefix becomes a range so the index is used. Full-text search runs
+    against receipt_fts (see db/fts.py) first: when it matches at most
+    SEARCH_DIRECT_MATCH_LIMIT receipts, those rows are read by search_rowid and sorted,
+    which is far cheaper than walking the listing index until enough matches
+    turn up. Broader searches keep the listing index and filter by the match set.
+
+    Args:
+        session: Async database session, used for the full-text probe.
+        filters: Requested filters; unset fields are ignored.
+
+    Returns:
+        Select: Query over Receipt, without ordering or limit.
+    """
+    conditions = []
+    active = Receipt.is_active == True
+    if filters.merchant:
+        conditions += _name_conditions(Receipt.merchant_name, filters.merchant, filters.merchant_match)
+    if filters.purchased_from is not None:
+        conditions.append(Receipt.purchased_at >= filters.purchased_from)
+    if filters.purchased_to is not None:
+        conditions.append(Receipt.purchased_at <= filters.purchased_to)
+    if filters.min_total is not None:
+        conditions.append(Receipt.total_amount >= filters.min_total)
+    if filters.max_total is not None:
+        conditions.append(Receipt.total_amount <= filters.max_total)
+    if filters.payment_method:
+        conditions.append(Receipt.payment_method == filters.payment_method.strip().upper())
+
+    match = fts_match_query(filters.q) if filters.q else None
+    if match is not None:
+        limit = settings.SEARCH_DIRECT_MATCH_LIMIT
+        rowids = (await session.exec(
+            text("SELECT rowid FROM receipt_fts WHERE receipt_fts MATCH :match LIMIT :limit")
+            .bindparams(match=match, limit=limit + 1)
+        )).all()
+        if len(rowids) <= limit:
+            conditions.append(Receipt.search_rowid.in_([row[0] for row in rowids]))
+            # Unary + stops SQLite from walking the (is_active, ...) listing index
+            active = text("+receipt.is_active = 1")
+        else:
+            conditions.append(
+                text("receipt.search_rowid IN (SELECT rowid FROM receipt_fts WHERE receipt_fts MATCH :fts_query)")
+                .bindparams(fts_query=match)
+            )
+    return select(Receipt).where(active, *conditions)
+
+
+def _item_conditions(filters: ItemFilters) -> Tuple[list, list]:
+    """Conditions of the item filters, split into ones on receipt_item and ones on receipt."""
+    item_conditions, receipt_conditions = [], []
+    if filters.name:
+        item_conditions += _name_conditions(ReceiptItem.name, filters.name, filters.name_match)
+    if filters.sku:
+        item_conditions.append(ReceiptItem.sku == filters.sku.strip())
+    if filters.merchant:
+        receipt_conditions += _name_conditions(Receipt.merchant_name, filters.merchant, "prefix")
+    if filters.purchased_from is not None:
+        receipt_conditions.append(Receipt.purchased_at >= filters.purchased_from)
+    if filters.purchased_to is not None:
+        receipt_conditions.append(Receipt.purchased_at <= filters.purchased_to)
+    return item_conditions, receipt_conditions
+
+
+def _filter_items(query, filters: ItemFilters):
+    """
+    Apply item filters to a query over receipt_item, keeping items of active receipts.
+
+    Receipts are only joined when a merchant or date filter needs them.
+    Otherwise inactive receipts, normally few, are excluded by ID, so the query
+    can be answered from a covering receipt_item index without looking up the
+    receipt of every item.
+    """
+    item_conditions, receipt_conditions = _item_conditions(filters)
+    if receipt_conditions:
+        query = query.join(Receipt, Receipt.id == ReceiptItem.receipt_id).where(
+            Receipt.is_active == True, *receipt_conditions
+        )
+    else:
+        query = query.where(ReceiptItem.receipt_id.not_in(select(Receipt.id).where(Receipt.is_active == False)))
+    return query.where(*item_conditions)
+
+
+def item_list_query(filters: ItemFilters):
+    """
+    Build the query for line items of active receipts matching the filters.
+
+    Name filters compare lower(name), served by an expression index, so looking
+    up an item reads only its rows instead of every receipt's items JSON.
+
+    Args:
+        filters: Requested filters; unset fields are ignored.
+
+    Returns:
+        Select: Rows of (ReceiptItem, merchant_name, purchased_at), without ordering or limit.
+    """
+    item_conditions, receipt_conditions = _item_conditions(filters)
+    active = Receipt.is_active == True
+    if item_conditions:
+        # Unary + keeps SQLite on the name or SKU index instead of walking every receipt
+        active = text("+receipt.is_active = 1")
+    return (
+        select(ReceiptItem, Receipt.merchant_name, Receipt.purchased_at)
+        .join(Receipt, Receipt.id == ReceiptItem.receipt_id)
+        .where(active, *item_conditions, *receipt_conditions)
+    )
+
+
+def item_count_query(filters: ItemFilters):
+    """Count the line items item_list_query(filters) returns."""
+    return _filter_items(select(func.count()).select_from(ReceiptItem), filters)
+
+
+def item_summary_query(filters: ItemFilters, group_by: str, order_by: str, limit: int):
+    """
+    Build an aggregate over matching line items, grouped by name or SKU.
+
+    Names are grouped case-insensitively. Items with no quantity count as one
+    unit. Items without a value for the grouping column are left out.
+
+    Args:
+        filters: Requested filters; unset fields are ignored.
+        group_by: A key of ITEM_GROUP_COLUMNS.
+        order_by: One of ITEM_SUMMARY_ORDERS, ranked highest first.
+        limit: Maximum groups returned.
+
+    Returns:
+        Select: Rows of (key, lines, receipts, quantity, spend).
+    """
+    group_column = ITEM_GROUP_COLUMNS[group_by]
+    key = func.max(ReceiptItem.name) if group_by == "name" else ReceiptItem.sku
+    aggregates = {
+        "receipts": func.count(func.distinct(ReceiptItem.receipt_id)),
+        "quantity": func.sum(func.coalesce(ReceiptItem.quantity, 1)),
+        "spend": func.coalesce(func.sum(ReceiptItem.line_total), 0),
+    }
+    query = select(
+        key.label("key"),
+        func.count().label("lines"),
+        *(aggregate.label(name) for name, aggregate in aggregates.items()),
+    ).select_from(ReceiptItem)
+    return (
+        _filter_items(query, filters)
+        .where(group_column.is_not(None))
+        .group_by(group_column)
+        .order_by(aggregates[order_by].desc(), group_column)
+        .limit(limit)
+    )
+
+
+def _segments(column, cursor_key: Optional[datetime], cursor_id: Optional[uuid.UUID], descending: bool, has_cursor: bool):
+    """
+    Conditions and orderings for the runs of rows to read after a cursor, in walk order.
+
+    Follows SQLite's NULL ordering, where NULL sorts lowest: NULL keys come last
+    when descending and first when ascending. Non-NULL keys and NULL keys are
+    read as separate runs so each one is an index range (a row-value comparison
+    on (column, id), or column IS NULL with an id range) instead of a scan.
+    """
+    if descending:
+        non_null_order = (column.desc(), Receipt.id.desc())
+        null_order = (Receipt.id.desc(),)
+    else:
+        non_null_order = (column.asc(), Receipt.id.asc())
+        null_order = (Receipt.id.asc(),)
+
+    non_null = (column.is_not(None), non_null_order)
+    nulls = (column.is_(None), null_order)
+    if has_cursor and cursor_key is not None:
+        key_range = tuple_(column, Receipt.id) < tuple_(cursor_key, cursor_id) if descending \
+            else tuple_(column, Receipt.id) > tuple_(cursor_key, cursor_id)
+        non_null = (key_range, non_null_order)
+    elif has_cursor:
+        id_range = Receipt.id < cursor_id if descending else Receipt.id > cursor_id
+        nulls = (and_(column.is_(None), id_range), null_order)
+
+    if not column.nullable:
+        return [non_null]
+    if descending:
+        runs = [non_null, nulls]
+        # A cursor on a NULL key is already past every non-NULL row
+        return runs[1:] if has_cursor and cursor_key is None else runs
+    runs = [nulls, non_null]
+    return runs[1:] if has_cursor and cursor_key is not None else runs
+
+
+async def fetch_keyset_rows(
+    session: AsyncSession,
+    base_query,
+    sort_by: str,
+    order: str,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Receipt], str]:
+    """
+    Read up to limit + 1 receipts from the cursor position in the requested order.
+
+    One extra row is fetched to tell whether another page exists in the
+    direction of travel. Pages reached through a "prev" cursor are read in
+    reverse order; keyset_page flips them back.
+
+    Args:
+        session: Async database session.
+        base_query: Select over Receipt with the listing's filters applied.
+        sort_by: Sort column name, a key of SORT_COLUMNS.
+        order: "desc" or "asc".
+        limit: Page size.
+        cursor: Cursor from a previous page, or None for the first page.
+
+    Returns:
+        tuple: (rows in walk order, direction "next" or "prev").
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed or was issued for another sort.
+    """
+    column = SORT_COLUMNS[sort_by]
+    key, receipt_id, direction = None, None, "next"
+    if cursor:
+        key, receipt_id, direction = decode_cursor(cursor, sort_by, order)
+
+    # Going back means walking the opposite order from the cursor
+    walk_descending = (order == "desc") == (direction == "next")
+    rows: List[Receipt] = []
+    for condition, ordering in _segments(column, key, receipt_id, walk_descending, cursor is not None):
+        remaining = limit + 1 - len(rows)
+        if remaining <= 0:
+            break
+        rows += (await session.exec(
+            base_query.where(condition).order_by(*ordering).limit(remaining)
+        )).all()
+    return rows, direction
+
+
+def keyset_page(
+    rows: List[Receipt],
+    sort_by: str,
+    order: str,
+    limit: int,
+    direction: str,
+    has_cursor: bool,
+) -> Dict[str, Any]:
+    """
+    Trim the extra row from a keyset query and build the next and previous cursors.
+
+    Returns:
+        dict: results, next_cursor and prev_cursor (None at either end).
+    """
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    if direction == "prev":
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, has_cursor
+
+    column_name = SORT_COLUMNS[sort_by].key
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort_by, order, getattr(last, column_name), last.id, "next")
+    if rows and has_prev:
+        first = rows[0]
+        prev_cursor = encode_cursor(sort_by, order, getattr(first, column_name), first.id, "prev")
+    return {"results": rows, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+
+class CountCache:
+    """
+    Short-lived cache of list totals, keyed by a description of the query's filters.
+
+    Counting every row on each page request grows linearly with the table, while
+    clients only need an approximate total; entries are reused for ttl_seconds.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+
+    async def count(self, session: AsyncSession, key: str, base_query=None, count_statement=None) -> int:
+        """Return the cached total for key, on a miss running count_statement or counting base_query's rows."""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry[0] < self.ttl_seconds:
+            return entry[1]
+
+        if count_statement is None:
+            count_statement = select(func.count()).select_from(base_query.order_by(None).subquery())
+        total = (await session.exec(count_statement)).one()
+        self._entries[key] = (now, total)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return total
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+receipt_counts = CountCache(settings.RECEIPT_COUNT_CACHE_SECONDS)
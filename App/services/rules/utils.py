@@ -0,0 +1,279 @@
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from dateutil.parser import parse as parse_date
+
+from models.schema import ReceiptExtractedData, RuleExtractionResult
+
+
+AMOUNT = r"\$?\s*(-?\d{1,3}(?:,\d{3})+\.\d{2}|-?\d+\.\d{2})"
+AMOUNT_RE = re.compile(AMOUNT)
+
+TOTAL_RE = re.compile(r"^\s*(?:grand\s+)?total\b(?!\s*(?:savings|saved|tax|items|discount))", re.IGNORECASE)
+AMOUNT_DUE_RE = re.compile(r"\b(?:amount|balance|total)\s+due\b", re.IGNORECASE)
+NON_ITEM_RE = re.compile(
+    r"\b(?:sub\s*-?total|total|tax|change|cash|tender|balance|amount\s+due|visa|mastercard|amex|"
+    r"discover|debit|credit|savings|discount|tip|gratuity)\b",
+    re.IGNORECASE,
+)
+ITEM_RE = re.compile(r"^\s*(?:(\d+)\s*[x@]\s+)?([A-Za-z][^$]*?[^\s$])\s{2,}" + AMOUNT + r"\s*[A-Z]?\s*$")
+
+DATE_PATTERNS = [
+    re.compile(r"\b\d{4}-\d{2}-\d{2}\b"),
+    re.compile(r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b"),
+    re.compile(
+        r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4}\b",
+        re.IGNORECASE,
+    ),
+]
+TIME_RE = re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\s*(?:[AaPp]\.?[Mm]\.?)?")
+
+PHONE_RE = re.compile(r"(?:\+?1[\s.-]?)?\(?\b\d{3}\)?[\s.-]?\d{3}[\s.-]\d{4}\b")
+STORE_NUMBER_RE = re.compile(r"\b(?:store|str|st)\s*(?:#|no\.?|num(?:ber)?)\s*:?\s*(\d+)", re.IGNORECASE)
+CASHIER_RE = re.compile(r"\b(?:cashier|operator|clerk)\s*(?:#|no\.?|id)?\s*:?\s*([A-Za-z0-9]+)", re.IGNORECASE)
+BARCODE_RE = re.compile(r"^\s*(\d[\d ]{10,}\d)\s*$")
+ADDRESS_RE = re.compile(
+    r"^\s*\d+\s+.*\b(?:st|street|ave|avenue|rd|road|blvd|boulevard|dr|drive|way|hwy|highway|ln|lane|pkwy|plaza|suite|ste)\b",
+    re.IGNORECASE,
+)
+PAYMENT_RE = re.compile(r"\b(visa|mastercard|master card|amex|american express|discover|debit|credit|cash|apple pay|google pay)\b", re.IGNORECASE)
+CARD_LAST4_RE = re.compile(r"(?:x{2,}|\*{2,})\s*(\d{4})", re.IGNORECASE)
+
+MERCHANT_SKIP_RE = re.compile(r"\b(?:welcome|receipt|thank|customer copy|merchant copy)\b", re.IGNORECASE)
+
+# Fields that must be confident for the LLM to be skipped entirely
+CORE_FIELDS = ["merchant_name", "total_amount", "purchased_at", "items"]
+
+
+def _parse_amount(value: str) -> float:
+    return float(value.replace(",", "").replace("$", "").strip())
+
+
+def _lines(text: str) -> List[str]:
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def _amount_near(lines: List[str], index: int, lookahead: int = 2) -> Optional[float]:
+    """Return the amount on a labelled line, or on one of the next lines when the layout splits it."""
+    amounts = AMOUNT_RE.findall(lines[index])
+    if amounts:
+        return _parse_amount(amounts[-1])
+    for line in lines[index + 1:index + 1 + lookahead]:
+        amounts = AMOUNT_RE.findall(line)
+        if amounts:
+            return _parse_amount(amounts[0])
+    return None
+
+
+def _extract_total(lines: List[str]) -> Tuple[Optional[float], float]:
+    totals = []
+    for index, line in enumerate(lines):
+        if TOTAL_RE.search(line):
+            amount = _amount_near(lines, index)
+            if amount is not None:
+                totals.append(amount)
+    if totals:
+        # A single value, possibly repeated, is a strong signal; conflicting values less so
+        return totals[-1], 0.95 if len(set(totals)) == 1 else 0.7
+
+    for index, line in enumerate(lines):
+        if AMOUNT_DUE_RE.search(line):
+            amount = _amount_near(lines, index)
+            if amount is not None:
+                return amount, 0.85
+
+    amounts = [_parse_amount(a) for line in lines for a in AMOUNT_RE.findall(line)]
+    if amounts:
+        return max(amounts), 0.4
+    return None, 0.0
+
+
+def _extract_purchased_at(text: str) -> Tuple[Optional[str], float]:
+    candidates = []
+    for pattern in DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            candidates.append((match.start(), match.group(0), pattern is DATE_PATTERNS[0]))
+    if not candidates:
+        return None, 0.0
+
+    candidates.sort()
+    parsed = []
+    for position, date_text, is_iso in candidates:
+        # Use the first time that follows the date on the same or next line
+        time_match = TIME_RE.search(text, position + len(date_text), position + len(date_text) + 40)
+        stamp = f"{date_text} {time_match.group(0)}" if time_match else date_text
+        try:
+            parsed.append((parse_date(stamp, fuzzy=True), is_iso, bool(time_match)))
+        except (ValueError, OverflowError):
+            continue
+    if not parsed:
+        return None, 0.0
+
+    value, is_iso, has_time = parsed[0]
+    distinct_days = {p[0].date() for p in parsed}
+    confidence = 0.95 if is_iso else 0.85
+    if len(distinct_days) > 1:
+        confidence = 0.6
+    if not has_time:
+        confidence -= 0.05
+    # Round so 0.85 - 0.05 compares as 0.8 against the threshold, not 0.7999...
+    return value.strftime("%Y-%m-%d %H:%M:%S"), round(confidence, 2)
+
+
+def _extract_merchant(lines: List[str]) -> Tuple[Optional[str], float]:
+    # An address or phone line under the name is what makes a header line trustworthy
+    has_contact = any(PHONE_RE.search(line) or ADDRESS_RE.search(line) for line in lines[:8])
+    for line in lines[:5]:
+        letters = sum(ch.isalpha() for ch in line)
+        if letters < 3 or MERCHANT_SKIP_RE.search(line):
+            continue
+        if PHONE_RE.search(line) or ADDRESS_RE.search(line) or any(p.search(line) for p in DATE_PATTERNS):
+            continue
+        # OCR noise is often mostly "letters" too (isalpha counts CJK), so stay
+        # below the threshold unless the name is plain ASCII in a proper header
+        confidence = 0.6
+        if line.isascii() and letters / len(line) > 0.6 and len(line) <= 40:
+            confidence = 0.7
+            if has_contact:
+                confidence = 0.85 if line.isupper() else 0.8
+        return line, confidence
+    return None, 0.0
+
+
+def _extract_items(lines: List[str], total: Optional[float]) -> Tuple[Optional[List[Dict]], float]:
+    items = []
+    for line in lines:
+        if NON_ITEM_RE.search(line):
+            continue
+        match = ITEM_RE.match(line)
+        if not match:
+            continue
+        quantity, name, price = match.groups()
+        item = {"name": name.strip(), "price": _parse_amount(price)}
+        if quantity:
+            item["quantity"] = int(quantity)
+        items.append(item)
+    if not items:
+        return None, 0.0
+
+    # Items that add up to a subtotal or total on the receipt are very likely complete
+    item_sum = round(sum(item["price"] for item in items), 2)
+    subtotals = []
+    for line in lines:
+        if re.search(r"\bsub\s*-?total\b", line, re.IGNORECASE):
+            subtotals += [_parse_amount(a) for a in AMOUNT_RE.findall(line)]
+    if any(abs(item_sum - value) < 0.011 for value in subtotals + ([total] if total is not None else [])):
+        return items, 0.9
+    return items, 0.5
+
+
+def _extract_payment(lines: List[str]) -> Tuple[Optional[Dict], float]:
+    # Tender lines follow the total, so a method found there is more reliable than card adverts elsewhere
+    total_index = next((i for i, line in enumerate(lines) if TOTAL_RE.search(line)), None)
+    match, confidence = None, 0.0
+    if total_index is not None:
+        for line in lines[total_index:total_index + 8]:
+            match = PAYMENT_RE.search(line)
+            if match:
+                confidence = 0.85
+                break
+    if not match:
+        match = next((m for m in map(PAYMENT_RE.search, lines) if m), None)
+        confidence = 0.6
+    if not match:
+        return None, 0.0
+
+    details = {"method": match.group(1).upper()}
+    last4 = next((m for m in map(CARD_LAST4_RE.search, lines) if m), None)
+    if last4:
+        details["card_last4"] = last4.group(1)
+    return details, confidence
+
+
+def _extract_first(pattern: "re.Pattern", text: str, confidence: float) -> Tuple[Optional[str], float]:
+    match = pattern.search(text)
+    if not match:
+        return None, 0.0
+    return (match.group(1) if match.groups() else match.group(0)).strip(), confidence
+
+
+def extract_receipt_data_rules(text: str) -> RuleExtractionResult:
+    """
+    Extract receipt fields locally with patterns and heuristics.
+
+    Covers TOTAL lines and currency amounts, dates dateutil can parse, phone
+    numbers, store/cashier numbers, item lines, payment method and the
+    merchant header. Every field gets a confidence between 0 and 1; fields
+    that were not found have confidence 0.
+
+    Args:
+        text: Receipt text from the text layer, OCR or the vision model.
+
+    Returns:
+        RuleExtractionResult: Extracted data with per-field confidence.
+    """
+    # Fold full-width digits and symbols that OCR often produces into ASCII
+    text = unicodedata.normalize("NFKC", text)
+    lines = _lines(text)
+    data = ReceiptExtractedData()
+    confidence: Dict[str, float] = {}
+
+    data.total_amount, confidence["total_amount"] = _extract_total(lines)
+    data.purchased_at, confidence["purchased_at"] = _extract_purchased_at(text)
+    data.merchant_name, confidence["merchant_name"] = _extract_merchant(lines)
+    data.items, confidence["items"] = _extract_items(lines, data.total_amount)
+    data.payment_details, confidence["payment_details"] = _extract_payment(lines)
+    data.phone_number, confidence["phone_number"] = _extract_first(PHONE_RE, text, 0.9)
+    data.store_number, confidence["store_number"] = _extract_first(STORE_NUMBER_RE, text, 0.85)
+    data.cashier_number, confidence["cashier_number"] = _extract_first(CASHIER_RE, text, 0.85)
+
+    barcode = next((m.group(1) for m in map(BARCODE_RE.match, lines) if m), None)
+    data.barcode_num, confidence["barcode_num"] = (barcode.replace(" ", ""), 0.6) if barcode else (None, 0.0)
+
+    address = next((line for line in lines[:8] if ADDRESS_RE.search(line)), None)
+    data.store_address, confidence["store_address"] = (address, 0.8) if address else (None, 0.0)
+
+    return RuleExtractionResult(data=data, confidence=confidence)
+
+
+def fields_needing_llm(result: RuleExtractionResult, threshold: float) -> List[str]:
+    """
+    Decide which fields to ask the LLM for.
+
+    The LLM is skipped when every core field (merchant, total, date, items)
+    meets the threshold. Otherwise it is asked for the weak core fields plus any
+    optional field the rules could not fill confidently.
+
+    Args:
+        result: Output of extract_receipt_data_rules.
+        threshold: Minimum confidence for a rule-extracted value to be kept.
+
+    Returns:
+        list: Field names to request from the LLM; empty if none.
+    """
+    weak_core = [f for f in CORE_FIELDS if result.confidence.get(f, 0.0) < threshold]
+    if not weak_core:
+        return []
+    optional = [
+        f for f in ReceiptExtractedData.model_fields
+        if f not in CORE_FIELDS and result.confidence.get(f, 0.0) < threshold
+    ]
+    return weak_core + optional
+
+
+def confident_data(result: RuleExtractionResult, threshold: float) -> ReceiptExtractedData:
+    """
+    Return the rule-extracted data without the fields below the threshold.
+
+    Args:
+        result: Output of extract_receipt_data_rules.
+        threshold: Minimum confidence for a rule-extracted value to be kept.
+
+    Returns:
+        ReceiptExtractedData: Copy of the data with low-confidence fields set to None.
+    """
+    return result.data.model_copy(update={
+        field: None for field in ReceiptExtractedData.model_fields
+        if result.confidence.get(field, 0.0) < threshold
+    })
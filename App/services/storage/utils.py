@@ -0,0 +1,91 @@
+import hashlib
+import os
+import tempfile
+from typing import Tuple
+
+import fitz  # PyMuPDF
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from core.logging import setup_logger
+
+
+logger = setup_logger(__name__)
+
+# Size of each read from the incoming upload; memory per request stays bounded by this
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def stream_upload_to_temp(
+    file: UploadFile,
+    upload_dir: str,
+    max_size: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> Tuple[str, str, int]:
+    """
+    Stream an uploaded file to a temporary file in fixed-size chunks.
+
+    The content is hashed and its size checked while it streams, so the whole
+    upload is never held in memory. Disk writes run off the event loop.
+
+    Args:
+        file: The incoming upload.
+        upload_dir: Directory in which the temporary file is created.
+        max_size: Maximum allowed size in bytes.
+        chunk_size: Number of bytes read per chunk.
+
+    Returns:
+        tuple: (temporary file path, SHA-256 hex digest, size in bytes).
+
+    Raises:
+        ValueError: If the upload is empty or larger than max_size.
+        OSError: If the temporary file cannot be written.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise ValueError(f"File too large  (Max : {max_size // (1024 * 1024)}mb)")
+                hasher.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+
+        if size == 0:
+            raise ValueError("Empty file")
+    except BaseException:
+        remove_file_quietly(temp_path)
+        raise
+
+    return temp_path, hasher.hexdigest(), size
+
+
+def is_valid_pdf(file_path: str) -> bool:
+    """
+    Check that a file on disk can be opened as a PDF.
+
+    Args:
+        file_path: Path to the file.
+
+    Returns:
+        bool: True if PyMuPDF can open the file as a PDF.
+    """
+    try:
+        with fitz.open(file_path, filetype="pdf"):
+            return True
+    except Exception:
+        return False
+
+
+def remove_file_quietly(file_path: str) -> None:
+    """Remove a file if it exists, logging instead of raising on failure."""
+    try:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    except OSError as e:
+        logger.warning(f"Failed to remove file {file_path}: {str(e)}")